@@ -47,10 +47,12 @@ CREATE TABLE IF NOT EXISTS reminders (
     trigger_time DATETIME,
     repeat_type VARCHAR(20),
     audio_data LONGBLOB,
+    audio_ref VARCHAR(71),
     status VARCHAR(20),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_audio_ref (audio_ref)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Messages table for chat
@@ -58,12 +60,16 @@ CREATE TABLE IF NOT EXISTS messages (
     id INT AUTO_INCREMENT PRIMARY KEY,
     sender VARCHAR(50),
     receiver VARCHAR(50),
+    conversation_key VARCHAR(101),
     content TEXT,
     audio_data LONGBLOB,
+    audio_ref VARCHAR(71),
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_sender (sender),
     INDEX idx_receiver (receiver),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_conversation_id (conversation_key, id),
+    INDEX idx_audio_ref (audio_ref)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================================================
@@ -80,7 +86,8 @@ CREATE TABLE IF NOT EXISTS vital_signs (
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
     INDEX idx_vital_type (vital_type),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Medications table
@@ -104,7 +111,49 @@ CREATE TABLE IF NOT EXISTS medication_logs (
     medication_name VARCHAR(100),
     taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_taken_at (taken_at)
+    INDEX idx_taken_at (taken_at),
+    INDEX idx_username_taken_at (username, taken_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Hourly and daily rollups of vital signs ("vital:<type>") and activities
+-- ("activity:<type>", value = minutes), kept current on every insert
+CREATE TABLE IF NOT EXISTS metric_rollup_hourly (
+    username VARCHAR(50) NOT NULL,
+    metric VARCHAR(80) NOT NULL,
+    bucket DATETIME NOT NULL,
+    count INT NOT NULL,
+    sum DOUBLE NOT NULL,
+    min DOUBLE NOT NULL,
+    max DOUBLE NOT NULL,
+    sumsq DOUBLE NOT NULL,
+    PRIMARY KEY (username, metric, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS metric_rollup_daily (
+    username VARCHAR(50) NOT NULL,
+    metric VARCHAR(80) NOT NULL,
+    bucket DATE NOT NULL,
+    count INT NOT NULL,
+    sum DOUBLE NOT NULL,
+    min DOUBLE NOT NULL,
+    max DOUBLE NOT NULL,
+    sumsq DOUBLE NOT NULL,
+    PRIMARY KEY (username, metric, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Doses taken per user per day (kept current on every medication log)
+CREATE TABLE IF NOT EXISTS medication_compliance_daily (
+    username VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,
+    taken INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Ids of write-behind rows already inserted, so a replayed spool skips them
+CREATE TABLE IF NOT EXISTS write_behind_applied (
+    row_id CHAR(32) PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_applied_at (applied_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Meals table
@@ -115,7 +164,8 @@ CREATE TABLE IF NOT EXISTS meals (
     food_items TEXT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Water logs table
@@ -125,7 +175,8 @@ CREATE TABLE IF NOT EXISTS water_logs (
     amount_ml INT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Mood logs table
@@ -137,7 +188,8 @@ CREATE TABLE IF NOT EXISTS mood_logs (
     notes TEXT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Depression screenings table
@@ -172,7 +224,8 @@ CREATE TABLE IF NOT EXISTS activity_logs (
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
     INDEX idx_activity_type (activity_type),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================================================
@@ -202,7 +255,8 @@ CREATE TABLE IF NOT EXISTS sos_logs (
     location_lon FLOAT,
     alert_type VARCHAR(50) DEFAULT 'MANUAL_SOS',
     INDEX idx_username (username),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Safe zones table
@@ -225,7 +279,8 @@ CREATE TABLE IF NOT EXISTS location_logs (
     longitude FLOAT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_timestamp (timestamp)
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_username_timestamp (username, timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================================================
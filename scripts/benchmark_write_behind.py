@@ -0,0 +1,129 @@
+"""
+Benchmark: row-at-a-time log inserts vs the write-behind buffer
+Inserts the same vital-sign readings into a scratch copy of vital_signs twice,
+once with an INSERT and commit per row (what the services do without
+WRITE_BEHIND) and once through WriteBehindBuffer, and reports rows/second for
+each. Needs the MySQL server from DB_CONFIG / .env; the scratch table is dropped.
+
+Usage:
+    python scripts/benchmark_write_behind.py --rows 20000 --batch 500
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import mysql.connector
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+from config import DB_CONFIG
+from database import PooledDatabase, run_migrations
+from utils.write_behind import WriteBehindBuffer
+
+SCRATCH_TABLE = 'bench_vital_signs'
+COLUMNS = ('username', 'vital_type', 'value', 'unit', 'timestamp')
+
+
+def make_rows(count):
+    """Synthetic wearable readings, one per second across a few users"""
+    start = datetime.now() - timedelta(seconds=count)
+    vitals = [('heart_rate', 'bpm', 60, 100), ('blood_oxygen', '%', 92, 100), ('temperature', 'C', 36, 38)]
+    rows = []
+    for i in range(count):
+        vital_type, unit, low, high = random.choice(vitals)
+        rows.append((f"user{i % 5}", vital_type, round(random.uniform(low, high), 1), unit,
+                     (start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")))
+    return rows
+
+
+def row_at_a_time(cnx, rows):
+    """Baseline: one INSERT and one commit per reading"""
+    sql = f"INSERT INTO {SCRATCH_TABLE} ({', '.join(COLUMNS)}) VALUES ({', '.join(['%s'] * len(COLUMNS))})"
+    started = time.perf_counter()
+    for row in rows:
+        cursor = cnx.cursor()
+        cursor.execute(sql, row)
+        cnx.commit()
+        cursor.close()
+    return time.perf_counter() - started
+
+
+def write_behind(database, rows, batch_size, interval):
+    """Buffered: rows are queued and written per batch; timed until all are committed"""
+    spool_dir = tempfile.mkdtemp(prefix='write_behind_bench_')
+    buffer = WriteBehindBuffer(database, spool_dir, batch_size=batch_size, flush_interval=interval,
+                               max_pending=max(len(rows), batch_size * 4))
+    try:
+        started = time.perf_counter()
+        for row in rows:
+            buffer.add(SCRATCH_TABLE, COLUMNS, row)
+        while buffer.pending():
+            buffer.flush()
+        elapsed = time.perf_counter() - started
+        return elapsed, buffer.get_stats()
+    finally:
+        buffer.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def count_rows(cnx):
+    """Rows currently in the scratch table"""
+    cursor = cnx.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {SCRATCH_TABLE}")
+    total = cursor.fetchone()[0]
+    cursor.close()
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-row inserts with the write-behind buffer")
+    parser.add_argument('--rows', type=int, default=20000, help="Readings to insert per run (default 20000)")
+    parser.add_argument('--batch', type=int, default=500, help="Write-behind batch size (default 500)")
+    parser.add_argument('--interval', type=float, default=1.0, help="Write-behind flush interval in seconds (default 1.0)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = make_rows(args.rows)
+    cnx = mysql.connector.connect(**DB_CONFIG)
+    cursor = cnx.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+    cursor.execute(f"CREATE TABLE {SCRATCH_TABLE} LIKE vital_signs")
+    cursor.close()
+    
+    try:
+        baseline = row_at_a_time(cnx, rows)
+        assert count_rows(cnx) == len(rows), "baseline lost rows"
+        
+        cursor = cnx.cursor()
+        cursor.execute(f"TRUNCATE TABLE {SCRATCH_TABLE}")
+        cursor.close()
+        
+        # The buffer writes each batch in a transaction on the app's pool and
+        # records its row ids in write_behind_applied (migration 8)
+        database = PooledDatabase(pool_size=1)
+        success, msg = run_migrations(database)
+        assert success, msg
+        buffered, stats = write_behind(database, rows, args.batch, args.interval)
+        assert count_rows(cnx) == len(rows), "write-behind lost rows"
+    finally:
+        cursor = cnx.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cursor.close()
+        cnx.close()
+    
+    print(f"📊 {len(rows)} rows into {SCRATCH_TABLE}")
+    print(f"   Row at a time : {baseline:8.2f}s  {len(rows) / baseline:10.0f} rows/s")
+    print(f"   Write-behind  : {buffered:8.2f}s  {len(rows) / buffered:10.0f} rows/s  "
+          f"({stats['batches']} batches of up to {args.batch})")
+    print(f"   Speed-up      : {baseline / buffered:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Load test for the frame server: many concurrent MJPEG viewers plus pollers
+Opens raw asyncio HTTP connections to /api/stream and polls /api/frame and
+/api/detection, then reports delivered frames, request throughput, latency
+and the server's memory and thread count. Point it at a running server, or
+let --spawn start the server in each FRAME_SERVER_MODE for a side-by-side run.
+
+Usage:
+    python scripts/load_test_frame_server.py --url http://127.0.0.1:5000 --streams 200 --duration 30 --pid 1234
+    python scripts/load_test_frame_server.py --spawn flask,asgi --source recordings/demo.mp4 --streams 300
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from statistics import median
+from urllib.parse import urlparse
+
+import psutil
+
+PROJECT_ROOT = Path(__file__).parent.parent
+FRAME_SERVER = PROJECT_ROOT / 'src' / 'video' / 'frame_server.py'
+
+
+class ClientStats:
+    """Counters shared by all clients of one run"""
+    
+    def __init__(self):
+        self.stream_frames = []     # (frames received, seconds connected) per stream client
+        self.stream_bytes = 0
+        self.first_frame_ms = []
+        self.stream_errors = 0
+        self.requests = 0
+        self.request_errors = 0
+        self.request_ms = []
+
+
+async def read_headers(reader):
+    """Read a header block; returns (status line, {lowercase name: value})"""
+    status = (await reader.readline()).decode('latin-1').strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            return status, headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+def request_bytes(host, path):
+    """A minimal GET request"""
+    return f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+
+
+async def dechunk(reader, body):
+    """Decode a chunked transfer-encoded body from reader into the body stream"""
+    try:
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                break
+            body.feed_data(await reader.readexactly(size))
+            await reader.readexactly(2)
+    except (OSError, ValueError, asyncio.IncompleteReadError):
+        pass
+    body.feed_eof()
+
+
+async def stream_client(host, port, path, deadline, stats):
+    """One MJPEG viewer: count whole frames until the deadline"""
+    frames = 0
+    writer = None
+    started = time.perf_counter()
+    connected = None
+    pump = None
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(request_bytes(host, path))
+        await writer.drain()
+        status, headers = await read_headers(reader)
+        if ' 200' not in status:
+            raise ConnectionError(status)
+        connected = time.monotonic()
+        
+        # Flask streams chunked, uvicorn may too; parse parts from the decoded body
+        body = reader
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = asyncio.StreamReader()
+            pump = asyncio.ensure_future(dechunk(reader, body))
+        
+        while time.monotonic() < deadline:
+            remaining = deadline - time.monotonic()
+            # Part header: skip the boundary line, read Content-Length
+            _, part = await asyncio.wait_for(read_headers(body), remaining)
+            length = int(part['content-length'])
+            await asyncio.wait_for(body.readexactly(length), max(0.1, deadline - time.monotonic()))
+            if frames == 0:
+                stats.first_frame_ms.append((time.perf_counter() - started) * 1000)
+            frames += 1
+            stats.stream_bytes += length
+    except asyncio.TimeoutError:
+        pass
+    except (OSError, ConnectionError, KeyError, ValueError, asyncio.IncompleteReadError):
+        stats.stream_errors += 1
+    finally:
+        stats.stream_frames.append((frames, time.monotonic() - connected if connected else 0.0))
+        if pump is not None:
+            pump.cancel()
+        if writer is not None:
+            writer.close()
+
+
+async def poll_client(host, port, paths, deadline, stats):
+    """Request the given paths round-robin until the deadline"""
+    index = 0
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request_bytes(host, path))
+            await writer.drain()
+            status, headers = await read_headers(reader)
+            if 'content-length' in headers:
+                await reader.readexactly(int(headers['content-length']))
+            else:
+                await reader.read()
+            if ' 200' not in status:
+                raise ConnectionError(status)
+            stats.requests += 1
+            stats.request_ms.append((time.perf_counter() - started) * 1000)
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            stats.request_errors += 1
+            await asyncio.sleep(0.05)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+async def sample_process(pid, deadline, samples):
+    """Record (rss_mb, threads) of the server process (and children) once a second"""
+    try:
+        process = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    while time.monotonic() < deadline:
+        try:
+            members = [process] + process.children(recursive=True)
+            rss = sum(p.memory_info().rss for p in members) / (1024 * 1024)
+            samples.append((rss, sum(p.num_threads() for p in members)))
+        except psutil.NoSuchProcess:
+            return
+        await asyncio.sleep(1.0)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_load(url, streams, pollers, duration, fps, ramp, pid):
+    """Drive one server and return the summary dict"""
+    target = urlparse(url)
+    host, port = target.hostname, target.port or 80
+    stats = ClientStats()
+    samples = []
+    
+    started = time.monotonic()
+    deadline = started + ramp + duration
+    tasks = []
+    if pid:
+        tasks.append(asyncio.ensure_future(sample_process(pid, deadline, samples)))
+    for _ in range(pollers):
+        tasks.append(asyncio.ensure_future(
+            poll_client(host, port, ['/api/frame', '/api/detection'], deadline, stats)))
+    
+    # Connect viewers gradually so the listen backlog is not the bottleneck
+    for _ in range(streams):
+        tasks.append(asyncio.ensure_future(
+            stream_client(host, port, f"/api/stream?fps={fps}", deadline, stats)))
+        if ramp:
+            await asyncio.sleep(ramp / streams)
+    
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    
+    per_client_fps = [frames / seconds if seconds > 0 else 0.0 for frames, seconds in stats.stream_frames]
+    rss = [s[0] for s in samples]
+    return {
+        'url': url,
+        'streams': streams,
+        'stream_errors': stats.stream_errors,
+        'stream_fps_requested': fps,
+        'stream_fps_median': round(median(per_client_fps), 2) if per_client_fps else 0.0,
+        'stream_fps_p5': round(percentile(per_client_fps, 0.05), 2),
+        'stream_frames_total': sum(frames for frames, _ in stats.stream_frames),
+        'stream_mbps': round(stats.stream_bytes * 8 / elapsed / 1e6, 1),
+        'first_frame_ms_p95': round(percentile(stats.first_frame_ms, 0.95), 1),
+        'pollers': pollers,
+        'requests_per_second': round(stats.requests / elapsed, 1),
+        'request_errors': stats.request_errors,
+        'request_ms_p50': round(percentile(stats.request_ms, 0.50), 2),
+        'request_ms_p95': round(percentile(stats.request_ms, 0.95), 2),
+        'server_rss_mb_start': round(rss[0], 1) if rss else None,
+        'server_rss_mb_peak': round(max(rss), 1) if rss else None,
+        'server_rss_mb_end': round(rss[-1], 1) if rss else None,
+        'server_threads_peak': max(s[1] for s in samples) if samples else None
+    }
+
+
+def wait_until_ready(url, timeout=60):
+    """Poll /health until the spawned server answers"""
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=2) as response:
+                if json.load(response).get('has_frame'):
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def spawn_server(mode, port, source):
+    """Start frame_server.py in the given FRAME_SERVER_MODE"""
+    env = dict(os.environ, FRAME_SERVER_MODE=mode, FRAME_SERVER_PORT=str(port), CLIP_DIR='')
+    if source is not None:
+        env['CAMERA_SOURCES'] = f"default={source}"
+    return subprocess.Popen([sys.executable, str(FRAME_SERVER)], cwd=str(PROJECT_ROOT), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_server(process):
+    """Interrupt the spawned server and wait for it (kill if it hangs)"""
+    if os.name == 'nt':
+        process.terminate()
+    else:
+        process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def raise_open_file_limit():
+    """Hundreds of sockets need more than the common 1024 descriptor default"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+
+
+def print_summary(label, summary):
+    print(f"✓ {label}: {summary['streams']} streams at {summary['stream_fps_requested']} fps -> "
+          f"median {summary['stream_fps_median']} fps/client (p5 {summary['stream_fps_p5']}), "
+          f"{summary['stream_mbps']} Mbit/s, {summary['stream_errors']} stream errors")
+    print(f"  polling: {summary['requests_per_second']} req/s, p50 {summary['request_ms_p50']} ms, "
+          f"p95 {summary['request_ms_p95']} ms, {summary['request_errors']} errors")
+    if summary['server_rss_mb_peak'] is not None:
+        print(f"  server: RSS {summary['server_rss_mb_start']} -> {summary['server_rss_mb_end']} MB "
+              f"(peak {summary['server_rss_mb_peak']}), peak threads {summary['server_threads_peak']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the frame server with concurrent viewers")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="Server to test (default http://127.0.0.1:5000)")
+    parser.add_argument('--pid', type=int, help="Server process id, to sample its memory and threads")
+    parser.add_argument('--spawn', help="Comma-separated FRAME_SERVER_MODEs to start and test in turn (e.g. flask,asgi)")
+    parser.add_argument('--source', help="Camera source for spawned servers (video file or device index)")
+    parser.add_argument('--port', type=int, default=5055, help="Port for spawned servers (default 5055)")
+    parser.add_argument('--streams', type=int, default=100, help="Concurrent MJPEG clients (default 100)")
+    parser.add_argument('--pollers', type=int, default=10, help="Concurrent /api/frame + /api/detection pollers (default 10)")
+    parser.add_argument('--fps', type=float, default=15, help="Frame rate each stream client asks for (default 15)")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds of full load (default 20)")
+    parser.add_argument('--ramp', type=float, default=2, help="Seconds over which streams connect (default 2)")
+    parser.add_argument('--report', help="Write the JSON results here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    raise_open_file_limit()
+    
+    results = {}
+    if args.spawn:
+        for mode in (m.strip() for m in args.spawn.split(',') if m.strip()):
+            url = f"http://127.0.0.1:{args.port}"
+            process = spawn_server(mode, args.port, args.source)
+            try:
+                if not wait_until_ready(url):
+                    print(f"✗ {mode}: server did not come up with a frame")
+                    continue
+                results[mode] = asyncio.run(run_load(url, args.streams, args.pollers, args.duration,
+                                                     args.fps, args.ramp, process.pid))
+            finally:
+                stop_server(process)
+            print_summary(mode, results[mode])
+    else:
+        results[args.url] = asyncio.run(run_load(args.url, args.streams, args.pollers, args.duration,
+                                                 args.fps, args.ramp, args.pid))
+        print_summary(args.url, results[args.url])
+    
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📊 Report written to {args.report}")
+    return 0 if results else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Rebuild the hourly and daily metric rollups from the raw vital_signs and
+activity_logs rows. Use it after restoring or hand-editing those tables, or
+to backfill a database that ran without rollups; readers see either the old
+or the new rollups, never a half-built set, because it runs in one transaction.
+
+Usage:
+    python scripts/rebuild_rollups.py
+    python scripts/rebuild_rollups.py --user alice
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+from database import PooledDatabase, run_migrations
+from utils import rollups
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute metric rollups from raw rows")
+    parser.add_argument('--user', help="Only rebuild this user's rollups (default: everyone)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    database = PooledDatabase(pool_size=1)
+    success, msg = run_migrations(database)
+    if not success:
+        print(msg)
+        return 1
+    
+    started = time.perf_counter()
+    with database.transaction() as cursor:
+        rollups.rebuild(cursor, args.user)
+        cursor.execute("SELECT COUNT(*) FROM metric_rollup_hourly")
+        hourly = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM metric_rollup_daily")
+        daily = cursor.fetchone()[0]
+    
+    scope = f"user {args.user}" if args.user else "all users"
+    print(f"✅ Rebuilt rollups for {scope} in {time.perf_counter() - started:.2f}s "
+          f"({hourly} hourly, {daily} daily buckets in total)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import re
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 
@@ -18,6 +19,104 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME", "elderly_care_system")
 }
 
+# One connection pool per process, shared by every session and service.
+# DB_POOL_SIZE is capped at 32 by mysql-connector; DB_POOL_WAIT is how long
+# an operation waits for a free connection before failing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_POOL_WAIT = float(os.getenv("DB_POOL_WAIT", 5))
+
+# Opt-in write-behind for high-frequency log rows (locations, vitals, activity,
+# device/access/error logs): rows are spooled to WRITE_BEHIND_DIR and inserted
+# per table in batches of WRITE_BEHIND_BATCH or every WRITE_BEHIND_INTERVAL
+# seconds; writers block once WRITE_BEHIND_MAX_PENDING rows are waiting.
+# The spool is fsync'd at most every WRITE_BEHIND_FSYNC_MS (the rows a power
+# loss can cost); 0 fsyncs before every add returns, -1 never fsyncs
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "false").strip().lower() in ("1", "true", "yes", "on")
+WRITE_BEHIND_DIR = os.getenv("WRITE_BEHIND_DIR", ".write_behind")
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", 500))
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", 1.0))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 20000))
+WRITE_BEHIND_FSYNC_MS = float(os.getenv("WRITE_BEHIND_FSYNC_MS", 200))
+
 # System Configuration
 TIMEZONE = ZoneInfo(os.getenv("TIMEZONE", "Asia/Kuala_Lumpur"))
 NODERED_ENDPOINT = os.getenv("NODERED_ENDPOINT", "http://localhost:1880/fall-alert")
+
+# Frame Server Configuration
+# FRAME_SERVER_URL is used by the Streamlit process; FRAME_SERVER_PUBLIC_URL is
+# what the viewer's browser uses to open the live MJPEG stream
+FRAME_SERVER_URL = os.getenv("FRAME_SERVER_URL", "http://127.0.0.1:5000")
+FRAME_SERVER_PUBLIC_URL = os.getenv("FRAME_SERVER_PUBLIC_URL", FRAME_SERVER_URL)
+FRAME_SERVER_PORT = int(os.getenv("FRAME_SERVER_PORT", 5000))
+
+# How the frame server handles HTTP: "flask" (one thread per connection) or
+# "asgi" (frames, streams, detection and health on an asyncio event loop under
+# uvicorn, for many simultaneous viewers; other routes still go through Flask)
+FRAME_SERVER_MODE = os.getenv("FRAME_SERVER_MODE", "flask")
+
+# Fall detection runs on a downscaled copy of each frame ("WIDTHxHEIGHT", or
+# "full" to analyse at camera resolution); viewers still get full resolution
+FALL_ANALYSIS_SIZE = os.getenv("FALL_ANALYSIS_SIZE", "640x360")
+
+def parse_size(value):
+    """Parse 'WIDTHxHEIGHT' into a (width, height) tuple; None for 'full'/empty"""
+    if not value or value.strip().lower() in ("full", "none", "0"):
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+# Cameras served by the frame server: comma-separated "id=source" pairs where
+# source is a device index, an RTSP/HTTP URL or a video file path, e.g.
+# "bedroom=0,bathroom=rtsp://192.168.1.20/stream,living=1"
+CAMERA_SOURCES = os.getenv("CAMERA_SOURCES", "default=0")
+
+# Where fall detection runs: "thread" (shared analysis pool inside the frame
+# server) or "process" (one detector process per camera fed via shared memory)
+FALL_DETECTOR_MODE = os.getenv("FALL_DETECTOR_MODE", "thread")
+
+# Adaptive analysis rate: after ANALYSIS_IDLE_AFTER seconds without motion or
+# a person in view, fall detection drops to ANALYSIS_IDLE_FPS (0 = always full rate)
+ANALYSIS_IDLE_AFTER = float(os.getenv("ANALYSIS_IDLE_AFTER", 30))
+ANALYSIS_IDLE_FPS = float(os.getenv("ANALYSIS_IDLE_FPS", 2))
+
+# Incident clips: the frame server keeps CLIP_PRE_SECONDS of JPEG frames per
+# camera in memory (at most CLIP_MAX_MB) and writes pre/post-event MP4s to
+# CLIP_DIR/<camera>/ when a fall fires. Set CLIP_DIR empty to disable.
+CLIP_DIR = os.getenv("CLIP_DIR", "clips")
+CLIP_PRE_SECONDS = float(os.getenv("CLIP_PRE_SECONDS", 10))
+CLIP_POST_SECONDS = float(os.getenv("CLIP_POST_SECONDS", 10))
+CLIP_FPS = float(os.getenv("CLIP_FPS", 10))
+CLIP_MAX_MB = int(os.getenv("CLIP_MAX_MB", 64))
+
+# Number of recent incidents (with their triggering JPEG) kept in memory
+INCIDENT_HISTORY = int(os.getenv("INCIDENT_HISTORY", 100))
+
+# Home page incident gallery: snapshots and thumbnails are stored on disk
+# (content-addressed) with a small SQLite index; oldest beyond the max are pruned
+INCIDENT_STORE_DIR = os.getenv("INCIDENT_STORE_DIR", ".incident_store")
+INCIDENT_STORE_MAX = int(os.getenv("INCIDENT_STORE_MAX", 5000))
+
+# Chat and reminder audio is kept out of MySQL in a content-addressed blob
+# store; rows hold only the "sha256:..." reference
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", ".blob_store")
+
+# Caregiver daily summaries are cached per user until one of their source
+# tables is written, and for at most SUMMARY_CACHE_TTL seconds (catches writes
+# made by other processes)
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", 60))
+
+CAMERA_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+def parse_camera_sources(value):
+    """Parse CAMERA_SOURCES into an ordered list of (camera_id, source)"""
+    cameras = []
+    for index, entry in enumerate(e.strip() for e in value.split(",")):
+        if not entry:
+            continue
+        camera_id, sep, source = entry.partition("=")
+        if not sep or not CAMERA_ID_PATTERN.match(camera_id.strip()):
+            # Bare source without a name (a URL's "?a=b" is not a name)
+            camera_id, source = f"camera{index}", entry
+        source = source.strip()
+        cameras.append((camera_id.strip(), int(source) if source.isdigit() else source))
+    return cameras
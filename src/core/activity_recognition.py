@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime, timedelta
 from config import TIMEZONE
+from utils.write_behind import insert_row
 
 class ActivityRecognition:
     def __init__(self, db_conn, db_available):
@@ -18,12 +19,8 @@ class ActivityRecognition:
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO activity_logs (username, activity_type, duration_minutes, timestamp)
-                    VALUES (%s, %s, %s, %s)
-                """, (username, activity_type, duration_minutes, timestamp))
-                self.db_conn.commit()
+                insert_row(self.db_conn, "activity_logs", ("username", "activity_type", "duration_minutes", "timestamp"),
+                           (username, activity_type, duration_minutes, timestamp))
                 return True
             except Exception as e:
                 print(f"Error logging activity: {e}")
@@ -62,6 +59,11 @@ class ActivityRecognition:
             
             last_activity = activities[-1]["timestamp"]
         
+        return self.inactivity_status(last_activity, hours)
+    
+    @staticmethod
+    def inactivity_status(last_activity, hours=4):
+        """Inactivity verdict from the latest activity timestamp in the window (None if none)"""
         if last_activity is None:
             return {"inactive": True, "hours": hours, "alert": "No recent activity detected"}
         
@@ -120,11 +122,14 @@ class ActivityRecognition:
         if self.db_available:
             try:
                 cursor = self.db_conn.cursor()
+                # Hourly rollup, from the hour the window starts in
                 cursor.execute("""
-                    SELECT activity_type, COUNT(*), SUM(duration_minutes) FROM activity_logs
-                    WHERE username = %s AND timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY activity_type
-                """, (username, days))
+                    SELECT SUBSTRING(metric, 10), CAST(SUM(count) AS SIGNED), CAST(SUM(sum) AS SIGNED)
+                    FROM metric_rollup_hourly
+                    WHERE username = %s AND metric LIKE %s
+                    AND bucket >= DATE_FORMAT(DATE_SUB(NOW(), INTERVAL %s DAY), '%%Y-%%m-%%d %%H:00:00')
+                    GROUP BY metric
+                """, (username, "activity:%", days))
                 return cursor.fetchall()
             except Exception as e:
                 print(f"Error fetching activity summary: {e}")
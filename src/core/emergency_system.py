@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime
 from config import TIMEZONE
+from utils.write_tracker import note_write
 import requests
 
 class EmergencySystem:
@@ -78,6 +79,7 @@ class EmergencySystem:
                     VALUES (%s, %s, %s, %s)
                 """, (username, timestamp, location_lat, location_lon))
                 self.db_conn.commit()
+                note_write("sos_logs", username)
             except Exception as e:
                 print(f"Error logging SOS: {e}")
         
@@ -11,46 +11,178 @@ import numpy as np
 from collections import deque
 import time
 
+
+class DetectionResult:
+    """Result of one analyze_frame() call
+    
+    Slotted to keep per-frame allocations small. Supports result['key']
+    access so existing dict-style callers keep working.
+    """
+    
+    __slots__ = ('fall_detected', 'confidence', 'aspect_ratio', 'motion', 'bbox',
+                 'area', 'aspect_ratio_score', 'motion_score', 'area_score')
+    
+    def __init__(self):
+        self.fall_detected = False
+        self.confidence = 0.0
+        self.aspect_ratio = None
+        self.motion = 0
+        self.bbox = None
+        self.area = None
+        self.aspect_ratio_score = None
+        self.motion_score = None
+        self.area_score = None
+    
+    def __getitem__(self, key):
+        return getattr(self, key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+    
+    @property
+    def details(self):
+        """Per-check scores (empty until the frame was scored)"""
+        if self.aspect_ratio_score is None:
+            return {}
+        return {
+            'aspect_ratio_score': self.aspect_ratio_score,
+            'motion_score': self.motion_score,
+            'area_score': self.area_score
+        }
+    
+    def to_dict(self):
+        """Plain dict in the original result layout"""
+        return {
+            'fall_detected': self.fall_detected,
+            'confidence': self.confidence,
+            'aspect_ratio': self.aspect_ratio,
+            'motion': self.motion,
+            'bbox': self.bbox,
+            'details': self.details
+        }
+
+
 class FallDetector:
     """Real fall detection using computer vision"""
     
-    def __init__(self, confidence_threshold=0.50):
+    # Thresholds below are tuned in full-resolution pixels; when analysing a
+    # downscaled frame they are rescaled so confidence scores stay equivalent
+    MIN_PERSON_AREA = 3000   # Smallest contour treated as a person
+    FULL_PERSON_AREA = 40000 # Contour area that scores 1.0
+    MOTION_NORM = 8000       # Motion pixels that drive the motion score to 0
+    BLUR_KERNEL = 21         # Gaussian kernel size at full resolution
+    
+    def __init__(self, confidence_threshold=0.50, analysis_size=None):
         self.confidence_threshold = confidence_threshold
-        self.prev_frame = None
+        self.analysis_size = analysis_size  # (width, height) or None for full resolution
         self.motion_history = deque(maxlen=10)
         self.fall_history = deque(maxlen=30)
         self.last_fall_time = 0
         self.fall_cooldown = 0.5  # seconds between fall alerts (very responsive)
+        self.verbose = True  # Print each detected fall (replay turns this off)
         
-    def detect_person(self, frame):
-        """Detect person in frame using contours"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Full-res / analysis-res factors, updated per frame by downscale()
+        self.scale_x = 1.0
+        self.scale_y = 1.0
         
-        # Apply Gaussian blur
-        blurred = cv2.GaussianBlur(gray, (21, 21), 0)
+        # Working planes reused across frames (allocated on first use and
+        # whenever the analysis shape changes)
+        self._shape = None
+        self._small = None
+        self._gray = None
+        self._blurred = None
+        self._thresh = None
+        self._prev_gray = None
+        self._diff = None
+        self._motion_mask = None
+        self._has_prev = False
         
+    @property
+    def area_scale(self):
+        """Full-resolution pixels represented by one analysis pixel"""
+        return self.scale_x * self.scale_y
+    
+    def _ensure_buffers(self, height, width):
+        """(Re)allocate the working planes for a given analysis size"""
+        if self._shape == (height, width):
+            return
+        self._shape = (height, width)
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._blurred = np.empty_like(self._gray)
+        self._thresh = np.empty_like(self._gray)
+        self._prev_gray = np.empty_like(self._gray)
+        self._diff = np.empty_like(self._gray)
+        self._motion_mask = np.empty_like(self._gray)
+        self._has_prev = False
+    
+    def downscale(self, frame):
+        """Resize frame to the analysis size (never upscales)"""
+        if self.analysis_size is None:
+            self.scale_x = self.scale_y = 1.0
+            return frame
+        
+        height, width = frame.shape[:2]
+        target_w, target_h = self.analysis_size
+        if width <= target_w and height <= target_h:
+            self.scale_x = self.scale_y = 1.0
+            return frame
+        
+        self.scale_x = width / target_w
+        self.scale_y = height / target_h
+        small_shape = (target_h, target_w) + frame.shape[2:]
+        if self._small is None or self._small.shape != small_shape:
+            self._small = np.empty(small_shape, dtype=frame.dtype)
+        cv2.resize(frame, (target_w, target_h), dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small
+    
+    def _blur_kernel(self):
+        """Gaussian kernel covering the same real area as 21x21 at full res"""
+        size = int(round(self.BLUR_KERNEL / ((self.scale_x + self.scale_y) / 2)))
+        size = max(3, size)
+        return size if size % 2 == 1 else size + 1
+    
+    def preprocess(self, frame):
+        """Shared pass: downscale, grayscale and blur once per frame
+        
+        Returns the gray and blurred planes; both live in reusable buffers
+        and are only valid until the next call.
+        """
+        frame = self.downscale(frame)
+        self._ensure_buffers(*frame.shape[:2])
+        
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        kernel = self._blur_kernel()
+        cv2.GaussianBlur(self._gray, (kernel, kernel), 0, dst=self._blurred)
+        return self._gray, self._blurred
+    
+    def detect_person(self, blurred):
+        """Detect person in the blurred plane using contours
+        
+        Returns the bbox and area in full-resolution units.
+        """
         # Threshold
-        _, thresh = cv2.threshold(blurred, 100, 255, cv2.THRESH_BINARY)
+        cv2.threshold(blurred, 100, 255, cv2.THRESH_BINARY, dst=self._thresh)
         
         # Find contours
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours, _ = cv2.findContours(self._thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         if not contours:
             return None, None
         
         # Get largest contour (person)
         largest_contour = max(contours, key=cv2.contourArea)
-        area = cv2.contourArea(largest_contour)
+        area = cv2.contourArea(largest_contour) * self.area_scale
         
         # Filter by area (person should be significant) - LOWERED THRESHOLD
-        if area < 3000:
+        if area < self.MIN_PERSON_AREA:
             return None, None
         
-        # Get bounding box
+        # Get bounding box, mapped back to full-resolution coordinates
         x, y, w, h = cv2.boundingRect(largest_contour)
+        bbox = (int(round(x * self.scale_x)), int(round(y * self.scale_y)),
+                int(round(w * self.scale_x)), int(round(h * self.scale_y)))
         
-        return (x, y, w, h), area
+        return bbox, area
     
     def calculate_aspect_ratio(self, bbox):
         """Calculate aspect ratio (width/height)"""
@@ -64,59 +196,77 @@ class FallDetector:
         aspect_ratio = w / h
         return aspect_ratio
     
-    def detect_motion(self, frame):
-        """Detect motion between frames"""
-        if self.prev_frame is None:
-            self.prev_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def detect_motion(self, gray):
+        """Detect motion against the previous gray plane (full-res pixel count)"""
+        if not self._has_prev:
+            self._prev_gray, self._gray = self._gray, self._prev_gray
+            self._has_prev = True
             return 0
         
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
         # Calculate frame difference
-        frame_diff = cv2.absdiff(self.prev_frame, gray)
+        cv2.absdiff(self._prev_gray, gray, dst=self._diff)
         
         # Threshold
-        _, thresh = cv2.threshold(frame_diff, 30, 255, cv2.THRESH_BINARY)
+        cv2.threshold(self._diff, 30, 255, cv2.THRESH_BINARY, dst=self._motion_mask)
         
         # Count motion pixels
-        motion_pixels = cv2.countNonZero(thresh)
+        motion_pixels = int(cv2.countNonZero(self._motion_mask) * self.area_scale)
         
-        self.prev_frame = gray
+        # Current plane becomes the previous one; the old buffer is reused
+        # for the next frame instead of allocating a new one
+        self._prev_gray, self._gray = self._gray, self._prev_gray
         
         return motion_pixels
     
-    def analyze_frame(self, frame):
-        """Analyze frame for fall detection"""
-        result = {
-            'fall_detected': False,
-            'confidence': 0.0,
-            'aspect_ratio': None,
-            'motion': 0,
-            'bbox': None,
-            'details': {}
-        }
+    def analyze_frame(self, frame, timestamp=None, timings=None):
+        """Analyze frame for fall detection
+        
+        timestamp overrides the wall clock used for the alert cooldown (replay
+        passes the frame's position in the recording). If a timings dict is
+        given, it receives per-stage durations in seconds for this frame.
+        """
+        result = DetectionResult()
+        clock = time.perf_counter
+        if timings is not None:
+            timings.clear()
+            started = clock()
+        
+        # One preprocessing pass shared by every check below
+        gray, blurred = self.preprocess(frame)
+        if timings is not None:
+            now = clock()
+            timings['preprocess'] = now - started
+            started = now
         
         # Detect person
-        bbox, area = self.detect_person(frame)
-        result['bbox'] = bbox
+        bbox, area = self.detect_person(blurred)
+        result.bbox = bbox
+        result.area = area
+        if timings is not None:
+            now = clock()
+            timings['detect_person'] = now - started
+            started = now
         
         if bbox is None:
             return result
         
         # Calculate aspect ratio
         aspect_ratio = self.calculate_aspect_ratio(bbox)
-        result['aspect_ratio'] = aspect_ratio
+        result.aspect_ratio = aspect_ratio
         
         if aspect_ratio is None:
             return result
         
         # Detect motion
-        motion = self.detect_motion(frame)
-        result['motion'] = motion
+        motion = self.detect_motion(gray)
+        result.motion = motion
+        if timings is not None:
+            now = clock()
+            timings['detect_motion'] = now - started
+            started = now
         
         # Fall detection logic - MORE SENSITIVE
         confidence = 0.0
-        details = {}
         
         # Check 1: Aspect ratio (lying down = high ratio)
         # Normal standing: ~0.5-0.7
@@ -124,41 +274,41 @@ class FallDetector:
         # LOWERED THRESHOLD for more sensitivity
         if aspect_ratio > 1.0:
             ratio_score = min((aspect_ratio - 1.0) / 2.0, 1.0)  # Normalize to 0-1
-            confidence += ratio_score * 0.65  # 65% weight
-            details['aspect_ratio_score'] = ratio_score
         else:
             # Even if aspect ratio is low, still calculate a score
             ratio_score = max(0, aspect_ratio / 0.7)  # Normalize standing position
-            confidence += ratio_score * 0.65
-            details['aspect_ratio_score'] = ratio_score
+        confidence += ratio_score * 0.65  # 65% weight
         
         # Check 2: Motion (should be low if fallen)
         # High motion = person moving
         # Low motion = person stationary (fallen)
-        motion_score = max(0, 1.0 - (motion / 8000))  # Always calculate
+        motion_score = max(0, 1.0 - (motion / self.MOTION_NORM))  # Always calculate
         confidence += motion_score * 0.25  # 25% weight
-        details['motion_score'] = motion_score
         
         # Check 3: Area (person should be visible)
-        area_score = min(area / 40000, 1.0)  # Always calculate
+        area_score = min(area / self.FULL_PERSON_AREA, 1.0)  # Always calculate
         confidence += area_score * 0.1  # 10% weight
-        details['area_score'] = area_score
         
         # Store details
-        result['details'] = details
-        result['confidence'] = confidence
+        result.aspect_ratio_score = ratio_score
+        result.motion_score = motion_score
+        result.area_score = area_score
+        result.confidence = confidence
         
         # Determine if fall detected - USE CURRENT FRAME CONFIDENCE
         if confidence >= self.confidence_threshold:
             # Check cooldown to avoid duplicate alerts
-            current_time = time.time()
+            current_time = timestamp if timestamp is not None else time.time()
             if current_time - self.last_fall_time > self.fall_cooldown:
-                result['fall_detected'] = True
+                result.fall_detected = True
                 self.last_fall_time = current_time
-                print(f"🚨 FALL DETECTED! Confidence: {confidence:.2%} | Aspect: {aspect_ratio:.2f} | Motion: {motion} | Area: {area}")
+                if self.verbose:
+                    print(f"🚨 FALL DETECTED! Confidence: {confidence:.2%} | Aspect: {aspect_ratio:.2f} | Motion: {motion} | Area: {area}")
         
         # Track history for statistics only
         self.fall_history.append(confidence)
+        if timings is not None:
+            timings['scoring'] = clock() - started
         
         return result
     
@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime
 from config import TIMEZONE
+from utils.write_behind import insert_row
 import math
 
 class GeofencingSystem:
@@ -44,12 +45,8 @@ class GeofencingSystem:
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO location_logs (username, latitude, longitude, timestamp)
-                    VALUES (%s, %s, %s, %s)
-                """, (username, latitude, longitude, timestamp))
-                self.db_conn.commit()
+                insert_row(self.db_conn, "location_logs", ("username", "latitude", "longitude", "timestamp"),
+                           (username, latitude, longitude, timestamp))
             except Exception as e:
                 print(f"Error logging location: {e}")
         
@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime, timedelta
 from config import TIMEZONE
+from utils.write_tracker import note_write
 
 class MedicationManager:
     def __init__(self, db_conn, db_available):
@@ -21,6 +22,7 @@ class MedicationManager:
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """, (username, name, dosage, frequency, start_date, end_date, notes))
                 self.db_conn.commit()
+                note_write("medications", username)
                 return True
             except Exception as e:
                 print(f"Error adding medication: {e}")
@@ -46,12 +48,18 @@ class MedicationManager:
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO medication_logs (username, medication_name, taken_at)
-                    VALUES (%s, %s, %s)
-                """, (username, medication_name, timestamp))
-                self.db_conn.commit()
+                # The log row and the daily rollup behind the compliance trend commit together
+                with self.db_conn.transaction() as cursor:
+                    cursor.execute("""
+                        INSERT INTO medication_logs (username, medication_name, taken_at)
+                        VALUES (%s, %s, %s)
+                    """, (username, medication_name, timestamp))
+                    cursor.execute("""
+                        INSERT INTO medication_compliance_daily (username, day, taken)
+                        VALUES (%s, DATE(%s), 1)
+                        ON DUPLICATE KEY UPDATE taken = taken + 1
+                    """, (username, timestamp))
+                note_write("medication_logs", username)
                 return True
             except Exception as e:
                 print(f"Error logging medication: {e}")
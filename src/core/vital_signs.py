@@ -5,8 +5,18 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime, timedelta
 from config import TIMEZONE
+from utils.write_behind import insert_row
 import pandas as pd
 
+# Normal ranges used for abnormal-reading alerts
+NORMAL_RANGES = {
+    "heart_rate": (60, 100),
+    "blood_pressure_systolic": (90, 120),
+    "blood_pressure_diastolic": (60, 80),
+    "temperature": (36.5, 37.5),
+    "blood_oxygen": (95, 100)
+}
+
 class VitalSignsTracker:
     def __init__(self, db_conn, db_available):
         self.db_conn = db_conn
@@ -18,12 +28,8 @@ class VitalSignsTracker:
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO vital_signs (username, vital_type, value, unit, timestamp)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (username, vital_type, value, unit, timestamp))
-                self.db_conn.commit()
+                insert_row(self.db_conn, "vital_signs", ("username", "vital_type", "value", "unit", "timestamp"),
+                           (username, vital_type, value, unit, timestamp))
                 return True
             except Exception as e:
                 print(f"Error recording vital sign: {e}")
@@ -77,20 +83,11 @@ class VitalSignsTracker:
         """Check for abnormal vital signs"""
         alerts = []
         
-        # Normal ranges
-        ranges = {
-            "heart_rate": (60, 100),
-            "blood_pressure_systolic": (90, 120),
-            "blood_pressure_diastolic": (60, 80),
-            "temperature": (36.5, 37.5),
-            "blood_oxygen": (95, 100)
-        }
-        
         vitals = self.get_vital_signs(username, days=1)
         
         for vital_type, value, unit, timestamp in vitals:
-            if vital_type in ranges:
-                min_val, max_val = ranges[vital_type]
+            if vital_type in NORMAL_RANGES:
+                min_val, max_val = NORMAL_RANGES[vital_type]
                 if value < min_val or value > max_val:
                     alerts.append({
                         "vital": vital_type,
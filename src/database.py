@@ -1,15 +1,270 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector import errorcode, pooling
 import streamlit as st
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_WAIT, BLOB_STORE_DIR
+from utils.blob_store import get_blob_store
+from utils import rollups
+from utils.chat_manager import ChatManager
+
+# Lost-connection error that is safe to retry, but only while checking a
+# connection out (before any statement has been sent on it)
+RETRYABLE_ERRORS = (errorcode.CR_SERVER_GONE_ERROR,)
+
+class PoolTimeout(mysql.connector.errors.PoolError):
+    """No pooled connection became free within DB_POOL_WAIT"""
+
+class PooledCursor:
+    """Cursor that borrows a pooled connection for each statement
+    
+    Results are buffered and the connection goes straight back to the pool,
+    so a cursor never pins a connection between statements.
+    """
+    
+    def __init__(self, database, cursor_options):
+        self._database = database
+        self._options = cursor_options
+        self._rows = []
+        self._index = 0
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+        self.column_names = ()
+    
+    def _run(self, method, operation, params):
+        """Execute on a borrowed connection and keep the results
+        
+        Never retried once sent: a connection lost mid-statement may already
+        have applied it, and re-running an INSERT or counter upsert would
+        apply it twice.
+        """
+        cnx = self._database.checkout()
+        try:
+            cursor = cnx.cursor(buffered=True, **self._options)
+            try:
+                getattr(cursor, method)(operation, params)
+                self._rows = cursor.fetchall() if cursor.with_rows else []
+                self._index = 0
+                self.rowcount = cursor.rowcount
+                self.lastrowid = cursor.lastrowid
+                self.description = cursor.description
+                self.column_names = cursor.column_names
+            finally:
+                cursor.close()
+        finally:
+            self._database.release(cnx)
+    
+    def execute(self, operation, params=None):
+        """Run one statement (autocommitted)"""
+        self._run('execute', operation, params)
+    
+    def executemany(self, operation, seq_params):
+        """Run one statement for every parameter set (autocommitted)"""
+        self._run('executemany', operation, seq_params)
+    
+    def fetchone(self):
+        """Next buffered row or None"""
+        if self._index >= len(self._rows):
+            return None
+        row = self._rows[self._index]
+        self._index += 1
+        return row
+    
+    def fetchmany(self, size=1):
+        """Up to size buffered rows"""
+        rows = self._rows[self._index:self._index + size]
+        self._index += len(rows)
+        return rows
+    
+    def fetchall(self):
+        """All remaining buffered rows"""
+        rows = self._rows[self._index:]
+        self._index = len(self._rows)
+        return rows
+    
+    def __iter__(self):
+        return iter(self.fetchall())
+    
+    def close(self):
+        """Drop buffered rows (there is no connection to give back)"""
+        self._rows = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+class PooledDatabase:
+    """Process-wide MySQL pool behind the db_conn interface the services use
+    
+    cursor() hands out PooledCursor objects; every statement autocommits on
+    its own borrowed connection, so commit() and rollback() have nothing
+    left to do and close() leaves the shared pool open. Writes that must
+    land together go through transaction(), which pins one connection.
+    """
+    
+    def __init__(self, pool_size=DB_POOL_SIZE, wait_timeout=DB_POOL_WAIT):
+        pool_size = max(1, min(pool_size, pooling.CNX_POOL_MAXSIZE))
+        # Sessions carry no state between statements, so skip the reset round trip
+        self.pool = pooling.MySQLConnectionPool(pool_name="elderly_care", pool_size=pool_size,
+                                                pool_reset_session=False, autocommit=True,
+                                                **DB_CONFIG)
+        self.pool_size = pool_size
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._checkout_ms = deque(maxlen=1000)  # Recent checkout latencies for percentiles
+        self.stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'waits': 0,       # Checkouts that found the pool exhausted
+            'timeouts': 0,
+            'retries': 0,     # Checkouts retried after a dropped connection
+            'max_wait_ms': 0.0
+        }
+    
+    def checkout(self):
+        """Borrow a connection, waiting up to wait_timeout for a free one"""
+        started = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self.count('waits')
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                self.count('timeouts')
+                raise PoolTimeout(f"No database connection free after {self.wait_timeout}s "
+                                  f"({self.pool_size} in use)")
+        for attempt in range(2):
+            try:
+                # The pool pings the connection and reconnects it if the server dropped it
+                cnx = self.pool.get_connection()
+                break
+            except mysql.connector.Error as e:
+                if attempt == 0 and e.errno in RETRYABLE_ERRORS:
+                    # Nothing has been sent yet, so trying again cannot apply anything twice
+                    self.count('retries')
+                    continue
+                self._slots.release()
+                raise
+            except Exception:
+                self._slots.release()
+                raise
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['in_use'] += 1
+            self.stats['peak_in_use'] = max(self.stats['peak_in_use'], self.stats['in_use'])
+            self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], elapsed_ms)
+            self._checkout_ms.append(elapsed_ms)
+        return cnx
+    
+    def count(self, key):
+        """Bump one of the event counters"""
+        with self._lock:
+            self.stats[key] += 1
+    
+    def release(self, cnx):
+        """Return a borrowed connection to the pool"""
+        try:
+            cnx.close()
+        finally:
+            with self._lock:
+                self.stats['in_use'] -= 1
+            self._slots.release()
+    
+    def cursor(self, *args, **kwargs):
+        """A PooledCursor (dictionary=True etc. are passed to the real cursor)"""
+        return PooledCursor(self, kwargs)
+    
+    def commit(self):
+        """Single statements autocommit; multi-statement writes use transaction()"""
+    
+    def rollback(self):
+        """Single statements autocommit; multi-statement writes use transaction()"""
+    
+    @contextmanager
+    def transaction(self):
+        """Pin one connection for several statements: commit on success, roll back on error
+        
+        Yields a buffered cursor on that connection. Nothing is retried; if
+        the connection drops the whole transaction fails and is rolled back.
+        """
+        cnx = self.checkout()
+        try:
+            cnx.start_transaction()
+            cursor = cnx.cursor(buffered=True)
+            try:
+                yield cursor
+                cnx.commit()
+            except BaseException:
+                try:
+                    cnx.rollback()
+                except mysql.connector.Error:
+                    pass  # Connection already gone; the server discards the transaction
+                raise
+            finally:
+                cursor.close()
+        finally:
+            self.release(cnx)
+    
+    def close(self):
+        """The pool is shared by the whole process and stays open"""
+    
+    def reconnect(self, *args, **kwargs):
+        """Health check: borrow a connection and ping it (reconnecting if needed)"""
+        cnx = self.checkout()
+        try:
+            cnx.ping(reconnect=True, attempts=3, delay=1)
+        finally:
+            self.release(cnx)
+    
+    def is_connected(self):
+        """True if a pooled connection answers a ping"""
+        try:
+            self.reconnect()
+            return True
+        except mysql.connector.Error:
+            return False
+    
+    def get_stats(self):
+        """Pool size, usage and checkout latency"""
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = sorted(self._checkout_ms)
+        stats['pool_size'] = self.pool_size
+        stats['avg_checkout_ms'] = round(sum(latencies) / len(latencies), 2) if latencies else 0.0
+        stats['p95_checkout_ms'] = round(latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else 0.0
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 2)
+        return stats
+
+_database = None
+_database_lock = threading.Lock()
 
 def get_db_connection():
-    """Try to connect to MySQL database"""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn, True
-    except mysql.connector.Error as e:
-        st.sidebar.warning(f"⚠️ MySQL not available: {e}")
-        return None, False
+    """Return the process-wide pooled database and whether MySQL is available"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            try:
+                _database = PooledDatabase()
+            except mysql.connector.Error as e:
+                st.sidebar.warning(f"⚠️ MySQL not available: {e}")
+                return None, False
+            
+            # Schema changes run once per process, never on the login path
+            success, msg = run_migrations(_database)
+            if not success:
+                st.sidebar.warning(msg)
+        return _database, True
+
+def get_pool_stats():
+    """Connection pool figures, or None before the pool exists"""
+    return _database.get_stats() if _database is not None else None
 
 def create_tables(db_conn):
     """Create database tables automatically"""
@@ -344,3 +599,234 @@ def create_tables(db_conn):
         
     except Exception as e:
         return False, f"❌ Error creating tables: {e}"
+
+# ------------------ SCHEMA MIGRATIONS ------------------
+# Each migration runs once and is recorded in schema_migrations. Append new
+# ones with the next version number; never edit one that has shipped.
+
+SCHEMA_LOCK = "elderly_care_schema_migrations"
+
+# Hot queries filter on username and a time range
+COMPOSITE_INDEXES = [
+    ("vital_signs", "idx_username_timestamp", ("username", "timestamp")),
+    ("activity_logs", "idx_username_timestamp", ("username", "timestamp")),
+    ("mood_logs", "idx_username_timestamp", ("username", "timestamp")),
+    ("meals", "idx_username_timestamp", ("username", "timestamp")),
+    ("water_logs", "idx_username_timestamp", ("username", "timestamp")),
+    ("location_logs", "idx_username_timestamp", ("username", "timestamp")),
+    ("medication_logs", "idx_username_taken_at", ("username", "taken_at")),
+    ("sos_logs", "idx_username_timestamp", ("username", "timestamp")),
+]
+
+def index_exists(cursor, table, index_name):
+    """Check information_schema for an index on a table in the current database"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index_name))
+    return cursor.fetchone() is not None
+
+def column_exists(cursor, table, column):
+    """Check information_schema for a column on a table in the current database"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+def migrate_base_tables(cnx):
+    """Version 1: the tables create_tables() has always made"""
+    success, msg = create_tables(cnx)
+    if not success:
+        raise RuntimeError(msg)
+
+def migrate_composite_indexes(cnx):
+    """Version 2: (username, time) indexes so range queries become index range scans"""
+    cursor = cnx.cursor(buffered=True)
+    for table, index_name, columns in COMPOSITE_INDEXES:
+        if index_exists(cursor, table, index_name):
+            continue
+        column_list = ", ".join(f"`{column}`" for column in columns)
+        # Secondary indexes build online in InnoDB; writes keep flowing
+        cursor.execute(f"ALTER TABLE `{table}` ADD INDEX `{index_name}` ({column_list}), "
+                       f"ALGORITHM=INPLACE, LOCK=NONE")
+    cursor.close()
+
+def migrate_conversation_keys(cnx):
+    """Version 3: messages.conversation_key (see ChatManager.conversation_key) indexed with id"""
+    cursor = cnx.cursor(buffered=True)
+    if not column_exists(cursor, "messages", "conversation_key"):
+        cursor.execute("ALTER TABLE messages ADD COLUMN conversation_key VARCHAR(101) NULL AFTER receiver")
+    
+    # Backfill with ChatManager.conversation_key itself (SQL LOWER/TRIM does
+    # not match str.strip().lower()), a batch of ids at a time so no single
+    # statement holds locks for long
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, sender, receiver FROM messages
+            WHERE id > %s AND conversation_key IS NULL ORDER BY id LIMIT 5000
+        """, (last_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany("UPDATE messages SET conversation_key = %s WHERE id = %s",
+                           [(ChatManager.conversation_key(sender, receiver), row_id)
+                            for row_id, sender, receiver in rows])
+        last_id = rows[-1][0]
+    
+    if not index_exists(cursor, "messages", "idx_conversation_id"):
+        cursor.execute("ALTER TABLE messages ADD INDEX idx_conversation_id (conversation_key, id), "
+                       "ALGORITHM=INPLACE, LOCK=NONE")
+    cursor.close()
+
+def migrate_audio_to_blob_store(cnx):
+    """Version 4: audio moves to the blob store; rows keep an audio_ref"""
+    blobs = get_blob_store(BLOB_STORE_DIR)
+    cursor = cnx.cursor(buffered=True)
+    for table in ("messages", "reminders"):
+        if not column_exists(cursor, table, "audio_ref"):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN audio_ref VARCHAR(71) NULL AFTER audio_data")
+        
+        # Move existing blobs a few rows at a time; audio_data is kept as an
+        # (emptied) column so older code reading it does not break
+        while True:
+            cursor.execute(f"""
+                SELECT id, audio_data FROM {table}
+                WHERE audio_data IS NOT NULL AND audio_ref IS NULL
+                LIMIT 100
+            """)
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row_id, audio in rows:
+                cursor.execute(f"UPDATE {table} SET audio_ref = %s, audio_data = NULL WHERE id = %s",
+                               (blobs.put(audio), row_id))
+    cursor.close()
+
+def migrate_compliance_rollup(cnx):
+    """Version 5: medication_compliance_daily, doses taken per user per day"""
+    cursor = cnx.cursor(buffered=True)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS medication_compliance_daily (
+            username VARCHAR(50) NOT NULL,
+            day DATE NOT NULL,
+            taken INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, day)
+        )
+    """)
+    # Existing history; MedicationManager.log_medication_taken keeps it current
+    cursor.execute("""
+        INSERT INTO medication_compliance_daily (username, day, taken)
+        SELECT username, DATE(taken_at), COUNT(*) FROM medication_logs
+        WHERE username IS NOT NULL AND taken_at IS NOT NULL
+        GROUP BY username, DATE(taken_at)
+        ON DUPLICATE KEY UPDATE taken = VALUES(taken)
+    """)
+    cursor.close()
+
+def migrate_metric_rollups(cnx):
+    """Version 6: hourly/daily count/sum/min/max/sumsq rollups of vitals and activities"""
+    cursor = cnx.cursor(buffered=True)
+    for table, bucket_type in (("metric_rollup_hourly", "DATETIME"), ("metric_rollup_daily", "DATE")):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                username VARCHAR(50) NOT NULL,
+                metric VARCHAR(80) NOT NULL,
+                bucket {bucket_type} NOT NULL,
+                count INT NOT NULL,
+                sum DOUBLE NOT NULL,
+                min DOUBLE NOT NULL,
+                max DOUBLE NOT NULL,
+                sumsq DOUBLE NOT NULL,
+                PRIMARY KEY (username, metric, bucket)
+            )
+        """)
+    # Existing history; new rows are folded in by utils.write_behind.insert_row
+    rollups.rebuild(cursor)
+    cursor.close()
+
+def migrate_audio_ref_indexes(cnx):
+    """Version 7: audio_ref indexes so deleting a blob can check it is unreferenced"""
+    cursor = cnx.cursor(buffered=True)
+    for table in ("messages", "reminders"):
+        if not index_exists(cursor, table, "idx_audio_ref"):
+            cursor.execute(f"ALTER TABLE `{table}` ADD INDEX `idx_audio_ref` (`audio_ref`), "
+                           f"ALGORITHM=INPLACE, LOCK=NONE")
+    cursor.close()
+
+def migrate_write_behind_ledger(cnx):
+    """Version 8: write_behind_applied, ids of buffered rows already inserted"""
+    cursor = cnx.cursor(buffered=True)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS write_behind_applied (
+            row_id CHAR(32) PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_applied_at (applied_at)
+        )
+    """)
+    cursor.close()
+
+MIGRATIONS = [
+    (1, "Base tables", migrate_base_tables),
+    (2, "Composite (username, timestamp) indexes", migrate_composite_indexes),
+    (3, "Chat conversation keys", migrate_conversation_keys),
+    (4, "Audio in the blob store", migrate_audio_to_blob_store),
+    (5, "Daily medication compliance rollup", migrate_compliance_rollup),
+    (6, "Hourly and daily metric rollups", migrate_metric_rollups),
+    (7, "Audio reference indexes", migrate_audio_ref_indexes),
+    (8, "Write-behind applied row ids", migrate_write_behind_ledger),
+]
+
+def run_migrations(database):
+    """Apply pending schema migrations in order and record each version"""
+    try:
+        # One connection for the whole run: the advisory lock is per session
+        cnx = database.checkout()
+    except Exception as e:
+        return False, f"❌ Schema migrations skipped: {e}"
+    
+    try:
+        cursor = cnx.cursor(buffered=True)
+        # Serialise concurrent app processes starting at the same time
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (SCHEMA_LOCK,))
+        if not cursor.fetchone()[0]:
+            cursor.close()
+            return False, "❌ Schema migrations skipped: another process holds the migration lock"
+        
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255),
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+            
+            new_versions = []
+            for version, description, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                migrate(cnx)
+                cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                               (version, description))
+                cnx.commit()
+                new_versions.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SCHEMA_LOCK,))
+            cursor.fetchall()
+            cursor.close()
+        
+        latest = MIGRATIONS[-1][0]
+        if new_versions:
+            return True, f"✅ Schema migrated to version {latest} (applied {', '.join(map(str, new_versions))})"
+        return True, f"✅ Schema is up to date (version {latest})"
+    
+    except Exception as e:
+        return False, f"❌ Schema migration failed: {e}"
+    finally:
+        database.release(cnx)
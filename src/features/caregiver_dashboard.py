@@ -1,151 +1,177 @@
 import streamlit as st
 from datetime import datetime, timedelta
+import json
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Add src directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config import TIMEZONE
-from core.vital_signs import VitalSignsTracker
+from config import TIMEZONE, SUMMARY_CACHE_TTL
+from core.vital_signs import VitalSignsTracker, NORMAL_RANGES
 from core.activity_recognition import ActivityRecognition
 from core.medication_manager import MedicationManager
+from utils.write_tracker import versions
+
+# Tables the daily summary reads; a write to any of them for a user drops
+# that user's cached summary
+SUMMARY_TABLES = ("activity_logs", "meals", "water_logs", "mood_logs", "medication_logs",
+                  "medications", "sos_logs", "vital_signs")
+INACTIVITY_HOURS = 4
+
+_TODAY = "{column} >= CURDATE() AND {column} < CURDATE() + INTERVAL 1 DAY"
+_ABNORMAL = " OR ".join(f"(vital_type = '{vital}' AND (value < {low} OR value > {high}))"
+                        for vital, (low, high) in NORMAL_RANGES.items())
+
+# One statement of scalar subqueries: counts for today, the latest mood and
+# the alert inputs (abnormal vitals, last activity, refills) as JSON. Day
+# bounds are ranges rather than DATE(col) so the (username, timestamp)
+# indexes are used.
+DAILY_SUMMARY_QUERY = f"""
+    SELECT
+        (SELECT COUNT(*) FROM activity_logs
+         WHERE username = %(username)s AND {_TODAY.format(column="timestamp")}),
+        (SELECT COUNT(*) FROM meals
+         WHERE username = %(username)s AND {_TODAY.format(column="timestamp")}),
+        (SELECT COALESCE(SUM(amount_ml), 0) FROM water_logs
+         WHERE username = %(username)s AND {_TODAY.format(column="timestamp")}),
+        (SELECT JSON_OBJECT('emoji', mood_emoji, 'text', mood_text) FROM mood_logs
+         WHERE username = %(username)s ORDER BY timestamp DESC LIMIT 1),
+        (SELECT COUNT(*) FROM medication_logs
+         WHERE username = %(username)s AND {_TODAY.format(column="taken_at")}),
+        (SELECT COUNT(*) FROM medications
+         WHERE username = %(username)s AND start_date <= CURDATE()
+         AND (end_date IS NULL OR end_date >= CURDATE())),
+        (SELECT COUNT(*) FROM sos_logs
+         WHERE username = %(username)s AND {_TODAY.format(column="timestamp")}),
+        (SELECT MAX(timestamp) FROM activity_logs
+         WHERE username = %(username)s AND timestamp >= DATE_SUB(NOW(), INTERVAL %(inactive_hours)s HOUR)),
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT('vital', vital_type, 'value', value, 'timestamp', timestamp))
+         FROM vital_signs
+         WHERE username = %(username)s AND timestamp >= DATE_SUB(NOW(), INTERVAL 1 DAY)
+         AND ({_ABNORMAL})),
+        (SELECT JSON_ARRAYAGG(JSON_OBJECT('medication', name))
+         FROM medications
+         WHERE username = %(username)s AND start_date <= %(today)s
+         AND end_date BETWEEN %(today)s AND DATE_ADD(%(today)s, INTERVAL 7 DAY))
+"""
+
+# Doses taken per day from the rollup, and the medications active at any point
+# in the window; days without doses are filled in Python so this runs on any
+# MySQL version and for any window length
+COMPLIANCE_TAKEN_QUERY = """
+    SELECT day, taken FROM medication_compliance_daily
+    WHERE username = %s AND day >= %s AND day < %s
+"""
+COMPLIANCE_ACTIVE_QUERY = """
+    SELECT start_date, end_date FROM medications
+    WHERE username = %s AND start_date < %s AND (end_date IS NULL OR end_date >= %s)
+"""
+
+_summary_cache = {}   # username -> ((date, write versions), expires at, summary)
+_summary_lock = threading.Lock()
 
 class CaregiverDashboard:
     def __init__(self, db_conn, db_available):
         self.db_conn = db_conn
         self.db_available = db_available
+        # Services used for alerts when the database is unavailable
+        self.vital_tracker = VitalSignsTracker(db_conn, db_available)
+        self.activity = ActivityRecognition(db_conn, db_available)
+        self.med_manager = MedicationManager(db_conn, db_available)
     
     def get_daily_summary(self, username):
-        """Get summary of elderly person's day"""
-        summary = {
-            "date": datetime.now(TIMEZONE).strftime("%Y-%m-%d"),
-            "activities": self._get_activity_count(username),
-            "meals": self._get_meal_count(username),
-            "water_intake": self._get_water_intake(username),
-            "mood": self._get_latest_mood(username),
-            "medication_compliance": self._get_medication_compliance(username),
-            "falls_detected": self._get_fall_count(username),
-            "alerts": self._get_alerts(username)
-        }
-        return summary
+        """Get summary of elderly person's day (cached until one of its tables is written)"""
+        today = datetime.now(TIMEZONE).date()
+        current = versions(SUMMARY_TABLES, username)
+        with _summary_lock:
+            cached = _summary_cache.get(username)
+            if cached and cached[0] == (today, current) and cached[1] > time.monotonic():
+                return dict(cached[2])
     
-    def _get_activity_count(self, username):
-        """Count activities today"""
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM activity_logs
-                    WHERE username = %s AND DATE(timestamp) = CURDATE()
-                """, (username,))
-                result = cursor.fetchone()
-                return result[0] if result else 0
+                summary = self._query_daily_summary(username, today)
             except Exception as e:
-                return 0
-        return 0
+                print(f"Error building daily summary: {e}")
+                summary = self._empty_summary(today)
+                summary["alerts"] = self._get_alerts(username)
+                return summary  # Not cached: retry on the next render
+        else:
+            summary = self._empty_summary(today)
+            summary["alerts"] = self._get_alerts(username)
+        
+        with _summary_lock:
+            _summary_cache[username] = ((today, current), time.monotonic() + SUMMARY_CACHE_TTL, summary)
+        return dict(summary)
     
-    def _get_meal_count(self, username):
-        """Count meals today"""
-        if self.db_available:
-            try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM meals
-                    WHERE username = %s AND DATE(timestamp) = CURDATE()
-                """, (username,))
-                result = cursor.fetchone()
-                return result[0] if result else 0
-            except Exception as e:
-                return 0
-        return 0
+    @staticmethod
+    def _empty_summary(today):
+        """Summary with no data (database unavailable)"""
+        return {
+            "date": today.strftime("%Y-%m-%d"),
+            "activities": 0,
+            "meals": 0,
+            "water_intake": 0,
+            "mood": None,
+            "medication_compliance": 0,
+            "falls_detected": 0,
+            "alerts": []
+        }
     
-    def _get_water_intake(self, username):
-        """Get water intake today"""
-        if self.db_available:
-            try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    SELECT SUM(amount_ml) FROM water_logs
-                    WHERE username = %s AND DATE(timestamp) = CURDATE()
-                """, (username,))
-                result = cursor.fetchone()
-                return result[0] if result and result[0] else 0
-            except Exception as e:
-                return 0
-        return 0
+    @staticmethod
+    def _json(value):
+        """Decode a JSON column (returned as str or bytes); None stays None"""
+        if value is None:
+            return None
+        return json.loads(value.decode() if isinstance(value, (bytes, bytearray)) else value)
     
-    def _get_latest_mood(self, username):
-        """Get latest mood check-in"""
-        if self.db_available:
-            try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    SELECT mood_emoji, mood_text FROM mood_logs
-                    WHERE username = %s ORDER BY timestamp DESC LIMIT 1
-                """, (username,))
-                result = cursor.fetchone()
-                return {"emoji": result[0], "text": result[1]} if result else None
-            except Exception as e:
-                return None
-        return None
+    def _query_daily_summary(self, username, today):
+        """Every summary figure and alert in one query (one round trip)"""
+        cursor = self.db_conn.cursor()
+        cursor.execute(DAILY_SUMMARY_QUERY, {"username": username, "today": today, "inactive_hours": INACTIVITY_HOURS})
+        (activities, meals, water, mood, taken, expected, falls,
+         last_activity, abnormal, refills) = cursor.fetchone()
     
-    def _get_medication_compliance(self, username):
-        """Get medication compliance percentage"""
-        if self.db_available:
-            try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM medication_logs
-                    WHERE username = %s AND DATE(taken_at) = CURDATE()
-                """, (username,))
-                taken = cursor.fetchone()[0]
-                
-                cursor.execute("""
-                    SELECT COUNT(*) FROM medications
-                    WHERE username = %s AND start_date <= CURDATE()
-                    AND (end_date IS NULL OR end_date >= CURDATE())
-                """, (username,))
-                expected = cursor.fetchone()[0]
-                
-                return (taken / expected * 100) if expected > 0 else 0
-            except Exception as e:
-                return 0
-        return 0
+        alerts = []
+        for a in sorted(self._json(abnormal) or [], key=lambda a: a["timestamp"], reverse=True):
+            alerts.append({"type": "vital", "message": f"Abnormal {a['vital']}: {a['value']}"})
     
-    def _get_fall_count(self, username):
-        """Count falls detected today"""
-        if self.db_available:
-            try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM sos_logs
-                    WHERE username = %s AND DATE(timestamp) = CURDATE()
-                """, (username,))
-                result = cursor.fetchone()
-                return result[0] if result else 0
-            except Exception as e:
-                return 0
-        return 0
+        inactivity = ActivityRecognition.inactivity_status(last_activity, INACTIVITY_HOURS)
+        if inactivity.get("inactive"):
+            alerts.append({"type": "activity", "message": inactivity.get("alert", "Unusual inactivity")})
+    
+        alerts.extend([{"type": "medication", "message": f"Refill needed: {r['medication']}"}
+                       for r in self._json(refills) or []])
+    
+        return {
+            "date": today.strftime("%Y-%m-%d"),
+            "activities": activities or 0,
+            "meals": meals or 0,
+            "water_intake": water or 0,
+            "mood": self._json(mood),
+            "medication_compliance": (taken / expected * 100) if expected else 0,
+            "falls_detected": falls or 0,
+            "alerts": alerts
+        }
     
     def _get_alerts(self, username):
-        """Get active alerts"""
+        """Get active alerts through the individual services (no database or query failed)"""
         alerts = []
         
         # Check for abnormal vitals
-        vital_tracker = VitalSignsTracker(self.db_conn, self.db_available)
-        abnormal = vital_tracker.check_abnormal_readings(username)
+        abnormal = self.vital_tracker.check_abnormal_readings(username)
         alerts.extend([{"type": "vital", "message": f"Abnormal {a['vital']}: {a['value']}"} for a in abnormal])
         
         # Check for inactivity
-        activity = ActivityRecognition(self.db_conn, self.db_available)
-        inactivity = activity.detect_unusual_inactivity(username)
+        inactivity = self.activity.detect_unusual_inactivity(username, INACTIVITY_HOURS)
         if inactivity.get("inactive"):
             alerts.append({"type": "activity", "message": inactivity.get("alert", "Unusual inactivity")})
         
         # Check for medication refills
-        med_manager = MedicationManager(self.db_conn, self.db_available)
-        refills = med_manager.check_refill_needed(username)
+        refills = self.med_manager.check_refill_needed(username)
         alerts.extend([{"type": "medication", "message": f"Refill needed: {r['medication']}"} for r in refills])
         
         return alerts
@@ -165,12 +191,12 @@ class CaregiverDashboard:
         if self.db_available:
             try:
                 cursor = self.db_conn.cursor()
+                # Daily rollup: one row per day however many readings there were
                 cursor.execute("""
-                    SELECT DATE(timestamp), AVG(value) FROM vital_signs
-                    WHERE username = %s AND vital_type = 'heart_rate'
-                    AND timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY DATE(timestamp)
-                    ORDER BY DATE(timestamp)
+                    SELECT bucket, sum / count FROM metric_rollup_daily
+                    WHERE username = %s AND metric = 'vital:heart_rate'
+                    AND bucket >= DATE(DATE_SUB(NOW(), INTERVAL %s DAY))
+                    ORDER BY bucket
                 """, (username, days))
                 return cursor.fetchall()
             except Exception as e:
@@ -183,11 +209,12 @@ class CaregiverDashboard:
             try:
                 cursor = self.db_conn.cursor()
                 cursor.execute("""
-                    SELECT DATE(timestamp), COUNT(*) FROM activity_logs
-                    WHERE username = %s AND timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                    GROUP BY DATE(timestamp)
-                    ORDER BY DATE(timestamp)
-                """, (username, days))
+                    SELECT bucket, CAST(SUM(count) AS SIGNED) FROM metric_rollup_daily
+                    WHERE username = %s AND metric LIKE %s
+                    AND bucket >= DATE(DATE_SUB(NOW(), INTERVAL %s DAY))
+                    GROUP BY bucket
+                    ORDER BY bucket
+                """, (username, "activity:%", days))
                 return cursor.fetchall()
             except Exception as e:
                 return []
@@ -209,31 +236,24 @@ class CaregiverDashboard:
         return []
     
     def _get_compliance_trend(self, username, days):
-        """Get medication compliance trend"""
+        """Get medication compliance trend (two queries, whatever the window)"""
         trend = []
-        for i in range(days, 0, -1):
-            date = (datetime.now(TIMEZONE) - timedelta(days=i)).date()
-            # Calculate compliance for that day
-            if self.db_available:
-                try:
-                    cursor = self.db_conn.cursor()
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM medication_logs
-                        WHERE username = %s AND DATE(taken_at) = %s
-                    """, (username, date))
-                    taken = cursor.fetchone()[0]
-                    
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM medications
-                        WHERE username = %s AND start_date <= %s
-                        AND (end_date IS NULL OR end_date >= %s)
-                    """, (username, date, date))
-                    expected = cursor.fetchone()[0]
-                    
-                    compliance = (taken / expected * 100) if expected > 0 else 0
-                    trend.append((date, compliance))
-                except Exception as e:
-                    pass
+        if self.db_available and days > 0:
+            try:
+                today = datetime.now(TIMEZONE).date()
+                first = today - timedelta(days=days)
+                cursor = self.db_conn.cursor()
+                cursor.execute(COMPLIANCE_TAKEN_QUERY, (username, first, today))
+                taken_by_day = dict(cursor.fetchall())
+                cursor.execute(COMPLIANCE_ACTIVE_QUERY, (username, today, first))
+                active = cursor.fetchall()
+                for offset in range(days):
+                    date = first + timedelta(days=offset)
+                    expected = sum(1 for start, end in active if start <= date and (end is None or end >= date))
+                    taken = taken_by_day.get(date, 0)
+                    trend.append((date, (taken / expected * 100) if expected > 0 else 0))
+            except Exception as e:
+                print(f"Error fetching compliance trend: {e}")
         
         return trend
     
@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime, timedelta
 from config import TIMEZONE
+from utils.write_tracker import note_write
 
 class MoodTracker:
     def __init__(self, db_conn, db_available):
@@ -24,6 +25,7 @@ class MoodTracker:
                     VALUES (%s, %s, %s, %s, %s)
                 """, (username, mood_emoji, mood_text, notes, timestamp))
                 self.db_conn.commit()
+                note_write("mood_logs", username)
                 return True
             except Exception as e:
                 print(f"Error logging mood: {e}")
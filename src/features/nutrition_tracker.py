@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime
 from config import TIMEZONE
+from utils.write_tracker import note_write
 
 class NutritionTracker:
     def __init__(self, db_conn, db_available):
@@ -35,6 +36,7 @@ class NutritionTracker:
                     VALUES (%s, %s, %s, %s)
                 """, (username, meal_name, str(food_items), timestamp))
                 self.db_conn.commit()
+                note_write("meals", username)
                 return True
             except Exception as e:
                 print(f"Error logging meal: {e}")
@@ -63,6 +65,7 @@ class NutritionTracker:
                     VALUES (%s, %s, %s)
                 """, (username, amount_ml, timestamp))
                 self.db_conn.commit()
+                note_write("water_logs", username)
                 return True
             except Exception as e:
                 print(f"Error logging water: {e}")
@@ -5,6 +5,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import streamlit as st
 from datetime import datetime
 from config import TIMEZONE
+from utils.write_behind import insert_row
 import requests
 
 class SmartHomeController:
@@ -49,12 +50,8 @@ class SmartHomeController:
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO device_logs (device_id, action, timestamp)
-                    VALUES (%s, %s, %s)
-                """, (device_id, str(action), datetime.now(TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")))
-                self.db_conn.commit()
+                insert_row(self.db_conn, "device_logs", ("device_id", "action", "timestamp"),
+                           (device_id, str(action), datetime.now(TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")))
             except Exception as e:
                 print(f"Error logging action: {e}")
         
@@ -13,10 +13,10 @@ import atexit
 import time
 
 # Import custom modules
-from config import NGROK_AUTH_TOKEN, NGROK_ADDR, NGROK_DOMAIN, TIMEZONE
-from database import get_db_connection, create_tables
+from config import NGROK_AUTH_TOKEN, NGROK_ADDR, NGROK_DOMAIN, TIMEZONE, INCIDENT_STORE_DIR, INCIDENT_STORE_MAX, BLOB_STORE_DIR
+from database import get_db_connection, get_pool_stats
 from utils.audio_system import AudioSystem
-from utils.chat_manager import ChatManager
+from utils.chat_manager import ChatManager, PAGE_SIZE as CHAT_PAGE_SIZE
 from core.vital_signs import VitalSignsTracker
 from core.medication_manager import MedicationManager
 from core.geofencing import GeofencingSystem
@@ -41,6 +41,8 @@ from utils.language_manager import LanguageManager
 from utils.offline_sync_manager import OfflineSyncManager
 from utils.reminder_system import ReminderSystem
 from utils.settings import SettingsManager
+from utils.incident_store import get_incident_store
+from utils.blob_store import get_blob_store
 from video.video_processor import VideoProcessor
 from ui.dashboard_customizer import DashboardCustomizer
 from utils.report_generator import ReportGenerator
@@ -80,6 +82,7 @@ st.sidebar.success("🌐 Public Link")
 st.sidebar.write(st.session_state.public_url)
 
 # ------------------ DATABASE CONNECTION ------------------
+# Process-wide pool: every session and service borrows a connection per query
 db_conn, db_available = get_db_connection()
 
 # ------------------ SESSION STATE ------------------
@@ -99,7 +102,7 @@ if "logged_in" not in st.session_state:
     st.session_state.chat_target = None
     st.session_state.chat_history = []
     st.session_state.voice_message = None
-    st.session_state.incidents = []      # Store snapshots of falls
+    st.session_state.incident_page = 0   # Gallery page (snapshots live in the incident store)
     st.session_state.alert_active = False # Global alert status
     st.session_state.motion_history = [0] * 60 # Last 60 minutes of motion counts
 
@@ -107,16 +110,23 @@ if "logged_in" not in st.session_state:
 if st.session_state.get("video_processor") is None:
     st.session_state.video_processor = VideoProcessor()
 
+# Shared on-disk incident store (one per process, not per session)
+incident_store = get_incident_store(INCIDENT_STORE_DIR, INCIDENT_STORE_MAX)
+
+def sync_incidents():
+    """Move snapshots from the VideoProcessor into the incident store"""
+    if not st.session_state.get("current_user"):
+        return  # Kept pending until someone owns them
+    if st.session_state.video_processor and hasattr(st.session_state.video_processor, 'pending_incidents'):
+        while st.session_state.video_processor.pending_incidents:
+            new_incid = st.session_state.video_processor.pending_incidents.pop(0)
+            incident_store.add(new_incid["image"], st.session_state.current_user, timestamp=new_incid["timestamp"],
+                               confidence=new_incid.get("confidence"), event="Fall Detected")
+            st.session_state.incident_page = 0  # Show the newest incident
+            st.session_state.alert_active = True # Trigger the Global Banner
+
 # --- Sync Incidents from VideoProcessor ---
-if st.session_state.video_processor and hasattr(st.session_state.video_processor, 'pending_incidents'):
-    while st.session_state.video_processor.pending_incidents:
-        new_incid = st.session_state.video_processor.pending_incidents.pop(0)
-        st.session_state.incidents.append({
-            "time": new_incid["timestamp"],
-            "image": new_incid["image"],
-            "event": "Fall Detected"
-        })
-        st.session_state.alert_active = True # Trigger the Global Banner
+sync_incidents()
 
 if st.session_state.get("audio_system") is None:
     st.session_state.audio_system = AudioSystem()
@@ -337,9 +347,6 @@ if not st.session_state.logged_in:
                             st.session_state.reminders = []
                             st.session_state.start_time = datetime.now(TIMEZONE)
                             
-                            # Create tables if they don't exist
-                            create_tables(db_conn)
-                            
                             st.success(f"✅ Welcome {username}!")
                             st.rerun()
                         else:
@@ -546,22 +553,36 @@ else:
                         cursor = db_conn.cursor()
                         cursor.execute("SHOW TABLES LIKE 'messages'")
                         if not cursor.fetchone():
-                            st.warning("⚠️ **Sync Table Missing**: Click 'Create Tables Automatically' in the sidebar to enable chat sync.")
+                            st.warning("⚠️ **Sync Table Missing**: Click 'Run Schema Migrations' in Settings to enable chat sync.")
                     except: pass
                 
                 # Refresh button
                 if st.button("🔃 REFRESH CHAT", use_container_width=True):
                     st.rerun()
                 
-                # Fetch messages
-                messages = st.session_state.chat_manager.get_messages(st.session_state.current_user, selected_chat)
+                # Fetch messages: the newest page when the conversation opens,
+                # then only rows newer than the last one shown (keyset on id)
+                chat_manager = st.session_state.chat_manager
+                chat_key = chat_manager.conversation_key(st.session_state.current_user, selected_chat)
+                chat_view = st.session_state.get("chat_view")
+                new_messages = []
+                if not chat_view or chat_view["key"] != chat_key:
+                    page = chat_manager.get_messages(st.session_state.current_user, selected_chat)
+                    chat_view = {"key": chat_key, "messages": page, "has_older": len(page) == CHAT_PAGE_SIZE}
+                    st.session_state.chat_view = chat_view
+                else:
+                    newest_id = chat_view["messages"][-1][0] if chat_view["messages"] else 0
+                    new_messages = chat_manager.get_messages(st.session_state.current_user, selected_chat,
+                                                             after_id=newest_id)
+                    chat_view["messages"].extend(new_messages)
+                messages = chat_view["messages"]
                 
                 # Chat and Sidebar Debug
                 with st.expander("🛠️ Connection Details"):
                     st.write(f"Logged in as: `{st.session_state.current_user}`")
                     st.write(f"Chatting with: `{selected_chat}`")
                     st.write(f"DB Mode: `{'🟢 SYNCED' if db_available else '🔴 OFFLINE'}`")
-                    st.write(f"Found in this chat: `{len(messages)}` messages")
+                    st.write(f"Loaded in this chat: `{len(messages)}` messages")
                     
                     if db_available:
                         st.markdown("---")
@@ -581,27 +602,25 @@ else:
                 # Chat container
                 chat_container = st.container(height=500, border=True)
                 
-                # Check for new messages for notification
-                if messages:
-                    latest_msg = messages[-1]
-                    msg_sender = latest_msg[0]
-                    # We only care about the ID for tracking "newness"
-                    # But we only toast if the SENDER is the other person
-                    current_max_id = st.session_state.chat_manager.get_latest_message_id(st.session_state.current_user, selected_chat)
-                    
-                    if "last_max_id" not in st.session_state:
-                        st.session_state.last_max_id = current_max_id
-                    
-                    if current_max_id > st.session_state.last_max_id:
-                        if msg_sender != st.session_state.current_user:
-                            st.toast(f"💬 New message from {msg_sender}!", icon="👋")
-                        st.session_state.last_max_id = current_max_id
+                # Notify about new messages from the other person
+                incoming = [m for m in new_messages
+                            if str(m[1]).strip().lower() != str(st.session_state.current_user).strip().lower()]
+                if incoming:
+                    st.toast(f"💬 New message from {incoming[-1][1]}!", icon="👋")
 
                 with chat_container:
+                    if chat_view["has_older"] and messages:
+                        if st.button("⬆️ Load older messages", use_container_width=True, key="chat_load_older"):
+                            older = chat_manager.get_messages(st.session_state.current_user, selected_chat,
+                                                              before_id=messages[0][0])
+                            chat_view["messages"][:0] = older
+                            chat_view["has_older"] = len(older) == CHAT_PAGE_SIZE
+                            st.rerun()
+                    
                     if not messages:
                         st.info("No messages between you yet. Start the conversation below!")
                     else:
-                        for i, (msg_sender, msg_content, msg_audio, msg_time) in enumerate(messages):
+                        for msg_id, msg_sender, msg_content, msg_has_audio, msg_time in messages:
                             # FIXED: Case-insensitive 'is_me' check (prevents your messages showing on the left)
                             is_me = str(msg_sender).strip().lower() == str(st.session_state.current_user).strip().lower()
                             align = "flex-end" if is_me else "flex-start"
@@ -619,7 +638,7 @@ else:
                                 </div>
                                 """, unsafe_allow_html=True)
                             
-                            if msg_audio:
+                            if msg_has_audio:
                                 with st.container():
                                     st.markdown(f"""
                                     <div class="chat-bubble {bubble_class}" style="border: 1px solid rgba(255,255,255,0.2);">
@@ -627,8 +646,12 @@ else:
                                         🎤 Voice Note ({msg_time})
                                     </div>
                                     """, unsafe_allow_html=True)
-                                    if st.button(f"▶️ Play", key=f"v_play_{i}_{msg_time}"):
-                                        st.session_state.audio_system.play_audio(BytesIO(msg_audio))
+                                    if st.button(f"▶️ Play", key=f"v_play_{msg_id}"):
+                                        # Audio bytes are only fetched when played
+                                        msg_audio = chat_manager.get_message_audio(msg_id)
+                                        if msg_audio:
+                                            with msg_audio:
+                                                st.session_state.audio_system.play_audio(msg_audio)
                             
                             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -650,6 +673,8 @@ else:
                             if audio_data:
                                 if st.session_state.chat_manager.send_message(st.session_state.current_user, selected_chat, audio_data=audio_data.getvalue()):
                                     st.success("✅ Voice message sent!")
+                                else:
+                                    st.error("❌ Could not save the voice message")
                 
                 # Auto-refresh disabled to prevent sidebar darkening
                 # Users can click "REFRESH CHAT" button manually instead
@@ -859,8 +884,9 @@ else:
                     try:
                         cursor = db_conn.cursor()
                         cursor.execute(
-                            "INSERT INTO reminders (username, title, message, trigger_time, repeat_type, audio_data, status) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                            (st.session_state.current_user, reminder_title, reminder_message, trigger_time, repeat_option, audio_data.getvalue(), "pending")
+                            "INSERT INTO reminders (username, title, message, trigger_time, repeat_type, audio_ref, status) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                            (st.session_state.current_user, reminder_title, reminder_message, trigger_time, repeat_option,
+                             get_blob_store(BLOB_STORE_DIR).put(audio_data), "pending")
                         )
                         db_conn.commit()
                     except Exception as e:
@@ -956,12 +982,42 @@ else:
         
         # Incident Gallery (New)
         st.subheader("🚨 Incident Snapshot Gallery")
-        if st.session_state.incidents:
+        total_incidents = incident_store.count(st.session_state.current_user)
+        if total_incidents:
+            # Only this page's thumbnails are read from disk; full-size on request
+            per_page = 6
+            pages = (total_incidents + per_page - 1) // per_page
+            page = min(st.session_state.get("incident_page", 0), pages - 1)
             cols = st.columns(3)
-            for i, incident in enumerate(reversed(st.session_state.incidents[-6:])):
+            for i, incident in enumerate(incident_store.page(st.session_state.current_user, page, per_page)):
                 with cols[i % 3]:
-                    st.image(incident["image"], caption=f"Fall @ {incident['time']}", use_container_width=True)
-                    st.caption(f"Status: {incident['event']}")
+                    st.image(str(incident_store.thumbnail_path(incident["digest"])),
+                             caption=f"Fall @ {incident['time_label']}", use_container_width=True)
+                    confidence = f" • {incident['confidence']*100:.0f}%" if incident["confidence"] is not None else ""
+                    st.caption(f"Status: {incident['event']}{confidence}")
+                    if st.button("🔍 Full size", key=f"incident_full_{incident['id']}"):
+                        st.session_state.incident_full = incident["id"]
+            
+            nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+            with nav_prev:
+                if st.button("⬅️ Newer", disabled=page == 0, key="incident_newer"):
+                    st.session_state.incident_page = page - 1
+                    st.rerun()
+            with nav_info:
+                st.caption(f"Page {page + 1} of {pages} • {total_incidents} incidents")
+            with nav_next:
+                if st.button("Older ➡️", disabled=page >= pages - 1, key="incident_older"):
+                    st.session_state.incident_page = page + 1
+                    st.rerun()
+            
+            full = (incident_store.get(st.session_state.incident_full, st.session_state.current_user)
+                    if st.session_state.get("incident_full") else None)
+            if full:
+                st.image(str(incident_store.image_path(full["digest"])),
+                         caption=f"Fall @ {full['time_label']} ({full['width']}x{full['height']})")
+                if st.button("✖ Close", key="incident_full_close"):
+                    st.session_state.incident_full = None
+                    st.rerun()
         else:
             st.info("No safety incidents recorded. System is operating normally.")
             
@@ -1039,15 +1095,7 @@ if st.session_state.get("settings_manager") is None:
 # ==================== PAGE ROUTING ====================
 else:
     # Sync Incidents from VideoProcessor
-    if st.session_state.video_processor and hasattr(st.session_state.video_processor, 'pending_incidents'):
-        while st.session_state.video_processor.pending_incidents:
-            new_incid = st.session_state.video_processor.pending_incidents.pop(0)
-            st.session_state.incidents.append({
-                "time": new_incid["timestamp"],
-                "image": new_incid["image"],
-                "event": "Fall Detected"
-            })
-            st.session_state.alert_active = True
+    sync_incidents()
 
     # Check for triggered reminders
     if hasattr(st.session_state, 'triggered_reminders') and st.session_state.triggered_reminders:
@@ -1107,6 +1155,14 @@ else:
     else:
         st.sidebar.metric("Active Reminders", 0)
     
+    # Shared by every session; waits/timeouts mean the pool is too small
+    pool_stats = get_pool_stats()
+    if pool_stats:
+        st.sidebar.metric("DB Connections", f"{pool_stats['in_use']}/{pool_stats['pool_size']}",
+                          help=f"Checkout avg {pool_stats['avg_checkout_ms']} ms, "
+                               f"p95 {pool_stats['p95_checkout_ms']} ms • waits {pool_stats['waits']}, "
+                               f"timeouts {pool_stats['timeouts']} • peak {pool_stats['peak_in_use']}")
+    
     st.sidebar.markdown("---")
     if st.sidebar.button("🚪 Logout", use_container_width=True, key="nav_logout"):
         if st.session_state.reminder_system:
@@ -4,7 +4,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import streamlit as st
 from datetime import datetime
-from config import TIMEZONE
+from config import TIMEZONE, FRAME_SERVER_URL, FRAME_SERVER_PUBLIC_URL
 import requests
 import time
 import subprocess
@@ -15,7 +15,7 @@ def show_video_monitor():
     st.markdown(f"<h2 style='color:#FF5733;'>📹 LIVE VIDEO FEED</h2>", unsafe_allow_html=True)
     
     # Flask server URL
-    FLASK_URL = "http://127.0.0.1:5000"
+    FLASK_URL = FRAME_SERVER_URL
     
     # Initialize session state for monitoring
     if 'video_monitoring_active' not in st.session_state:
@@ -30,8 +30,9 @@ def show_video_monitor():
         video_placeholder = st.empty()
         status_placeholder = st.empty()
         
-        # Auto-refresh toggle
-        auto_refresh = st.checkbox("🔄 Auto-refresh (every 2 seconds)", value=True)
+        # Stream rate and auto-refresh for the detection widgets
+        stream_fps = st.slider("Stream frame rate (FPS)", 1, 30, 15)
+        auto_refresh = st.checkbox("🔄 Auto-refresh detection status (every 2 seconds)", value=True)
         refresh_interval = st.slider("Refresh interval (seconds)", 1, 10, 2)
         
         # Control buttons
@@ -124,19 +125,18 @@ def show_video_monitor():
         st.warning("⏹️ Monitoring is stopped. Click 'Start Monitoring' to resume.")
         return
     
-    # Fetch and display video frame
-    try:
-        response = requests.get(f"{FLASK_URL}/api/frame", timeout=5)
-        if response.status_code == 200:
-            video_placeholder.image(response.content, caption="Live Camera Feed", use_column_width=True)
-        else:
-            video_placeholder.error(f"Failed to fetch frame: {response.status_code}")
-    except requests.exceptions.ConnectionError:
-        video_placeholder.error("❌ Cannot connect to Flask server. Make sure frame_server.py is running on port 5000")
-    except Exception as e:
-        video_placeholder.error(f"Error fetching video: {str(e)}")
+    # Embed the MJPEG stream directly: the browser pulls frames from the
+    # frame server, so live video never goes through the Streamlit websocket.
+    # The markup stays identical across reruns, so refreshing the detection
+    # widgets below does not restart the stream.
+    video_placeholder.markdown(f"""
+    <img src="{FRAME_SERVER_PUBLIC_URL}/api/stream?fps={stream_fps}"
+         alt="Live Camera Feed - make sure frame_server.py is running on port 5000"
+         style="width:100%; border-radius:8px;">
+    """, unsafe_allow_html=True)
     
-    # Fetch detection status
+    # Fetch detection status (once per rerun, shared by both sections below)
+    detection = None
     try:
         response = requests.get(f"{FLASK_URL}/api/detection", timeout=5)
         if response.status_code == 200:
@@ -171,32 +171,54 @@ def show_video_monitor():
     st.markdown("---")
     st.subheader("📊 Detection Details")
     
+    if detection is not None:
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Confidence", f"{detection.get('confidence', 0)*100:.1f}%")
+        
+        with col2:
+            st.metric("Motion", detection.get('motion', 0))
+        
+        with col3:
+            aspect_ratio = detection.get('aspect_ratio', 0)
+            st.metric("Aspect Ratio", f"{aspect_ratio:.2f}" if aspect_ratio else "N/A")
+        
+        with col4:
+            timestamp = detection.get('timestamp', 0)
+            st.metric("Last Update", f"{datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}")
+        
+        # Show raw detection data
+        with st.expander("📋 Raw Detection Data"):
+            st.json(detection)
+        
+        st.caption(f"💡 Push clients can subscribe to `{FLASK_URL}/api/detection/stream` (server-sent events) instead of polling.")
+    else:
+        st.error("Could not fetch detection details")
+    
+    # Recent incidents: snapshots were pinned by the frame server at detection
+    # time, so the browser loads the exact triggering frame straight from it
+    st.markdown("---")
+    st.subheader("🚨 Recent Incidents")
+    
     try:
-        response = requests.get(f"{FLASK_URL}/api/detection", timeout=5)
-        if response.status_code == 200:
-            detection = response.json()
-            
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("Confidence", f"{detection.get('confidence', 0)*100:.1f}%")
-            
-            with col2:
-                st.metric("Motion", detection.get('motion', 0))
-            
-            with col3:
-                aspect_ratio = detection.get('aspect_ratio', 0)
-                st.metric("Aspect Ratio", f"{aspect_ratio:.2f}" if aspect_ratio else "N/A")
-            
-            with col4:
-                timestamp = detection.get('timestamp', 0)
-                st.metric("Last Update", f"{datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}")
-            
-            # Show raw detection data
-            with st.expander("📋 Raw Detection Data"):
-                st.json(detection)
+        response = requests.get(f"{FLASK_URL}/api/incidents", params={'limit': 6}, timeout=5)
+        incidents = response.json().get('incidents', []) if response.status_code == 200 else []
+        
+        if incidents:
+            cols = st.columns(3)
+            for idx, incident in enumerate(incidents):
+                with cols[idx % 3]:
+                    if incident.get('has_image'):
+                        st.image(f"{FRAME_SERVER_PUBLIC_URL}{incident['image_url']}", use_column_width=True)
+                    incident_time = datetime.fromtimestamp(incident['timestamp'], TIMEZONE).strftime('%H:%M:%S')
+                    st.caption(f"{incident['camera_id']} • {incident_time} • {incident['confidence']*100:.0f}%")
+                    if incident.get('clip_url'):
+                        st.markdown(f"[🎬 Clip]({FRAME_SERVER_PUBLIC_URL}{incident['clip_url']})")
+        else:
+            st.info("No incidents recorded since the frame server started")
     except Exception as e:
-        st.error(f"Could not fetch detection details: {str(e)}")
+        st.error(f"Could not fetch incidents: {str(e)}")
     
     # Health check
     st.markdown("---")
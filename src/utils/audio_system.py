@@ -58,13 +58,12 @@ class AudioSystem:
             return None
     
     def play_audio(self, audio_bytes):
-        """Play audio from bytes"""
+        """Play audio from bytes or any readable stream (e.g. a blob store file)"""
         try:
-            if isinstance(audio_bytes, BytesIO):
+            if isinstance(audio_bytes, (bytes, bytearray)):
+                audio_bytes = BytesIO(audio_bytes)
+            elif hasattr(audio_bytes, "seek"):
                 audio_bytes.seek(0)
-                audio_data = audio_bytes.read()
-            else:
-                audio_data = audio_bytes
             
             p = pyaudio.PyAudio()
             
@@ -76,8 +75,9 @@ class AudioSystem:
                 output=True
             )
             
-            # Play audio
-            stream.write(audio_data)
+            # Play audio, streamed a chunk at a time rather than loaded whole
+            for data in iter(lambda: audio_bytes.read(self.chunk * 2), b""):
+                stream.write(data)
             
             # Cleanup
             stream.stop_stream()
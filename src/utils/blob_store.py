@@ -0,0 +1,143 @@
+"""
+Content-addressed blob store for audio and other binary attachments
+Blobs are written once under their SHA-256 and rows keep only the reference
+("sha256:<hex>"), so identical recordings or beeps are stored a single time
+and history queries never carry the bytes. Deleting a row does not delete its
+blob: callers pass the refs they dropped to delete(), which removes only blobs
+no remaining row points at
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+REF_PATTERN = re.compile(r"^sha256:([0-9a-f]{64})$")
+# A blob stored or re-used this recently may belong to a row not yet inserted
+DELETE_GRACE_SECONDS = 300
+
+
+class BlobStore:
+    def __init__(self, root: str = ".blob_store"):
+        """Initialize the blob store under root"""
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()  # Orders put() against delete()
+    
+    def _path(self, ref: str) -> Path:
+        """Sharded file path for a reference; rejects anything that is not a sha256 ref"""
+        match = REF_PATTERN.match(ref or "")
+        if not match:
+            raise ValueError(f"Invalid blob reference: {ref!r}")
+        digest = match.group(1)
+        return self.root / digest[:2] / digest
+    
+    def put(self, data: Union[bytes, bytearray, BinaryIO]) -> str:
+        """Store bytes or a readable stream; returns its reference"""
+        if isinstance(data, (bytes, bytearray)):
+            data = BytesIO(data)
+        elif hasattr(data, "seek"):
+            data.seek(0)
+        
+        # Hash while spooling to a temp file so large streams never sit in memory
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in iter(lambda: data.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            
+            ref = f"sha256:{digest.hexdigest()}"
+            path = self._path(ref)
+            with self._lock:
+                if path.exists():
+                    os.unlink(tmp_path)  # Already stored: deduplicated
+                    os.utime(path)       # Re-used: keep delete() away from it
+                else:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(tmp_path, path)
+            return ref
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    
+    def open(self, ref: str) -> Optional[BinaryIO]:
+        """Open a blob for streaming reads, or None if it is missing"""
+        try:
+            return open(self._path(ref), "rb")
+        except FileNotFoundError:
+            logger.warning(f"Blob not found: {ref}")
+            return None
+    
+    def iter_chunks(self, ref: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield a blob in chunks"""
+        blob = self.open(ref)
+        if blob is None:
+            return
+        with blob:
+            yield from iter(lambda: blob.read(chunk_size), b"")
+    
+    def get(self, ref: str) -> Optional[bytes]:
+        """Whole blob as bytes (prefer open() for large blobs)"""
+        blob = self.open(ref)
+        if blob is None:
+            return None
+        with blob:
+            return blob.read()
+    
+    def exists(self, ref: str) -> bool:
+        """True if the blob is stored"""
+        return self._path(ref).exists()
+    
+    def size(self, ref: str) -> int:
+        """Blob size in bytes (0 if missing)"""
+        try:
+            return self._path(ref).stat().st_size
+        except FileNotFoundError:
+            return 0
+    
+    def is_recent(self, ref: str, grace_seconds: float = DELETE_GRACE_SECONDS) -> bool:
+        """True if the blob was written or re-used within grace_seconds"""
+        try:
+            return time.time() - self._path(ref).stat().st_mtime < grace_seconds
+        except FileNotFoundError:
+            return False
+    
+    def delete(self, ref: str, is_referenced: Callable[[str], bool],
+               grace_seconds: float = DELETE_GRACE_SECONDS) -> bool:
+        """Remove a blob once is_referenced(ref) is False; True if it was removed
+        
+        Blobs written or re-used within grace_seconds are kept, since the row
+        that will point at them may not be committed yet.
+        """
+        path = self._path(ref)
+        with self._lock:
+            if not path.exists() or self.is_recent(ref, grace_seconds):
+                return False
+            if is_referenced(ref):
+                return False
+            path.unlink(missing_ok=True)
+            return True
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_blob_store(root: str = ".blob_store") -> BlobStore:
+    """Process-wide store shared by every Streamlit session"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = BlobStore(root)
+        return _shared_store
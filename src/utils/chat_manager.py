@@ -1,11 +1,22 @@
 import mysql.connector
 from datetime import datetime
 from io import BytesIO
+from config import BLOB_STORE_DIR
+from utils.blob_store import get_blob_store
+
+PAGE_SIZE = 50  # Messages per history page
 
 class ChatManager:
     def __init__(self, db_conn, db_available):
         self.db_conn = db_conn
         self.db_available = db_available
+        self.blob_store = get_blob_store(BLOB_STORE_DIR)
+    
+    @staticmethod
+    def conversation_key(user1, user2):
+        """Order-independent, case-insensitive key for a pair of users (backfilled by migration 3)"""
+        a, b = sorted([str(user1).strip().lower(), str(user2).strip().lower()])
+        return f"{a}|{b}"
 
     def get_users(self, current_user):
         """Fetch all usernames except the current user"""
@@ -24,43 +35,86 @@ class ChatManager:
             users = [u for u in st.session_state.local_users.keys() if u != current_user]
         return users
 
-    def get_messages(self, user1, user2):
-        """Fetch message history between two users"""
+    def get_messages(self, user1, user2, after_id=None, before_id=None, limit=PAGE_SIZE):
+        """Fetch one page of history between two users, oldest first
+        
+        Rows are (id, sender, content, has_audio, timestamp); audio bytes are
+        loaded separately with get_message_audio(). Without ids this is the
+        newest page; after_id returns newer messages, before_id an older page.
+        """
         import streamlit as st
+        key = self.conversation_key(user1, user2)
         if self.db_available:
             try:
                 cursor = self.db_conn.cursor()
-                u1 = str(user1).strip().lower()
-                u2 = str(user2).strip().lower()
-                # Query that is very loose on case and whitespace
+                # Keyset pagination on (conversation_key, id): an index range
+                # scan whose cost depends on the page size, not the history
+                if after_id is not None:
+                    cursor.execute("""
+                        SELECT id, sender, content, audio_ref IS NOT NULL, timestamp
+                        FROM messages
+                        WHERE conversation_key = %s AND id > %s
+                        ORDER BY id ASC
+                        LIMIT %s
+                    """, (key, after_id, limit))
+                    return cursor.fetchall()
+                
                 cursor.execute("""
-                    SELECT sender, content, audio_data, timestamp 
-                    FROM messages 
-                    WHERE (LOWER(TRIM(sender)) = %s AND LOWER(TRIM(receiver)) = %s) 
-                       OR (LOWER(TRIM(sender)) = %s AND LOWER(TRIM(receiver)) = %s)
-                    ORDER BY timestamp ASC
-                """, (u1, u2, u2, u1))
-                return cursor.fetchall()
+                    SELECT id, sender, content, audio_ref IS NOT NULL, timestamp
+                    FROM messages
+                    WHERE conversation_key = %s AND id < %s
+                    ORDER BY id DESC
+                    LIMIT %s
+                """, (key, before_id if before_id is not None else 2 ** 63 - 1, limit))
+                return list(reversed(cursor.fetchall()))
             except Exception as e:
                 print(f"Error fetching messages: {e}")
         
-        # Fallback to session state
+        # Fallback to session state (ids are positions in the local list)
         if "local_messages" not in st.session_state:
             st.session_state.local_messages = []
         
         filtered = []
-        for msg in st.session_state.local_messages:
-            if (msg['sender'] == user1 and msg['receiver'] == user2) or \
-               (msg['sender'] == user2 and msg['receiver'] == user1):
-                # Convert dict to tuple format matching DB schema: (sender, content, audio_data, timestamp)
-                filtered.append((msg['sender'], msg.get('content'), msg.get('audio_data'), msg['timestamp']))
-        return filtered
+        for index, msg in enumerate(st.session_state.local_messages, start=1):
+            if self.conversation_key(msg['sender'], msg['receiver']) == key:
+                filtered.append((index, msg['sender'], msg.get('content'), msg.get('audio_ref') is not None, msg['timestamp']))
+        if after_id is not None:
+            return [m for m in filtered if m[0] > after_id][:limit]
+        if before_id is not None:
+            filtered = [m for m in filtered if m[0] < before_id]
+        return filtered[-limit:]
+    
+    def get_message_audio(self, message_id):
+        """Open the audio of one message as a stream from the blob store (None if it has none)"""
+        import streamlit as st
+        ref = None
+        if self.db_available:
+            try:
+                cursor = self.db_conn.cursor()
+                cursor.execute("SELECT audio_ref FROM messages WHERE id = %s", (message_id,))
+                row = cursor.fetchone()
+                ref = row[0] if row else None
+            except Exception as e:
+                print(f"Error fetching message audio: {e}")
+        else:
+            local = st.session_state.get("local_messages", [])
+            if 0 < message_id <= len(local):
+                ref = local[message_id - 1].get('audio_ref')
+        return self.blob_store.open(ref) if ref else None
 
     def send_message(self, sender, receiver, content=None, audio_data=None):
         """Send a new text or voice message"""
         import streamlit as st
         success = False
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Audio goes to the blob store; the row and session keep only the reference
+        audio_ref = None
+        if audio_data:
+            try:
+                audio_ref = self.blob_store.put(audio_data)
+            except Exception as e:
+                print(f"Error storing message audio: {e}")
+                return False  # Nothing to send: don't post an empty text message
 
         if self.db_available:
             try:
@@ -68,15 +122,16 @@ class ChatManager:
                 # Store as trimmed but original case, but query is case-insensitive
                 s = str(sender).strip()
                 r = str(receiver).strip()
-                if audio_data:
+                key = self.conversation_key(s, r)
+                if audio_ref:
                     cursor.execute(
-                        "INSERT INTO messages (sender, receiver, audio_data) VALUES (%s, %s, %s)",
-                        (s, r, audio_data)
+                        "INSERT INTO messages (sender, receiver, conversation_key, audio_ref) VALUES (%s, %s, %s, %s)",
+                        (s, r, key, audio_ref)
                     )
                 else:
                     cursor.execute(
-                        "INSERT INTO messages (sender, receiver, content) VALUES (%s, %s, %s)",
-                        (s, r, content)
+                        "INSERT INTO messages (sender, receiver, conversation_key, content) VALUES (%s, %s, %s, %s)",
+                        (s, r, key, content)
                     )
                 self.db_conn.commit()
                 success = True
@@ -91,7 +146,7 @@ class ChatManager:
             'sender': sender,
             'receiver': receiver,
             'content': content,
-            'audio_data': audio_data,
+            'audio_ref': audio_ref,
             'timestamp': timestamp
         })
         
@@ -104,9 +159,8 @@ class ChatManager:
         try:
             cursor = self.db_conn.cursor()
             cursor.execute("""
-                SELECT MAX(id) FROM messages 
-                WHERE (sender = %s AND receiver = %s) OR (sender = %s AND receiver = %s)
-            """, (user1, user2, user1, user2))
+                SELECT MAX(id) FROM messages WHERE conversation_key = %s
+            """, (self.conversation_key(user1, user2),))
             res = cursor.fetchone()
             return res[0] if res and res[0] else 0
         except Exception as e:
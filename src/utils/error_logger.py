@@ -9,6 +9,7 @@ from typing import Optional, Dict, Any
 import traceback
 from pathlib import Path
 import mysql.connector
+from utils.write_behind import insert_row
 
 # Create logs directory
 Path("logs").mkdir(exist_ok=True)
@@ -63,12 +64,9 @@ class ErrorLogger:
         # Log to database if available
         if self.db_available and self.db_conn:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO error_logs (error_id, error_type, message, severity, username, context, timestamp)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (error_id, error_type, message, severity, user, json.dumps(error_data), datetime.now()))
-                self.db_conn.commit()
+                insert_row(self.db_conn, "error_logs",
+                           ("error_id", "error_type", "message", "severity", "username", "context", "timestamp"),
+                           (error_id, error_type, message, severity, user, json.dumps(error_data), datetime.now()))
             except Exception as e:
                 self.logger.warning(f"Failed to log error to database: {e}")
         
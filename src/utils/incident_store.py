@@ -0,0 +1,251 @@
+"""
+Disk-backed, content-addressed store for fall incident snapshots
+Full-resolution JPEGs and thumbnails live on disk under their SHA-256, and a
+small SQLite index holds owner, time, camera and confidence, so sessions only
+ever load the page of their own thumbnails they are showing
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTH = 320
+JPEG_QUALITY = 90
+THUMBNAIL_QUALITY = 75
+
+
+class IncidentStore:
+    def __init__(self, root: str = ".incident_store", max_incidents: int = 5000):
+        """Initialize the incident store under root"""
+        self.root = Path(root)
+        self.media_dir = self.root / "media"
+        self.thumb_dir = self.root / "thumbs"
+        self.db_path = str(self.root / "index.db")
+        self.max_incidents = max_incidents
+        self._lock = threading.Lock()
+        self.media_dir.mkdir(parents=True, exist_ok=True)
+        self.thumb_dir.mkdir(parents=True, exist_ok=True)
+        self.init_index()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index (one short-lived connection per call)"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def init_index(self):
+        """Create the index table"""
+        try:
+            conn = self._connect()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS incidents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT,
+                    digest TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    time_label TEXT,
+                    camera_id TEXT,
+                    confidence REAL,
+                    event TEXT,
+                    width INTEGER,
+                    height INTEGER,
+                    image_bytes INTEGER
+                )
+            """)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(incidents)")}
+            if "username" not in columns:
+                # Indexes from before incidents had an owner; old rows stay hidden
+                conn.execute("ALTER TABLE incidents ADD COLUMN username TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_incidents_timestamp ON incidents (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_incidents_user_timestamp ON incidents (username, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_incidents_digest ON incidents (digest)")
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error initializing incident index: {e}")
+    
+    def _media_path(self, directory: Path, digest: str) -> Path:
+        """Sharded path for a digest (first two hex chars as directory)"""
+        return directory / digest[:2] / f"{digest}.jpg"
+    
+    def image_path(self, digest: str) -> Path:
+        """Full-resolution JPEG for a digest"""
+        return self._media_path(self.media_dir, digest)
+    
+    def thumbnail_path(self, digest: str) -> Path:
+        """Thumbnail JPEG for a digest"""
+        return self._media_path(self.thumb_dir, digest)
+    
+    @staticmethod
+    def _write_once(path: Path, data: bytes):
+        """Write a content-addressed file unless it already exists"""
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        with open(part, "wb") as f:
+            f.write(data)
+        os.replace(part, path)
+    
+    @staticmethod
+    def _to_bgr(image, channels: str) -> np.ndarray:
+        """Decode or convert an incident image to a BGR array"""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode incident image")
+            return frame
+        
+        frame = np.asarray(image)  # Also accepts PIL images (RGB)
+        if frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if frame.shape[2] == 4:
+            frame = frame[:, :, :3]
+        if channels.upper() == "RGB" or not isinstance(image, np.ndarray):
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        return frame
+    
+    @staticmethod
+    def _normalize_time(value) -> Tuple[float, str]:
+        """(epoch seconds, display label) from a datetime, epoch or preformatted string"""
+        if isinstance(value, datetime):
+            return value.timestamp(), value.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(value, (int, float)):
+            return float(value), datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+        now = time.time()
+        label = str(value) if value else datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        return now, label
+    
+    def add(self, image, username: str, timestamp=None, camera_id: str = "webcam",
+            confidence: Optional[float] = None, event: str = "Fall Detected",
+            channels: str = "RGB") -> Optional[int]:
+        """Store an incident image (array, PIL image or encoded bytes) for username; returns the incident id"""
+        try:
+            if isinstance(image, (bytes, bytearray, memoryview)) and bytes(image[:2]) == b"\xff\xd8":
+                # Already a JPEG: keep the original bytes
+                jpeg = bytes(image)
+                frame = self._to_bgr(jpeg, channels)
+            else:
+                frame = self._to_bgr(image, channels)
+                ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                if not ok:
+                    raise ValueError("JPEG encoding failed")
+                jpeg = buffer.tobytes()
+            
+            digest = hashlib.sha256(jpeg).hexdigest()
+            height, width = frame.shape[:2]
+            thumb_height = max(1, round(height * THUMBNAIL_WIDTH / width))
+            thumb = cv2.resize(frame, (THUMBNAIL_WIDTH, thumb_height), interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+            
+            epoch, label = self._normalize_time(timestamp)
+            # Files and row appear together under the lock prune() unlinks under
+            with self._lock:
+                self._write_once(self.image_path(digest), jpeg)
+                if ok:
+                    self._write_once(self.thumbnail_path(digest), buffer.tobytes())
+                conn = self._connect()
+                cursor = conn.execute("""
+                    INSERT INTO incidents (username, digest, timestamp, time_label, camera_id, confidence,
+                                           event, width, height, image_bytes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (username, digest, epoch, label, camera_id, confidence, event, width, height, len(jpeg)))
+                incident_id = cursor.lastrowid
+                conn.commit()
+                conn.close()
+            
+            self.prune()
+            return incident_id
+        except Exception as e:
+            logger.error(f"Error storing incident: {e}")
+            return None
+    
+    def count(self, username: str) -> int:
+        """Number of stored incidents for username"""
+        try:
+            conn = self._connect()
+            total = conn.execute("SELECT COUNT(*) FROM incidents WHERE username=?", (username,)).fetchone()[0]
+            conn.close()
+            return total
+        except Exception as e:
+            logger.error(f"Error counting incidents: {e}")
+            return 0
+    
+    def page(self, username: str, page: int = 0, per_page: int = 6) -> List[Dict]:
+        """Newest-first page of username's incident metadata (no image data)"""
+        try:
+            conn = self._connect()
+            rows = conn.execute("""
+                SELECT * FROM incidents WHERE username=?
+                ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?
+            """, (username, per_page, page * per_page)).fetchall()
+            conn.close()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching incidents: {e}")
+            return []
+    
+    def get(self, incident_id: int, username: str) -> Optional[Dict]:
+        """Metadata for one of username's incidents"""
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT * FROM incidents WHERE id=? AND username=?",
+                               (incident_id, username)).fetchone()
+            conn.close()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Error fetching incident {incident_id}: {e}")
+            return None
+    
+    def prune(self) -> int:
+        """Drop the oldest incidents beyond max_incidents and unreferenced media"""
+        if not self.max_incidents:
+            return 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                rows = conn.execute("""
+                    SELECT id, digest FROM incidents ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?
+                """, (self.max_incidents,)).fetchall()
+                if not rows:
+                    conn.close()
+                    return 0
+                conn.executemany("DELETE FROM incidents WHERE id=?", [(row["id"],) for row in rows])
+                digests = {row["digest"] for row in rows}
+                # Identical snapshots share files; only delete media nothing points at
+                orphans = [d for d in digests
+                           if not conn.execute("SELECT 1 FROM incidents WHERE digest=? LIMIT 1", (d,)).fetchone()]
+                conn.commit()
+                conn.close()
+                # Still under the lock, so add() cannot reuse a file between check and unlink
+                for digest in orphans:
+                    for path in (self.image_path(digest), self.thumbnail_path(digest)):
+                        path.unlink(missing_ok=True)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error pruning incidents: {e}")
+            return 0
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_incident_store(root: str = ".incident_store", max_incidents: int = 5000) -> IncidentStore:
+    """Process-wide store shared by every Streamlit session"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = IncidentStore(root, max_incidents)
+        return _shared_store
@@ -3,8 +3,13 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import streamlit as st
+import threading
 from datetime import datetime, timedelta
-from config import TIMEZONE
+from config import TIMEZONE, BLOB_STORE_DIR
+from utils.blob_store import get_blob_store, DELETE_GRACE_SECONDS
+from utils.write_behind import insert_row
+from utils.write_tracker import note_write
+from utils.rollups import METRIC_SOURCES, delete_user_metrics
 import json
 
 class PrivacyManager:
@@ -115,12 +120,8 @@ class PrivacyManager:
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
-                cursor.execute("""
-                    INSERT INTO access_logs (username, caregiver, resource_type, action, timestamp)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (username, caregiver, resource_type, action, timestamp))
-                self.db_conn.commit()
+                insert_row(self.db_conn, "access_logs", ("username", "caregiver", "resource_type", "action", "timestamp"),
+                           (username, caregiver, resource_type, action, timestamp))
             except Exception as e:
                 print(f"Error logging access: {e}")
         
@@ -197,46 +198,104 @@ class PrivacyManager:
         return export_data
     
     def delete_user_data(self, username, data_types=None):
-        """Delete user data (GDPR right to be forgotten)"""
+        """Delete user data (GDPR right to be forgotten)
+        
+        Rows and their rollups go in one transaction; audio blobs the deleted
+        messages and reminders pointed at are removed afterwards, unless another
+        row still references them.
+        """
         if data_types is None:
             data_types = ["messages", "vital_signs", "activity_logs", "reminders", "mood_logs"]
         
         deleted_count = 0
+        audio_refs = set()
         
         if self.db_available:
             try:
-                cursor = self.db_conn.cursor()
+                with self.db_conn.transaction() as cursor:
+                    for data_type in data_types:
+                        if data_type == "messages":
+                            cursor.execute("""
+                                SELECT DISTINCT audio_ref FROM messages
+                                WHERE (sender = %s OR receiver = %s) AND audio_ref IS NOT NULL
+                            """, (username, username))
+                            audio_refs.update(row[0] for row in cursor.fetchall())
+                            cursor.execute("""
+                                DELETE FROM messages WHERE sender = %s OR receiver = %s
+                            """, (username, username))
+                        elif data_type == "vital_signs":
+                            cursor.execute("""
+                                DELETE FROM vital_signs WHERE username = %s
+                            """, (username,))
+                        elif data_type == "activity_logs":
+                            cursor.execute("""
+                                DELETE FROM activity_logs WHERE username = %s
+                            """, (username,))
+                        elif data_type == "reminders":
+                            cursor.execute("""
+                                SELECT DISTINCT audio_ref FROM reminders
+                                WHERE username = %s AND audio_ref IS NOT NULL
+                            """, (username,))
+                            audio_refs.update(row[0] for row in cursor.fetchall())
+                            cursor.execute("""
+                                DELETE FROM reminders WHERE username = %s
+                            """, (username,))
+                        elif data_type == "mood_logs":
+                            cursor.execute("""
+                                DELETE FROM mood_logs WHERE username = %s
+                            """, (username,))
+                        
+                        deleted_count += cursor.rowcount
+                        if data_type in METRIC_SOURCES:
+                            delete_user_metrics(cursor, username, data_type)
                 
                 for data_type in data_types:
-                    if data_type == "messages":
-                        cursor.execute("""
-                            DELETE FROM messages WHERE sender = %s OR receiver = %s
-                        """, (username, username))
-                    elif data_type == "vital_signs":
-                        cursor.execute("""
-                            DELETE FROM vital_signs WHERE username = %s
-                        """, (username,))
-                    elif data_type == "activity_logs":
-                        cursor.execute("""
-                            DELETE FROM activity_logs WHERE username = %s
-                        """, (username,))
-                    elif data_type == "reminders":
-                        cursor.execute("""
-                            DELETE FROM reminders WHERE username = %s
-                        """, (username,))
-                    elif data_type == "mood_logs":
-                        cursor.execute("""
-                            DELETE FROM mood_logs WHERE username = %s
-                        """, (username,))
-                    
-                    deleted_count += cursor.rowcount
-                
-                self.db_conn.commit()
+                    note_write(data_type, username)
             except Exception as e:
                 print(f"Error deleting data: {e}")
+                return 0
+            
+            self._delete_audio(audio_refs)
         
         return deleted_count
     
+    def _audio_in_use(self, ref):
+        """True while any message or reminder still points at the blob"""
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            SELECT 1 FROM messages WHERE audio_ref = %s
+            UNION ALL
+            SELECT 1 FROM reminders WHERE audio_ref = %s
+            LIMIT 1
+        """, (ref, ref))
+        return cursor.fetchone() is not None
+    
+    def _delete_audio(self, refs):
+        """Remove blobs no row references; retry recently stored ones after the grace period"""
+        blob_store = get_blob_store(BLOB_STORE_DIR)
+        kept = []
+        for ref in refs:
+            try:
+                # Still-referenced blobs are simply left alone; only the
+                # grace period is worth waiting out
+                if not blob_store.delete(ref, self._audio_in_use) and blob_store.is_recent(ref):
+                    kept.append(ref)
+            except Exception as e:
+                print(f"Error deleting audio {ref}: {e}")
+        if kept:
+            # Fresh blobs are protected from a concurrent send; check them again once that passes
+            retry = threading.Timer(DELETE_GRACE_SECONDS + 1,
+                                    lambda: [self._delete_audio_once(blob_store, ref) for ref in kept])
+            retry.daemon = True
+            retry.start()
+    
+    def _delete_audio_once(self, blob_store, ref):
+        """Single delete attempt used by the delayed retry"""
+        try:
+            blob_store.delete(ref, self._audio_in_use)
+        except Exception as e:
+            print(f"Error deleting audio {ref}: {e}")
+    
     def get_privacy_settings(self, username):
         """Get user's privacy settings"""
         return {
@@ -80,12 +80,14 @@ class ReportGenerator:
             
             # Vital Signs Summary
             story.append(Paragraph("❤️ Vital Signs Summary", styles['Heading2']))
+            # Read from the daily rollups rather than re-aggregating raw readings
             cursor.execute(f"""
-                SELECT vital_type, AVG(value) as avg_value, MIN(value) as min_value, MAX(value) as max_value
-                FROM vital_signs
-                WHERE username=%s AND timestamp > DATE_SUB(NOW(), INTERVAL {days} DAY)
-                GROUP BY vital_type
-            """, (username,))
+                SELECT SUBSTRING(metric, 7) as vital_type, SUM(sum) / SUM(count) as avg_value,
+                       MIN(min) as min_value, MAX(max) as max_value
+                FROM metric_rollup_daily
+                WHERE username=%s AND metric LIKE %s AND bucket >= DATE(DATE_SUB(NOW(), INTERVAL {days} DAY))
+                GROUP BY metric
+            """, (username, "vital:%"))
             
             vitals_data = [["Vital Type", "Average", "Min", "Max"]]
             for row in cursor.fetchall():
@@ -140,11 +142,12 @@ class ReportGenerator:
             # Activity Summary
             story.append(Paragraph("🚶 Activity Summary", styles['Heading2']))
             cursor.execute(f"""
-                SELECT activity_type, COUNT(*) as count, SUM(duration_minutes) as total_minutes
-                FROM activities
-                WHERE username=%s AND timestamp > DATE_SUB(NOW(), INTERVAL {days} DAY)
-                GROUP BY activity_type
-            """, (username,))
+                SELECT SUBSTRING(metric, 10) as activity_type, CAST(SUM(count) AS SIGNED) as count,
+                       CAST(SUM(sum) AS SIGNED) as total_minutes
+                FROM metric_rollup_daily
+                WHERE username=%s AND metric LIKE %s AND bucket >= DATE(DATE_SUB(NOW(), INTERVAL {days} DAY))
+                GROUP BY metric
+            """, (username, "activity:%"))
             
             activity_data = [["Activity Type", "Count", "Total Minutes"]]
             for row in cursor.fetchall():
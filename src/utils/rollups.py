@@ -0,0 +1,126 @@
+"""
+Hourly and daily rollups of time-series rows (vital signs, activities)
+Each (user, metric, bucket) keeps count, sum, min, max and sum of squares,
+updated in the same transaction as the rows they summarise, so trends and
+reports aggregate a few buckets instead of re-reading raw history
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+ROLLUP_TABLES = {"hour": "metric_rollup_hourly", "day": "metric_rollup_daily"}
+
+# Source table -> (metric prefix, column naming the metric, value column)
+METRIC_SOURCES = {
+    "vital_signs": ("vital:", "vital_type", "value"),
+    "activity_logs": ("activity:", "activity_type", "duration_minutes"),
+}
+
+UPSERT = """
+    INSERT INTO {table} (username, metric, bucket, count, sum, min, max, sumsq)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        count = count + VALUES(count),
+        sum = sum + VALUES(sum),
+        min = LEAST(min, VALUES(min)),
+        max = GREATEST(max, VALUES(max)),
+        sumsq = sumsq + VALUES(sumsq)
+"""
+
+
+def _row_time(value) -> datetime:
+    """Row timestamp as a naive datetime (services store local-time strings)"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if not value:
+        raise ValueError("Row has no timestamp; fill_timestamps() first")
+    return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S")
+
+
+def fill_timestamps(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence]):
+    """Give metric rows without a timestamp the database's NOW(); returns (columns, rows)
+    
+    The raw row and its buckets then agree on the time, whatever the app host's clock says.
+    """
+    columns = tuple(columns)
+    if table not in METRIC_SOURCES or not rows:
+        return columns, rows
+    stamp = columns.index("timestamp") if "timestamp" in columns else None
+    if stamp is not None and all(row[stamp] for row in rows):
+        return columns, rows
+    cursor.execute("SELECT NOW()")
+    now = cursor.fetchone()[0]
+    if stamp is None:
+        return columns + ("timestamp",), [tuple(row) + (now,) for row in rows]
+    return columns, [tuple(row[:stamp]) + (row[stamp] or now,) + tuple(row[stamp + 1:]) for row in rows]
+
+
+def aggregate(table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> Dict[str, List[tuple]]:
+    """Per-bucket (username, metric, bucket, count, sum, min, max, sumsq) for inserted rows"""
+    prefix, metric_column, value_column = METRIC_SOURCES[table]
+    columns = list(columns)
+    index = {name: columns.index(name) for name in ("username", metric_column, value_column)}
+    stamp = columns.index("timestamp") if "timestamp" in columns else None
+    
+    buckets: Dict[str, Dict[Tuple, List[float]]] = {"hour": {}, "day": {}}
+    for row in rows:
+        value = float(row[index[value_column]] or 0)
+        at = _row_time(row[stamp] if stamp is not None else None)
+        metric = f"{prefix}{row[index[metric_column]]}"
+        for granularity, bucket in (("hour", at.replace(minute=0, second=0, microsecond=0)),
+                                    ("day", at.date())):
+            key = (row[index["username"]], metric, bucket)
+            stats = buckets[granularity].get(key)
+            if stats is None:
+                buckets[granularity][key] = [1, value, value, value, value * value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = min(stats[2], value)
+                stats[3] = max(stats[3], value)
+                stats[4] += value * value
+    return {granularity: [key + tuple(stats) for key, stats in groups.items()]
+            for granularity, groups in buckets.items()}
+
+
+def apply_rows(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence]):
+    """Fold rows into the rollups on the cursor inserting them (no-op for tables without metrics)
+    
+    Errors propagate so the caller's transaction rolls the raw rows back too.
+    """
+    if table not in METRIC_SOURCES or not rows:
+        return
+    for granularity, values in aggregate(table, columns, rows).items():
+        cursor.executemany(UPSERT.format(table=ROLLUP_TABLES[granularity]), values)
+
+
+def rebuild(cursor, username=None):
+    """Recompute the rollups from raw rows (all users, or one)"""
+    user_filter = "AND username = %s" if username is not None else ""
+    params = (username,) if username is not None else ()
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f"DELETE FROM {table} WHERE 1 = 1 {user_filter}", params)
+    hour = "TIMESTAMP(DATE(timestamp), MAKETIME(HOUR(timestamp), 0, 0))"
+    for source, (prefix, metric_column, value_column) in METRIC_SOURCES.items():
+        value = f"COALESCE({value_column}, 0)"
+        cursor.execute(f"""
+            INSERT INTO metric_rollup_hourly (username, metric, bucket, count, sum, min, max, sumsq)
+            SELECT username, CONCAT('{prefix}', {metric_column}), {hour},
+                   COUNT(*), SUM({value}), MIN({value}), MAX({value}), SUM({value} * {value})
+            FROM {source}
+            WHERE username IS NOT NULL AND {metric_column} IS NOT NULL AND timestamp IS NOT NULL {user_filter}
+            GROUP BY username, {metric_column}, {hour}
+        """, params)
+    cursor.execute(f"""
+        INSERT INTO metric_rollup_daily (username, metric, bucket, count, sum, min, max, sumsq)
+        SELECT username, metric, DATE(bucket), SUM(count), SUM(sum), MIN(min), MAX(max), SUM(sumsq)
+        FROM metric_rollup_hourly
+        WHERE 1 = 1 {user_filter}
+        GROUP BY username, metric, DATE(bucket)
+    """, params)
+
+
+def delete_user_metrics(cursor, username, source: str):
+    """Drop a user's rollups for one source table (after its raw rows are deleted)"""
+    prefix = METRIC_SOURCES[source][0]
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f"DELETE FROM {table} WHERE username = %s AND metric LIKE %s", (username, f"{prefix}%"))
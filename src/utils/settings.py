@@ -277,10 +277,10 @@ class SettingsManager:
                 st.rerun()
         
         with col2:
-            if st.button("🛠️ Create Tables Automatically", use_container_width=True, key="settings_create_tables"):
+            if st.button("🛠️ Run Schema Migrations", use_container_width=True, key="settings_create_tables"):
                 if self.db_available:
-                    from database import create_tables
-                    success, msg = create_tables(self.db_conn)
+                    from database import run_migrations
+                    success, msg = run_migrations(self.db_conn)
                     if success:
                         st.success(msg)
                     else:
@@ -0,0 +1,355 @@
+"""
+Write-behind buffer for high-frequency log inserts
+Rows are grouped per table and written with one executemany per batch when a
+table reaches its batch size or the flush interval passes. Every row is first
+appended to a local spool, which a background fsync makes durable at most
+fsync_interval seconds later: a process crash loses nothing, a power loss at
+most that window. Producers block (backpressure) once too many rows are
+waiting on a slow database. Each row
+carries an id recorded in write_behind_applied in the same transaction as the
+row, so replaying a spool after a crash never inserts a row twice
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+from utils.rollups import apply_rows, fill_timestamps
+from utils.write_tracker import note_rows
+from config import (WRITE_BEHIND, WRITE_BEHIND_DIR, WRITE_BEHIND_BATCH, WRITE_BEHIND_INTERVAL,
+                    WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_FSYNC_MS)
+
+logger = logging.getLogger(__name__)
+
+# Applied row ids are kept this long; a spool older than that replays without the check
+LEDGER_RETENTION_DAYS = 7
+LEDGER_PRUNE_INTERVAL = 3600
+
+
+class BufferFull(Exception):
+    """Raised when the buffer stays full longer than the producer may wait"""
+
+
+class WriteBehindBuffer:
+    def __init__(self, db_conn, spool_dir: str = ".write_behind", batch_size: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 20000, put_timeout: float = 5.0,
+                 fsync_interval: Optional[float] = 0.2):
+        """Initialize the buffer, replay any spooled rows and start the flusher
+        
+        db_conn must provide transaction() (PooledDatabase). fsync_interval is
+        the durability window: spooled rows are fsync'd at most that many
+        seconds after add() returns; 0 fsyncs before add() returns, None never
+        fsyncs (rows then survive a process crash but not a power loss).
+        """
+        self.db_conn = db_conn
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.fsync_interval = fsync_interval
+        
+        # (table, columns) -> [(row id, row)]
+        self._pending: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[str, tuple]]] = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)      # Flusher waits here
+        self._drained = threading.Condition(self._lock)   # Blocked producers wait here
+        self._flush_lock = threading.Lock()               # One flush at a time
+        self._sync_lock = threading.Lock()                # One fsync at a time; taken before _lock
+        self._spooled = 0                                 # Lines written to the spool...
+        self._synced = 0                                  # ...and how many of them are on disk
+        self._closed = False
+        self._last_prune = 0.0
+        self.stats = {'rows_added': 0, 'rows_written': 0, 'batches': 0, 'failures': 0, 'blocked': 0,
+                      'duplicates': 0}
+        
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._segment = 0
+        self._spool = None
+        leftovers = sorted(self.spool_dir.glob("segment-*.jsonl"), key=self._segment_number)
+        if leftovers:
+            self._segment = self._segment_number(leftovers[-1])
+        self._open_segment()
+        self._replay(leftovers)
+        
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        self._stop_sync = threading.Event()
+        self._sync_thread = None
+        if fsync_interval:
+            self._sync_thread = threading.Thread(target=self._sync_loop, name="write-behind-sync", daemon=True)
+            self._sync_thread.start()
+        atexit.register(self.close)
+    
+    @staticmethod
+    def _segment_number(path: Path) -> int:
+        """Sequence number of a spool segment file"""
+        return int(path.stem.split("-")[1])
+    
+    def _open_segment(self):
+        """Start a new spool segment (caller holds the lock or is initializing)"""
+        self._segment += 1
+        self._spool = open(self.spool_dir / f"segment-{self._segment}.jsonl", "a", encoding="utf-8")
+        self._sync_dir()
+    
+    def _sync_dir(self):
+        """fsync the spool directory so created and removed segments survive a power loss"""
+        if self.fsync_interval is None or not hasattr(os, "O_DIRECTORY"):
+            return  # Directories cannot be opened for fsync on Windows
+        fd = os.open(self.spool_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _sync(self, upto: int):
+        """Make the spool durable through line upto; one fsync covers every line written so far"""
+        with self._sync_lock:
+            if self._synced >= upto:
+                return
+            with self._lock:
+                self._spool.flush()
+                target = self._spooled
+            # Segments only rotate under _sync_lock, so the file stays open here
+            os.fsync(self._spool.fileno())
+            self._synced = target
+    
+    def _replay(self, segments: List[Path]):
+        """Re-queue rows a previous process spooled but never wrote"""
+        replayed = 0
+        for path in segments:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from the crash
+                    if "i" not in entry:
+                        # Spooled before rows had ids: cannot be checked against the ledger
+                        entry["i"] = uuid.uuid4().hex
+                        line = json.dumps(entry)
+                    self._queue(entry["t"], tuple(entry["c"]), entry["i"], tuple(entry["r"]), line)
+                    replayed += 1
+        if segments:
+            # The rows now live in the current segment; make that durable before
+            # dropping the old files so a second crash cannot lose them
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self._synced = self._spooled
+            for path in segments:
+                path.unlink()
+            self._sync_dir()
+            logger.info(f"Replayed {replayed} spooled rows")
+    
+    def _queue(self, table: str, columns: Tuple[str, ...], row_id: str, row: tuple, line: str):
+        """Spool and buffer one row (caller holds the lock)"""
+        self._spool.write(line if line.endswith("\n") else line + "\n")
+        self._spooled += 1
+        self._pending.setdefault((table, columns), []).append((row_id, row))
+        self._pending_count += 1
+    
+    def add(self, table: str, columns: Sequence[str], row: Sequence):
+        """Queue one row for table; returns once it is on disk, blocks while the buffer is full"""
+        columns, row = tuple(columns), tuple(row)
+        row_id = uuid.uuid4().hex
+        line = json.dumps({"t": table, "c": columns, "i": row_id, "r": row}, default=str)
+        with self._lock:
+            if self._closed:
+                raise BufferFull("Write-behind buffer is closed")
+            if self._pending_count >= self.max_pending:
+                self.stats['blocked'] += 1
+                self._wake.notify()
+                if not self._drained.wait_for(lambda: self._pending_count < self.max_pending,
+                                              timeout=self.put_timeout):
+                    raise BufferFull(f"{self._pending_count} rows waiting for the database")
+            self._queue(table, columns, row_id, row, line)
+            spooled = self._spooled
+            self.stats['rows_added'] += 1
+            if len(self._pending[(table, columns)]) >= self.batch_size:
+                self._wake.notify()
+        if self.fsync_interval == 0:
+            self._sync(spooled)  # On disk before returning: no durability window at all
+        else:
+            with self._lock:
+                self._spool.flush()  # Into the OS page cache: survives a process crash
+    
+    def _sync_loop(self):
+        """Group commit: one fsync per fsync_interval covers every row added meanwhile"""
+        while not self._stop_sync.wait(self.fsync_interval):
+            if self._spooled > self._synced:
+                try:
+                    self._sync(self._spooled)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Write-behind spool fsync failed: {e}")
+    
+    def _run(self):
+        """Flusher thread: write whenever a batch fills or the interval passes"""
+        while True:
+            with self._lock:
+                if not self._closed:
+                    self._wake.wait_for(
+                        lambda: self._closed or any(len(rows) >= self.batch_size for rows in self._pending.values()),
+                        timeout=self.flush_interval)
+                closed = self._closed
+            written = self.flush()
+            if closed:
+                return
+            if written < 0:
+                time.sleep(min(self.flush_interval * 5, 5.0))  # Database trouble: back off
+            elif time.monotonic() - self._last_prune > LEDGER_PRUNE_INTERVAL:
+                self._prune_ledger()
+    
+    def _prune_ledger(self):
+        """Forget applied row ids older than LEDGER_RETENTION_DAYS"""
+        self._last_prune = time.monotonic()
+        try:
+            cursor = self.db_conn.cursor()
+            cursor.execute("DELETE FROM write_behind_applied WHERE applied_at < NOW() - INTERVAL %s DAY",
+                           (LEDGER_RETENTION_DAYS,))
+        except Exception as e:
+            logger.warning(f"Could not prune write_behind_applied: {e}")
+    
+    def flush(self) -> int:
+        """Write everything pending; returns rows written or -1 if the database failed"""
+        with self._flush_lock:
+            with self._sync_lock, self._lock:
+                if not self._pending_count:
+                    return 0
+                batches, self._pending = self._pending, {}
+                # Rows from here on go to a fresh segment, so the old ones can be
+                # deleted as soon as these batches are committed
+                self._close_segment()
+                done_segments = list(self.spool_dir.glob("segment-*.jsonl"))
+                self._open_segment()
+            
+            written = 0
+            try:
+                for (table, columns) in list(batches):
+                    rows = batches[(table, columns)]
+                    while rows:
+                        chunk = rows[:self.batch_size]
+                        # Each chunk, its rollups and its row ids commit together
+                        with self.db_conn.transaction() as cursor:
+                            fresh = self._unapplied(cursor, chunk)
+                            if fresh:
+                                fresh_columns, fresh_rows = fill_timestamps(cursor, table, columns,
+                                                                            [row for _, row in fresh])
+                                cursor.executemany(_insert_sql(table, fresh_columns), fresh_rows)
+                                apply_rows(cursor, table, fresh_columns, fresh_rows)
+                                cursor.executemany("INSERT INTO write_behind_applied (row_id) VALUES (%s)",
+                                                   [(row_id,) for row_id, _ in fresh])
+                        if fresh:
+                            note_rows(table, fresh_columns, fresh_rows)
+                        self.stats['duplicates'] += len(chunk) - len(fresh)
+                        written += len(chunk)
+                        self.stats['batches'] += 1
+                        rows = batches[(table, columns)] = rows[self.batch_size:]
+                    del batches[(table, columns)]
+            except Exception as e:
+                logger.error(f"Write-behind flush failed, keeping {sum(map(len, batches.values()))} rows: {e}")
+                with self._lock:
+                    self.stats['failures'] += 1
+                    self.stats['rows_written'] += written
+                    # Put unwritten rows back in front of anything added meanwhile.
+                    # The spool keeps every row until a flush fully succeeds; rows
+                    # already written are skipped by id if it is ever replayed.
+                    for key, rows in batches.items():
+                        self._pending[key] = rows + self._pending.get(key, [])
+                    self._pending_count -= written
+                    self._drained.notify_all()
+                return -1
+            
+            with self._lock:
+                self._pending_count -= written
+                self.stats['rows_written'] += written
+                self._drained.notify_all()
+            for path in done_segments:
+                path.unlink(missing_ok=True)
+            self._sync_dir()
+            return written
+    
+    @staticmethod
+    def _unapplied(cursor, chunk: List[Tuple[str, tuple]]) -> List[Tuple[str, tuple]]:
+        """Rows of chunk whose id is not yet in write_behind_applied (replays skip these)"""
+        cursor.execute(f"SELECT row_id FROM write_behind_applied WHERE row_id IN ({', '.join(['%s'] * len(chunk))})",
+                       [row_id for row_id, _ in chunk])
+        applied = {row[0] for row in cursor.fetchall()}
+        return [entry for entry in chunk if entry[0] not in applied]
+    
+    def _close_segment(self):
+        """Make the current segment durable and close it (caller holds _sync_lock and the lock)"""
+        self._spool.flush()
+        if self.fsync_interval is not None:
+            os.fsync(self._spool.fileno())
+        self._spool.close()
+        self._synced = self._spooled
+    
+    def pending(self) -> int:
+        """Rows waiting to be written"""
+        with self._lock:
+            return self._pending_count
+    
+    def get_stats(self) -> Dict:
+        """Counters plus the current backlog"""
+        with self._lock:
+            return {**self.stats, 'pending': self._pending_count}
+    
+    def close(self):
+        """Flush what is left and stop the flusher (registered with atexit)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._thread.join(timeout=30)
+        self._stop_sync.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join(timeout=5)
+        with self._sync_lock, self._lock:
+            self._close_segment()
+
+
+def _insert_sql(table: str, columns: Sequence[str]) -> str:
+    """INSERT statement for one row of columns"""
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+
+_shared_buffer = None
+_shared_lock = threading.Lock()
+
+
+def get_write_buffer(db_conn) -> Optional[WriteBehindBuffer]:
+    """Process-wide buffer when WRITE_BEHIND is enabled, otherwise None"""
+    global _shared_buffer
+    if not WRITE_BEHIND or db_conn is None:
+        return None
+    with _shared_lock:
+        if _shared_buffer is None:
+            _shared_buffer = WriteBehindBuffer(db_conn, WRITE_BEHIND_DIR, WRITE_BEHIND_BATCH,
+                                               WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_PENDING,
+                                               fsync_interval=(WRITE_BEHIND_FSYNC_MS / 1000
+                                                               if WRITE_BEHIND_FSYNC_MS >= 0 else None))
+        return _shared_buffer
+
+
+def insert_row(db_conn, table: str, columns: Sequence[str], row: Sequence):
+    """Insert one log row: buffered when write-behind is on, else a direct INSERT and commit
+    
+    Either way the row and its metric rollups commit in one transaction, and the
+    write tracker hears about it afterwards.
+    """
+    buffer = get_write_buffer(db_conn)
+    if buffer is not None:
+        buffer.add(table, columns, row)
+        return
+    with db_conn.transaction() as cursor:
+        columns, rows = fill_timestamps(cursor, table, columns, [tuple(row)])
+        cursor.execute(_insert_sql(table, columns), rows[0])
+        apply_rows(cursor, table, columns, rows)
+    note_rows(table, columns, rows)
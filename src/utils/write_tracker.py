@@ -0,0 +1,33 @@
+"""
+Per-user write versions for cache invalidation
+Services call note_write(table, username) after they insert or delete a
+user's rows; cached readers keep the versions() they were built from and
+treat the cache as stale as soon as any of them changes
+"""
+import threading
+from typing import Dict, Iterable, Sequence, Tuple
+
+_versions: Dict[Tuple[str, str], int] = {}
+_lock = threading.Lock()
+
+
+def note_write(table: str, username):
+    """Record that table changed for username"""
+    key = (table, str(username))
+    with _lock:
+        _versions[key] = _versions.get(key, 0) + 1
+
+
+def note_rows(table: str, columns: Sequence[str], rows: Iterable[Sequence]):
+    """Record a batch of inserted rows (one bump per user in the batch)"""
+    if "username" not in columns:
+        return
+    index = list(columns).index("username")
+    for username in {row[index] for row in rows}:
+        note_write(table, username)
+
+
+def versions(tables: Iterable[str], username) -> Tuple[int, ...]:
+    """Current write versions of tables for username"""
+    with _lock:
+        return tuple(_versions.get((table, str(username)), 0) for table in tables)
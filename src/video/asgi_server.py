@@ -0,0 +1,344 @@
+"""
+ASGI serving mode for the frame server (FRAME_SERVER_MODE=asgi)
+Frames, streams, detection and /health run as coroutines on one event loop,
+so a connected viewer costs a parked coroutine instead of a server thread.
+Capture and detection keep running in the registry's threads / processes,
+and every other route falls through to the Flask app.
+"""
+
+import asyncio
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from video.detection_events import format_sse
+from video.metrics import render_prometheus
+from video.pacing import FramePacer
+
+MJPEG_CONTENT_TYPE = b'multipart/x-mixed-replace; boundary=frame'
+
+
+class FrameFeed:
+    """Wakes every viewer of one camera when a new frame lands
+    
+    One executor thread per camera blocks on the ring and each new frame is
+    JPEG-encoded there once; viewers await a shared future, so adding a
+    client adds no threads and no per-client frame copies.
+    """
+    
+    def __init__(self, pipeline, loop, executor):
+        self.pipeline = pipeline
+        self.loop = loop
+        self.executor = executor
+        self.viewers = 0
+        self._changed = loop.create_future()
+        self._task = loop.create_task(self._run())
+    
+    async def _run(self):
+        """Forward new frames from the capture thread to the event loop"""
+        ring = self.pipeline.ring
+        last_seq = 0
+        while True:
+            packet = await self.loop.run_in_executor(self.executor, ring.wait_newer, last_seq, 1.0)
+            if packet is None:
+                continue
+            last_seq = packet.seq
+            
+            if self.viewers:
+                # Encode off the loop before waking anyone
+                try:
+                    await self.loop.run_in_executor(self.executor, packet.get_jpeg)
+                except Exception as e:
+                    print(f"✗ Error encoding frame: {e}")
+            
+            changed, self._changed = self._changed, self.loop.create_future()
+            changed.set_result(packet)
+    
+    async def next_packet(self, last_seq, timeout=1.0):
+        """Newest packet after last_seq, or None if none arrives within timeout"""
+        packet = self.pipeline.ring.latest()
+        if packet is not None and packet.seq > last_seq:
+            return packet
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._changed), timeout)
+        except asyncio.TimeoutError:
+            return None
+    
+    async def jpeg(self, packet):
+        """Encoded frame; only encodes (in the executor) if the feed has not yet"""
+        if packet.has_jpeg:
+            return packet.get_jpeg()
+        try:
+            return await self.loop.run_in_executor(self.executor, packet.get_jpeg)
+        except Exception as e:
+            print(f"✗ Error encoding frame: {e}")
+            return None
+    
+    def close(self):
+        """Stop forwarding frames"""
+        self._task.cancel()
+
+
+class SubscriberQueue(queue.Queue):
+    """Detection subscriber queue that also wakes a coroutine on the event loop"""
+    
+    def __init__(self, maxsize, loop):
+        super().__init__(maxsize)
+        self.loop = loop
+        self.ready = asyncio.Event()
+    
+    def _put(self, item):
+        super()._put(item)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            pass  # Loop already closed during shutdown
+
+
+def _etag_matches(header, etag):
+    """If-None-Match check against an unquoted entity tag"""
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def _float_arg(query, name, default):
+    """Query string float with a fallback for missing or malformed values"""
+    try:
+        return float(query[name][0]) or default
+    except (KeyError, IndexError, ValueError):
+        return default
+
+
+class AsyncFrameServer:
+    """ASGI application serving the hot frame server routes on one event loop"""
+    
+    def __init__(self, registry, fallback=None, stream_fps=15, sse_heartbeat=10):
+        self.registry = registry
+        self.fallback = fallback        # ASGI app for every other route (Flask via WSGIMiddleware)
+        self.stream_fps = stream_fps
+        self.sse_heartbeat = sse_heartbeat
+        self._feeds = {}
+        # Blocking ring waits and JPEG encodes; one waiter per camera plus encode headroom
+        self._executor = ThreadPoolExecutor(max_workers=len(registry.cameras) + 4,
+                                            thread_name_prefix="asgi-feed")
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        
+        handler, pipeline = self._route(scope)
+        if handler is None:
+            if self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            else:
+                await self._json(send, {'error': 'Not found'}, 404)
+            return
+        if pipeline is False:
+            camera_id = scope['path'].split('/')[3]
+            await self._json(send, {'error': f"Unknown camera '{camera_id}'"}, 404)
+            return
+        await handler(scope, receive, send, pipeline)
+    
+    def _route(self, scope):
+        """Return (handler, pipeline) for the async routes; pipeline is False for an unknown camera"""
+        if scope['method'] != 'GET':
+            return None, None
+        path = scope['path']
+        if path == '/health':
+            return self._health, None
+        if path == '/metrics':
+            return self._metrics, None
+        
+        if path.startswith('/api/cameras/'):
+            camera_id, _, endpoint = path[len('/api/cameras/'):].partition('/')
+            if not endpoint:
+                return None, None
+            pipeline = self.registry.get(camera_id)
+        else:
+            endpoint = path[len('/api/'):] if path.startswith('/api/') else ''
+            pipeline = self.registry.default
+        
+        handler = {
+            'frame': self._frame,
+            'stream': self._stream,
+            'detection': self._detection,
+            'detection/stream': self._detection_stream
+        }.get(endpoint)
+        if handler is None:
+            return None, None
+        return handler, pipeline if pipeline is not None else False
+    
+    async def _lifespan(self, receive, send):
+        """Nothing to do on startup; stop feeds and cameras on shutdown"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for feed in self._feeds.values():
+                    feed.close()
+                await asyncio.get_running_loop().run_in_executor(None, self.registry.stop)
+                self._executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    def _feed(self, pipeline):
+        """The FrameFeed for a camera, started on first use"""
+        feed = self._feeds.get(pipeline.camera_id)
+        if feed is None:
+            feed = FrameFeed(pipeline, asyncio.get_running_loop(), self._executor)
+            self._feeds[pipeline.camera_id] = feed
+        return feed
+    
+    @staticmethod
+    async def _respond(send, status, headers, body=b''):
+        """Send a complete response"""
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+    
+    async def _json(self, send, payload, status=200):
+        """Send a JSON response"""
+        body = json.dumps(payload).encode()
+        await self._respond(send, status, [(b'content-type', b'application/json'),
+                                           (b'content-length', str(len(body)).encode())], body)
+    
+    @staticmethod
+    async def _until_disconnect(receive, producer):
+        """Run a streaming coroutine until it ends or the client goes away"""
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+        
+        tasks = {asyncio.ensure_future(producer), asyncio.ensure_future(watch())}
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+    
+    async def _frame(self, scope, receive, send, pipeline):
+        """Latest frame as JPEG (304 if the client already has this version)"""
+        packet = pipeline.latest_frame()
+        if packet is None:
+            await self._respond(send, 404, [(b'content-length', b'0')])
+            return
+        
+        headers = [(b'etag', f'"{packet.etag}"'.encode()),
+                   (b'x-frame-seq', str(packet.seq).encode()),
+                   (b'cache-control', b'no-cache')]
+        if_none_match = dict(scope['headers']).get(b'if-none-match')
+        if if_none_match is not None and _etag_matches(if_none_match.decode('latin-1'), packet.etag):
+            await self._respond(send, 304, headers)
+            return
+        
+        jpeg = await self._feed(pipeline).jpeg(packet)
+        if jpeg is None:
+            await self._respond(send, 500, [(b'content-length', b'0')])
+            return
+        headers += [(b'content-type', b'image/jpeg'), (b'content-length', str(len(jpeg)).encode())]
+        await self._respond(send, 200, headers, jpeg)
+    
+    async def _stream(self, scope, receive, send, pipeline):
+        """Live frames as multipart/x-mixed-replace MJPEG, paced per client"""
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        fps = max(1.0, min(_float_arg(query, 'fps', self.stream_fps), float(pipeline.fps)))
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', MJPEG_CONTENT_TYPE),
+                                (b'cache-control', b'no-cache, no-store')]})
+        await self._until_disconnect(receive, self._send_mjpeg(send, pipeline, fps))
+    
+    async def _send_mjpeg(self, send, pipeline, fps):
+        """Write parts until cancelled; send() waits while the client's socket is full"""
+        feed = self._feed(pipeline)
+        pacer = FramePacer(fps)
+        last_seq = 0
+        separator = b''
+        
+        feed.viewers += 1
+        pipeline.metrics.viewer_connected()
+        try:
+            while True:
+                await pacer.wait_async()
+                packet = await feed.next_packet(last_seq)
+                if packet is None:
+                    continue
+                
+                skipped = packet.seq - last_seq - 1 if last_seq else 0
+                last_seq = packet.seq
+                jpeg = await feed.jpeg(packet)
+                if jpeg is None:
+                    continue
+                
+                pipeline.serving_stats.record(time.monotonic() - packet.captured_at, dropped=skipped)
+                # Part header and the shared JPEG go out separately so the
+                # frame bytes are never copied per client
+                await send({'type': 'http.response.body', 'more_body': True,
+                            'body': separator + b'--frame\r\nContent-Type: image/jpeg\r\n'
+                                    b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n'})
+                await send({'type': 'http.response.body', 'body': jpeg, 'more_body': True})
+                separator = b'\r\n'
+        finally:
+            feed.viewers -= 1
+            pipeline.metrics.viewer_disconnected()
+    
+    async def _detection(self, scope, receive, send, pipeline):
+        """Latest fall detection result"""
+        await self._json(send, pipeline.last_detection)
+    
+    async def _detection_stream(self, scope, receive, send, pipeline):
+        """Detection state changes as server-sent events"""
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        heartbeat = max(1.0, _float_arg(query, 'heartbeat', self.sse_heartbeat))
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await self._until_disconnect(receive, self._send_events(send, pipeline, heartbeat))
+    
+    async def _send_events(self, send, pipeline, heartbeat):
+        """Write detection events and heartbeats until cancelled"""
+        events = pipeline.events
+        subscriber = events.subscribe(SubscriberQueue(events.queue_size, asyncio.get_running_loop()))
+        
+        async def emit(text):
+            await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+        
+        try:
+            # Current state first so clients don't wait for the next change
+            await emit("retry: 2000\n\n" + (format_sse(events.latest, 'detection') if events.latest is not None else ''))
+            while True:
+                # Clear before checking so a put racing with this check still wakes us
+                subscriber.ready.clear()
+                try:
+                    event_id, record = subscriber.get_nowait()
+                except queue.Empty:
+                    try:
+                        await asyncio.wait_for(subscriber.ready.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        await emit(format_sse(events.latest or {}, 'heartbeat'))
+                    continue
+                await emit(format_sse(record, 'detection', event_id))
+        finally:
+            events.unsubscribe(subscriber)
+    
+    async def _metrics(self, scope, receive, send, pipeline):
+        """Prometheus metrics"""
+        body = render_prometheus(self.registry.cameras).encode()
+        await self._respond(send, 200, [(b'content-type', b'text/plain; version=0.0.4; charset=utf-8'),
+                                        (b'content-length', str(len(body)).encode())], body)
+    
+    async def _health(self, scope, receive, send, pipeline):
+        """Health check"""
+        await self._json(send, self.registry.health())
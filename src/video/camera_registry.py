@@ -0,0 +1,126 @@
+"""
+Registry of the cameras served by the frame server
+Each camera gets its own capture thread, frame ring and detector state;
+fall analysis for all cameras shares one worker pool sized to the CPU, or
+runs in one detector process per camera with detector_mode='process'
+"""
+
+import os
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from video.pipeline import CameraPipeline
+from video.incidents import IncidentLog
+
+
+class CameraRegistry:
+    """Owns one CameraPipeline per configured camera"""
+    
+    def __init__(self, sources, analysis_workers=None, incident_history=100, **pipeline_options):
+        if not sources:
+            raise ValueError("At least one camera source is required")
+        
+        # OpenCV releases the GIL inside its kernels, so threads scale with cores.
+        # In process mode each camera brings its own detector process instead
+        # and the pool is never used (its threads are only started on demand).
+        self.detector_mode = pipeline_options.get('detector_mode', 'thread')
+        if self.detector_mode == 'process':
+            workers = len(sources)
+        else:
+            workers = analysis_workers or min(len(sources), os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self.analysis_workers = workers
+        
+        # One incident log for every camera, so /api/incidents is a single feed
+        self.incidents = IncidentLog(max_incidents=incident_history)
+        
+        self.cameras = {}
+        for camera_id, source in sources:
+            if camera_id in self.cameras:
+                raise ValueError(f"Duplicate camera id: {camera_id}")
+            self.cameras[camera_id] = CameraPipeline(source=source, camera_id=camera_id,
+                                                     executor=self.executor,
+                                                     incident_log=self.incidents, **pipeline_options)
+        self.default_id = sources[0][0]
+    
+    @property
+    def default(self):
+        """First configured camera (served by the legacy single-camera endpoints)"""
+        return self.cameras[self.default_id]
+    
+    def get(self, camera_id):
+        """Return a camera pipeline or None"""
+        return self.cameras.get(camera_id)
+    
+    def start(self):
+        """Start capture on every camera"""
+        for pipeline in self.cameras.values():
+            pipeline.start()
+    
+    def stop(self):
+        """Stop every camera and the shared analysis pool"""
+        for pipeline in self.cameras.values():
+            pipeline.running = False
+        for pipeline in self.cameras.values():
+            pipeline.stop()
+        self.executor.shutdown(wait=True)
+    
+    def find_clip(self, incident_id):
+        """Return (pipeline, clip status) of the camera that recorded an incident"""
+        for pipeline in self.cameras.values():
+            if pipeline.clip_recorder is None:
+                continue
+            status = pipeline.clip_recorder.clip_status(incident_id)
+            if status is not None:
+                return pipeline, status
+        return None, None
+    
+    def camera_status(self, camera_id):
+        """Frame freshness and current detection state for one camera"""
+        pipeline = self.cameras[camera_id]
+        packet = pipeline.ring.latest()
+        detection = pipeline.last_detection
+        return {
+            'camera_id': camera_id,
+            'has_frame': packet is not None,
+            'frame_age_seconds': time.time() - packet.wall_time if packet is not None else -1,
+            'fall_detected': detection.get('fall_detected', False),
+            'confidence': detection.get('confidence', 0.0),
+            'last_detection_time': detection.get('timestamp', 0),
+            'capture_fps': round(pipeline.metrics.capture_rate.rate(), 2),
+            'target_fps': round(float(pipeline.fps), 2),
+            'analysis_rate': pipeline.analysis_rate_status()
+        }
+    
+    def status(self):
+        """Aggregate status across all cameras"""
+        cameras = [self.camera_status(camera_id) for camera_id in self.cameras]
+        falls = [c['camera_id'] for c in cameras if c['fall_detected']]
+        return {
+            'camera_count': len(cameras),
+            'cameras_online': sum(1 for c in cameras if c['has_frame'] and c['frame_age_seconds'] < 5),
+            'analysis_workers': self.analysis_workers,
+            'detector_mode': self.detector_mode,
+            'fall_detected': bool(falls),
+            'fall_cameras': falls,
+            'cameras': cameras
+        }
+    
+    def health(self):
+        """/health payload (shared by the Flask and ASGI servers)"""
+        pipeline = self.default
+        packet = pipeline.ring.latest()
+        return {
+            'status': 'ok',
+            'has_frame': packet is not None,
+            'frame_age_seconds': time.time() - packet.wall_time if packet is not None else -1,
+            'last_detection': pipeline.last_detection,
+            'analysis_rate': pipeline.analysis_rate_status(),
+            'pipeline': pipeline.get_stats(),
+            'cameras': self.status(),
+            'incidents': self.incidents.get_stats()
+        }
@@ -0,0 +1,279 @@
+"""
+Pre/post-event clip recording for the frame server
+Keeps the last few seconds of JPEG-encoded frames per camera in a ring that
+is bounded by both age and bytes. When a fall fires, the pre-event frames
+plus the following seconds are handed to a background writer that encodes
+an MP4 with PyAV, so the alert has evidence of the moment itself.
+"""
+
+import av
+import cv2
+import numpy as np
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from fractions import Fraction
+from pathlib import Path
+
+INCIDENT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
+STATUS_HISTORY = 256  # Incidents whose clip state is remembered in memory
+
+
+def new_incident_id(camera_id):
+    """Readable unique id, e.g. bedroom-20240101-120000-1a2b3c"""
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    camera = re.sub(r'[^A-Za-z0-9_-]', '_', str(camera_id))
+    return f"{camera}-{stamp}-{uuid.uuid4().hex[:6]}"
+
+
+def valid_incident_id(incident_id):
+    """Guard for ids coming from URLs (they become file names)"""
+    return bool(INCIDENT_ID_PATTERN.match(incident_id or ''))
+
+
+def write_clip(path, frames, fps):
+    """Encode [(wall_time, jpeg_bytes)] into an MP4 at path
+    
+    Frames keep their real capture spacing (millisecond pts), so gaps in the
+    ring show up as held frames rather than a sped-up clip.
+    """
+    first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+    # yuv420p needs even dimensions
+    height, width = first.shape[0] & ~1, first.shape[1] & ~1
+    time_base = Fraction(1, 1000)
+    rate = Fraction(fps).limit_denominator(1000)
+    
+    tmp_path = path.with_suffix('.part')
+    container = av.open(str(tmp_path), mode='w', format='mp4')
+    try:
+        try:
+            stream = container.add_stream('libx264', rate=rate)
+        except Exception:
+            # FFmpeg builds without x264 still ship the MPEG-4 Part 2 encoder
+            stream = container.add_stream('mpeg4', rate=rate)
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = 'yuv420p'
+        stream.codec_context.time_base = time_base
+        
+        start = frames[0][0]
+        last_pts = -1
+        for wall_time, jpeg in frames:
+            image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            if image.shape[0] < height or image.shape[1] < width:
+                image = cv2.resize(image, (width, height))
+            video_frame = av.VideoFrame.from_ndarray(image[:height, :width], format='bgr24')
+            last_pts = max(int(round((wall_time - start) * 1000)), last_pts + 1)
+            video_frame.pts = last_pts
+            video_frame.time_base = time_base
+            for packet in stream.encode(video_frame):
+                container.mux(packet)
+        
+        for packet in stream.encode():
+            container.mux(packet)
+    finally:
+        container.close()
+    tmp_path.replace(path)
+
+
+class ClipRecorder:
+    """Rolling pre-event buffer plus post-event capture for one camera
+    
+    Memory stays bounded: the ring holds at most pre_seconds of frames and
+    max_bytes of JPEG data, a recording in progress is capped the same way,
+    only one recording runs per camera and the writer queue is bounded.
+    """
+    
+    def __init__(self, pipeline, clip_dir, pre_seconds=10, post_seconds=10, fps=10,
+                 max_bytes=64 * 1024 * 1024):
+        self.pipeline = pipeline
+        self.clip_dir = Path(clip_dir)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        
+        self._frames = deque()  # (wall_time, jpeg bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        # Recording in progress: incident id, frames and when to stop
+        self._recording = None
+        self._post = []
+        self._post_bytes = 0
+        self._record_until = 0
+        
+        self._writes = queue.Queue(maxsize=4)
+        self._status = OrderedDict()  # incident id -> recording / encoding / ready / failed
+        # Own lock: status changes happen both under _lock and from the writer thread
+        self._status_lock = threading.Lock()
+        self.clips_written = 0
+        self.clips_dropped = 0
+        
+        self.running = False
+        self.sample_thread = None
+        self.writer_thread = None
+    
+    def start(self):
+        """Start the sampling and writer threads"""
+        if self.running:
+            return
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+        self.running = True
+        name = self.pipeline.camera_id
+        self.sample_thread = threading.Thread(target=self._sample_loop, daemon=True,
+                                              name=f"clip-sampler-{name}")
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True,
+                                              name=f"clip-writer-{name}")
+        self.sample_thread.start()
+        self.writer_thread.start()
+    
+    def stop(self):
+        """Stop sampling; finish the clip being recorded and drain the writer"""
+        self.running = False
+        if self.sample_thread:
+            self.sample_thread.join(timeout=2)
+        with self._lock:
+            self._finish_recording()
+        self._writes.put(None)
+        if self.writer_thread:
+            self.writer_thread.join(timeout=30)
+    
+    def _sample_loop(self):
+        """Copy the camera's newest JPEG into the ring at the clip frame rate"""
+        interval = 1.0 / self.fps
+        last_seq = 0
+        next_sample = time.monotonic()
+        
+        while self.running:
+            packet = self.pipeline.ring.wait_newer(last_seq, timeout=1.0)
+            # A stalled camera must not leave a recording open forever
+            self._finish_if_due()
+            if packet is None or packet.seq <= last_seq:
+                continue
+            now = time.monotonic()
+            if now < next_sample:
+                time.sleep(next_sample - now)
+                continue
+            next_sample = max(next_sample + interval, now)
+            last_seq = packet.seq
+            
+            try:
+                # Shares the encode-once JPEG with HTTP viewers
+                jpeg = packet.get_jpeg()
+            except Exception as e:
+                print(f"✗ Clip recorder could not encode frame ({self.pipeline.camera_id}): {e}")
+                continue
+            self._add(packet.wall_time, jpeg)
+    
+    def _add(self, wall_time, jpeg):
+        """Append one frame to the ring (and the active recording)"""
+        with self._lock:
+            self._frames.append((wall_time, jpeg))
+            self._bytes += len(jpeg)
+            while self._frames and (self._bytes > self.max_bytes or
+                                    wall_time - self._frames[0][0] > self.pre_seconds):
+                _, old = self._frames.popleft()
+                self._bytes -= len(old)
+            
+            if self._recording is not None:
+                if self._post_bytes + len(jpeg) <= self.max_bytes:
+                    self._post.append((wall_time, jpeg))
+                    self._post_bytes += len(jpeg)
+                if wall_time >= self._record_until:
+                    self._finish_recording()
+    
+    def trigger(self, incident_id):
+        """Start a clip for a new incident; ignored while one is recording"""
+        with self._lock:
+            if self._recording is not None:
+                return False
+            self._recording = (incident_id, list(self._frames))
+            self._post = []
+            self._post_bytes = 0
+            self._record_until = time.time() + self.post_seconds
+            self._set_status(incident_id, 'recording')
+        print(f"🎬 Recording clip for incident {incident_id}")
+        return True
+    
+    def _finish_if_due(self):
+        """Finish the active recording once its post-event time has passed"""
+        with self._lock:
+            if self._recording is not None and time.time() >= self._record_until:
+                self._finish_recording()
+    
+    def _finish_recording(self):
+        """Queue the active recording for encoding (caller holds the lock)"""
+        if self._recording is None:
+            return
+        incident_id, pre = self._recording
+        frames = pre + self._post
+        self._recording = None
+        self._post = []
+        self._post_bytes = 0
+        
+        if not frames:
+            self._set_status(incident_id, 'failed')
+            return
+        try:
+            self._writes.put_nowait((incident_id, frames))
+            self._set_status(incident_id, 'encoding')
+        except queue.Full:
+            self._set_status(incident_id, 'failed')
+            self.clips_dropped += 1
+            print(f"✗ Clip writer busy, dropped clip for incident {incident_id}")
+    
+    def _writer_loop(self):
+        """Encode queued recordings to disk one at a time"""
+        while True:
+            job = self._writes.get()
+            if job is None:
+                return
+            incident_id, frames = job
+            try:
+                write_clip(self.clip_path(incident_id), frames, self.fps)
+                self._set_status(incident_id, 'ready')
+                self.clips_written += 1
+                print(f"✓ Saved clip for incident {incident_id} ({len(frames)} frames)")
+            except Exception as e:
+                self._set_status(incident_id, 'failed')
+                print(f"✗ Error writing clip for incident {incident_id}: {e}")
+    
+    def _set_status(self, incident_id, status):
+        """Remember a clip's state, forgetting the oldest beyond STATUS_HISTORY"""
+        with self._status_lock:
+            self._status[incident_id] = status
+            self._status.move_to_end(incident_id)
+            while len(self._status) > STATUS_HISTORY:
+                self._status.popitem(last=False)
+    
+    def clip_path(self, incident_id):
+        """Where the clip for an incident is (or will be) stored"""
+        return self.clip_dir / f"{incident_id}.mp4"
+    
+    def clip_status(self, incident_id):
+        """recording / encoding / ready / failed, or None for unknown incidents"""
+        with self._status_lock:
+            status = self._status.get(incident_id)
+        if status is None and self.clip_path(incident_id).exists():
+            # Written by an earlier run of the server
+            return 'ready'
+        return status
+    
+    def get_stats(self):
+        """Buffer occupancy and writer counters"""
+        with self._lock:
+            return {
+                'buffered_frames': len(self._frames),
+                'buffered_bytes': self._bytes,
+                'buffered_seconds': round(self._frames[-1][0] - self._frames[0][0], 2) if self._frames else 0.0,
+                'recording': self._recording[0] if self._recording else None,
+                'clips_written': self.clips_written,
+                'clips_dropped': self.clips_dropped
+            }
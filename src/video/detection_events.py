@@ -0,0 +1,96 @@
+"""
+Push channel for fall detection results
+The analysis stage publishes a compact record for every frame; subscribers
+only receive it when the detection state changes. Each subscriber has its
+own bounded queue so a slow consumer can never block the analysis loop.
+"""
+
+import json
+import queue
+import threading
+
+
+def compact_detection(detection):
+    """Reduce a detection dict to the fields push clients need"""
+    return {
+        'camera_id': detection.get('camera_id'),
+        'fall_detected': detection['fall_detected'],
+        'person_detected': detection.get('bbox') is not None,
+        'confidence': round(detection['confidence'], 3),
+        'frame_seq': detection.get('frame_seq'),
+        'incident_id': detection.get('incident_id'),
+        'timestamp': round(detection['timestamp'], 3)
+    }
+
+
+def format_sse(record, event='detection', event_id=None):
+    """Encode one record as a server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(record, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class DetectionBroadcaster:
+    """Fans detection state changes out to per-subscriber queues"""
+    
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self.latest = None
+        self.dropped = 0
+        self._subscribers = set()
+        self._last_state = None
+        self._event_id = 0
+        self._lock = threading.Lock()
+    
+    def subscribe(self, q=None):
+        """Register a new subscriber (optionally with its own queue) and return its queue"""
+        if q is None:
+            q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+    
+    def unsubscribe(self, q):
+        """Remove a subscriber queue"""
+        with self._lock:
+            self._subscribers.discard(q)
+    
+    @property
+    def subscriber_count(self):
+        """Number of connected subscribers"""
+        return len(self._subscribers)
+    
+    def publish(self, record):
+        """Store the latest record and push it if the state changed"""
+        self.latest = record
+        state = (record['fall_detected'], record['person_detected'])
+        if state == self._last_state:
+            return False
+        self._last_state = state
+        
+        with self._lock:
+            self._event_id += 1
+            item = (self._event_id, record)
+            subscribers = list(self._subscribers)
+        
+        for q in subscribers:
+            self._offer(q, item)
+        return True
+    
+    def _offer(self, q, item):
+        """Put without blocking; a full queue loses its oldest event"""
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            try:
+                q.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
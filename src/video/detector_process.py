@@ -0,0 +1,194 @@
+"""
+Fall detection in a dedicated worker process
+The capture side copies frames into a multiprocessing.shared_memory ring;
+the worker analyses the newest one and sends compact results back over a
+queue, so detection and HTTP serving never compete for the same GIL
+"""
+
+import multiprocessing as mp
+import numpy as np
+import queue
+import sys
+from multiprocessing import shared_memory
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.fall_detector import FallDetector
+
+
+class SharedFrameRing:
+    """Fixed-shape frame slots in shared memory with a per-slot sequence lock
+    
+    Header layout (float64): [latest_seq, slot0_seq, slot0_captured_at, ...].
+    A slot's seq is set to -1 while it is being written, so a reader can tell
+    a torn copy from a good one by comparing the seq before and after.
+    """
+    
+    def __init__(self, shape, dtype=np.uint8, slots=3, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        
+        header_len = 1 + slots * 2
+        header_bytes = header_len * 8
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + frame_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        
+        self._header = np.ndarray((header_len,), dtype=np.float64, buffer=self.shm.buf)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=self.dtype,
+                                  buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self._header[:] = 0
+    
+    @property
+    def name(self):
+        return self.shm.name
+    
+    def write(self, frame, seq, captured_at):
+        """Copy a frame into the slot for seq (single writer only)"""
+        slot = seq % self.slots
+        self._header[1 + slot * 2] = -1
+        np.copyto(self._frames[slot], frame)
+        self._header[2 + slot * 2] = captured_at
+        self._header[1 + slot * 2] = seq
+        self._header[0] = seq
+    
+    def read_latest(self, out, last_seq=0):
+        """Copy the newest frame into out; returns (seq, captured_at) or None"""
+        latest = int(self._header[0])
+        if latest <= last_seq:
+            return None
+        
+        slot = latest % self.slots
+        before = self._header[1 + slot * 2]
+        if before != latest:
+            # Already being overwritten by a newer frame
+            return None
+        np.copyto(out, self._frames[slot])
+        captured_at = float(self._header[2 + slot * 2])
+        if self._header[1 + slot * 2] != before:
+            return None
+        return latest, captured_at
+    
+    def close(self):
+        """Detach (and free, if this side created it) the shared block"""
+        # Drop numpy views first so the buffer can be released
+        self._header = None
+        self._frames = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def detector_worker(shm_name, shape, dtype, slots, detector_options,
+                    frame_ready, stop_event, results):
+    """Worker process entry point: analyse the newest shared frame until stopped"""
+    ring = SharedFrameRing(shape, dtype, slots, name=shm_name)
+    detector = FallDetector(**detector_options)
+    frame = np.empty(shape, dtype=dtype)
+    timings = {}
+    last_seq = 0
+    
+    try:
+        while not stop_event.is_set():
+            if not frame_ready.wait(timeout=0.5):
+                continue
+            frame_ready.clear()
+            
+            read = ring.read_latest(frame, last_seq)
+            if read is None:
+                continue
+            seq, captured_at = read
+            skipped = seq - last_seq - 1 if last_seq else 0
+            last_seq = seq
+            
+            result = detector.analyze_frame(frame, timings=timings)
+            try:
+                # Queue pickles in a feeder thread, so hand over a copy of timings
+                results.put_nowait((seq, captured_at, skipped, result.to_dict(), dict(timings)))
+            except queue.Full:
+                # Parent is not draining; the next result supersedes this one
+                pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+class DetectorProcess:
+    """Parent-side handle for one camera's detector worker process"""
+    
+    def __init__(self, detector_options, slots=3, name='detector'):
+        self.detector_options = detector_options
+        self.slots = slots
+        self.name = name
+        self.ring = None
+        self.process = None
+        self.results = None
+        # spawn: forking the threaded server can copy locks other threads hold
+        self._ctx = mp.get_context('spawn')
+        self._frame_ready = None
+        self._stop_event = None
+    
+    def _start(self, shape, dtype):
+        """Create the shared ring for this frame shape and launch the worker"""
+        self.ring = SharedFrameRing(shape, dtype, self.slots)
+        self.results = self._ctx.Queue(maxsize=64)
+        self._frame_ready = self._ctx.Event()
+        self._stop_event = self._ctx.Event()
+        self.process = self._ctx.Process(
+            target=detector_worker,
+            args=(self.ring.name, self.ring.shape, self.ring.dtype.str, self.slots,
+                  self.detector_options, self._frame_ready, self._stop_event, self.results),
+            name=self.name,
+            daemon=True
+        )
+        self.process.start()
+        print(f"✓ Detector process '{self.name}' started (pid {self.process.pid})")
+    
+    def submit(self, frame, seq, captured_at):
+        """Hand a frame to the worker; never waits for analysis"""
+        if self.ring is None or self.ring.shape != frame.shape:
+            # First frame, or the camera came back at a different resolution
+            self.stop()
+            self._start(frame.shape, frame.dtype)
+        elif not self.process.is_alive():
+            print(f"✗ Detector process '{self.name}' died, restarting")
+            self.stop()
+            self._start(frame.shape, frame.dtype)
+        
+        self.ring.write(frame, seq, captured_at)
+        self._frame_ready.set()
+    
+    def get_result(self, timeout=0.5):
+        """Next (seq, captured_at, skipped, detection, timings) from the worker, or None"""
+        if self.results is None:
+            return None
+        try:
+            return self.results.get(timeout=timeout)
+        except (queue.Empty, OSError, ValueError):
+            return None
+    
+    def stop(self):
+        """Stop the worker and free the shared memory"""
+        if self.process is not None:
+            self._stop_event.set()
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        if self.results is not None:
+            self.results.close()
+            self.results = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,136 @@
+"""
+Bounded frame ring buffer shared by the capture, analysis and serving stages
+The newest frame always wins: readers jump straight to the latest frame
+instead of working through a backlog of stale ones
+"""
+
+import cv2
+import threading
+import time
+
+
+class FramePacket:
+    """A captured frame plus the bookkeeping the later stages need"""
+    
+    __slots__ = ('seq', 'frame', 'captured_at', 'wall_time', 'etag',
+                 '_jpeg', '_jpeg_lock', '_on_encode')
+    
+    def __init__(self, seq, frame, captured_at, wall_time, etag, on_encode=None):
+        self.seq = seq                  # Monotonically increasing frame number
+        self.frame = frame              # BGR image as returned by OpenCV
+        self.captured_at = captured_at  # time.monotonic() when the frame was retrieved
+        self.wall_time = wall_time      # time.time() for display / API timestamps
+        self.etag = etag                # Unquoted HTTP entity tag for this frame version
+        self._jpeg = None
+        self._jpeg_lock = threading.Lock()
+        self._on_encode = on_encode     # Called with the encode time in seconds
+    
+    def get_jpeg(self, params=None):
+        """Encode the frame at most once and share the bytes with every caller"""
+        if self._jpeg is None:
+            # Only callers asking for this same frame wait here; the capture
+            # thread and requests for other frames are never blocked
+            with self._jpeg_lock:
+                if self._jpeg is None:
+                    started = time.perf_counter()
+                    ok, buffer = cv2.imencode('.jpg', self.frame, params or [])
+                    if not ok:
+                        raise ValueError("JPEG encoding failed")
+                    self._jpeg = buffer.tobytes()
+                    if self._on_encode is not None:
+                        self._on_encode(time.perf_counter() - started)
+        return self._jpeg
+    
+    @property
+    def has_jpeg(self):
+        """True once the frame has been encoded (get_jpeg() will not block)"""
+        return self._jpeg is not None
+
+
+class FrameRing:
+    """Small bounded ring of recent frames, latest-frame-wins"""
+    
+    def __init__(self, capacity=4, on_encode=None):
+        self.capacity = capacity
+        self.on_encode = on_encode  # Passed to every packet (encode timing hook)
+        self._slots = [None] * capacity
+        self._seq = 0
+        # Distinguishes frame versions across server restarts so a client's
+        # cached ETag from a previous run never matches a new frame
+        self._epoch = format(int(time.time() * 1000), 'x')
+        self._cond = threading.Condition()
+    
+    def put(self, frame, captured_at=None):
+        """Store a new frame, overwriting the oldest slot"""
+        captured_at = captured_at if captured_at is not None else time.monotonic()
+        with self._cond:
+            self._seq += 1
+            packet = FramePacket(self._seq, frame, captured_at, time.time(),
+                                 f"{self._epoch}-{self._seq}", self.on_encode)
+            self._slots[self._seq % self.capacity] = packet
+            self._cond.notify_all()
+        return packet
+    
+    def latest(self):
+        """Return the newest packet or None if nothing was captured yet"""
+        with self._cond:
+            if self._seq == 0:
+                return None
+            return self._slots[self._seq % self.capacity]
+    
+    def get(self, seq):
+        """Return the packet with this seq if it is still in the ring, else None"""
+        with self._cond:
+            packet = self._slots[seq % self.capacity]
+        if packet is not None and packet.seq == seq:
+            return packet
+        return None
+    
+    def wait_newer(self, last_seq, timeout=1.0):
+        """Block until a frame newer than last_seq exists and return the newest one"""
+        with self._cond:
+            if self._seq <= last_seq:
+                self._cond.wait_for(lambda: self._seq > last_seq, timeout=timeout)
+            if self._seq <= last_seq:
+                return None
+            return self._slots[self._seq % self.capacity]
+    
+    @property
+    def seq(self):
+        """Sequence number of the newest frame (0 = none yet)"""
+        return self._seq
+
+
+class StageStats:
+    """Frame counts, drops and end-to-end latency for one pipeline stage"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._latency_total = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, latency, dropped=0):
+        """Record one processed frame; latency is seconds since capture"""
+        with self._lock:
+            self.frames += 1
+            self.dropped += dropped
+            self.last_latency = latency
+            self._latency_total += latency
+            if latency > self.max_latency:
+                self.max_latency = latency
+    
+    def snapshot(self):
+        """Return the current figures as a JSON-friendly dict"""
+        with self._lock:
+            avg = self._latency_total / self.frames if self.frames else 0.0
+            return {
+                'frames': self.frames,
+                'dropped': self.dropped,
+                'last_latency_ms': round(self.last_latency * 1000, 2),
+                'avg_latency_ms': round(avg * 1000, 2),
+                'max_latency_ms': round(self.max_latency * 1000, 2)
+            }
@@ -3,156 +3,324 @@ Flask server that serves camera frames and performs fall detection
 Runs on port 5000 alongside Streamlit
 """
 
-from flask import Flask, Response, jsonify
-import cv2
-import threading
+from flask import Flask, Response, jsonify, request, send_file
+import queue
 import time
-import base64
 import sys
 from pathlib import Path
 
 # Add src directory to path so we can import core modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from core.fall_detector import FallDetector
+from config import (FRAME_SERVER_PORT, FRAME_SERVER_MODE, FALL_ANALYSIS_SIZE, CAMERA_SOURCES, FALL_DETECTOR_MODE,
+                    CLIP_DIR, CLIP_PRE_SECONDS, CLIP_POST_SECONDS, CLIP_FPS, CLIP_MAX_MB,
+                    INCIDENT_HISTORY, ANALYSIS_IDLE_AFTER, ANALYSIS_IDLE_FPS,
+                    parse_size, parse_camera_sources)
+from video.camera_registry import CameraRegistry
+from video.detection_events import format_sse
+from video.clip_recorder import valid_incident_id
+from video.metrics import render_prometheus
+from video.pacing import FramePacer
 
 app = Flask(__name__)
 
-# Global state
-latest_frame = None
-frame_lock = threading.Lock()
-last_frame_time = 0
-camera = None
-fall_detector = FallDetector(confidence_threshold=0.50)
-last_detection = {
-    'fall_detected': False,
-    'confidence': 0.0,
-    'timestamp': 0
-}
-fall_alert_time = 0  # When fall was detected
-fall_alert_duration = 5  # Keep alert active for 5 seconds
-
-def init_camera():
-    """Initialize camera capture"""
-    global camera
+# Each camera captures on its own thread and analysis runs on a shared pool;
+# Flask request threads only read the newest frame from a camera's ring buffer.
+# Detection runs at FALL_ANALYSIS_SIZE; served frames stay at full resolution.
+# FALL_DETECTOR_MODE=process moves detection into a worker process per camera.
+registry = CameraRegistry(parse_camera_sources(CAMERA_SOURCES),
+                          width=1280, height=720, fps=30,
+                          confidence_threshold=0.50, fall_alert_duration=5,
+                          analysis_size=parse_size(FALL_ANALYSIS_SIZE),
+                          detector_mode=FALL_DETECTOR_MODE,
+                          clip_dir=CLIP_DIR or None, clip_pre_seconds=CLIP_PRE_SECONDS,
+                          clip_post_seconds=CLIP_POST_SECONDS, clip_fps=CLIP_FPS,
+                          clip_max_mb=CLIP_MAX_MB, incident_history=INCIDENT_HISTORY,
+                          analysis_idle_after=ANALYSIS_IDLE_AFTER,
+                          analysis_idle_fps=ANALYSIS_IDLE_FPS)
+
+# Legacy single-camera endpoints serve the first configured camera
+pipeline = registry.default
+
+STREAM_FPS = 15  # Default per-client MJPEG rate; clients can ask for ?fps=N
+SSE_HEARTBEAT = 10  # Seconds between heartbeats when nothing changes; ?heartbeat=N
+
+def generate_mjpeg(pipeline, fps):
+    """Yield multipart JPEG parts for one client, paced to at most fps"""
+    pacer = FramePacer(fps)
+    last_seq = 0
+    
+    # Counted as a viewer until the client disconnects (GeneratorExit)
+    pipeline.metrics.viewer_connected()
+    try:
+        while True:
+            # This client's next slot; a slow client skips the slots it missed
+            # instead of bursting to catch up
+            pacer.wait()
+            packet = pipeline.ring.wait_newer(last_seq, timeout=1.0)
+            if packet is None:
+                continue
+            
+            # Frames that arrived while this client was paced out are skipped
+            skipped = packet.seq - last_seq - 1 if last_seq else 0
+            last_seq = packet.seq
+            
+            try:
+                jpeg = packet.get_jpeg()
+            except Exception as e:
+                print(f"✗ Error encoding frame: {e}")
+                continue
+            
+            pipeline.serving_stats.record(time.monotonic() - packet.captured_at, dropped=skipped)
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n' +
+                   jpeg + b'\r\n')
+    
+    finally:
+        pipeline.metrics.viewer_disconnected()
+
+def get_camera(camera_id):
+    """Look up a camera pipeline; returns (pipeline, error_response)"""
+    camera = registry.get(camera_id)
     if camera is None:
-        try:
-            camera = cv2.VideoCapture(0)
-            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-            camera.set(cv2.CAP_PROP_FPS, 30)
-            print("✓ Camera initialized successfully")
-        except Exception as e:
-            print(f"✗ Error initializing camera: {e}")
-            camera = None
-    return camera
-
-def capture_and_analyze():
-    """Continuously capture frames and analyze for falls"""
-    global latest_frame, last_frame_time, camera, last_detection, fall_alert_time
+        return None, (jsonify({'error': f"Unknown camera '{camera_id}'"}), 404)
+    return camera, None
+
+def frame_response(pipeline):
+    """Latest frame as JPEG (304 if the client already has this version)"""
+    packet = pipeline.latest_frame()
+    if packet is None:
+        return '', 404
     
-    init_camera()
+    headers = {
+        'ETag': f'"{packet.etag}"',
+        'X-Frame-Seq': str(packet.seq),
+        'Cache-Control': 'no-cache'
+    }
+
+    # Unchanged frame: no encode and no body
+    if request.if_none_match.contains(packet.etag):
+        return Response(status=304, headers=headers)
     
-    while True:
+    try:
+        # Encoded once per frame version, shared by every viewer
+        jpeg = packet.get_jpeg()
+        return Response(jpeg, mimetype='image/jpeg', headers=headers)
+    except Exception as e:
+        print(f"✗ Error encoding frame: {e}")
+        return '', 500
+
+def stream_response(pipeline):
+    """Live frames as multipart/x-mixed-replace MJPEG"""
+    fps = request.args.get('fps', default=STREAM_FPS, type=float) or STREAM_FPS
+    fps = max(1.0, min(fps, float(pipeline.fps)))
+    
+    return Response(generate_mjpeg(pipeline, fps),
+                    mimetype='multipart/x-mixed-replace; boundary=frame',
+                    headers={'Cache-Control': 'no-cache, no-store'})
+
+def detection_stream_response(pipeline):
+    """Detection state changes as server-sent events"""
+    heartbeat = request.args.get('heartbeat', default=SSE_HEARTBEAT, type=float) or SSE_HEARTBEAT
+    heartbeat = max(1.0, heartbeat)
+    
+    def generate():
+        events = pipeline.events
+        subscriber = events.subscribe()
         try:
-            if camera is not None:
-                ret, frame = camera.read()
-                if ret:
-                    with frame_lock:
-                        latest_frame = frame.copy()
-                        last_frame_time = time.time()
-                    
-                    # Analyze frame for falls
-                    detection = fall_detector.analyze_frame(frame)
-                    
-                    # Debug output every 30 frames (1 second at 30 FPS)
-                    if int(time.time() * 10) % 3 == 0:  # Every ~1 second
-                        aspect_str = f"{detection['aspect_ratio']:.2f}" if detection['aspect_ratio'] else "N/A"
-                        print(f"📊 Detection: Conf={detection['confidence']:.2%} | Aspect={aspect_str} | Motion={detection['motion']} | Fall={detection['fall_detected']}")
-                    
-                    if detection['fall_detected']:
-                        fall_alert_time = time.time()
-                        print(f"🚨 FALL DETECTED! Confidence: {detection['confidence']:.2%}")
-                    
-                    # Update detection status
-                    # Keep alert active for fall_alert_duration seconds
-                    current_time = time.time()
-                    is_alert_active = (current_time - fall_alert_time) < fall_alert_duration
-                    
-                    last_detection = {
-                        'fall_detected': is_alert_active,
-                        'confidence': detection['confidence'],
-                        'timestamp': current_time,
-                        'aspect_ratio': detection['aspect_ratio'],
-                        'motion': detection['motion'],
-                        'alert_active_for': max(0, fall_alert_duration - (current_time - fall_alert_time))
-                    }
-                else:
-                    print("✗ Failed to read frame from camera")
-                    camera = None
-                    init_camera()
-            time.sleep(0.033)  # ~30 FPS
-        except Exception as e:
-            print(f"✗ Error in capture_and_analyze: {e}")
-            time.sleep(1)
+            # Current state first so clients don't wait for the next change
+            yield "retry: 2000\n\n"
+            if events.latest is not None:
+                yield format_sse(events.latest, 'detection')
+            while True:
+                try:
+                    event_id, record = subscriber.get(timeout=heartbeat)
+                    yield format_sse(record, 'detection', event_id)
+                except queue.Empty:
+                    yield format_sse(events.latest or {}, 'heartbeat')
+        finally:
+            events.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/frame', methods=['GET'])
 def get_frame():
-    """Return latest frame as JPEG"""
-    global latest_frame
-    
-    with frame_lock:
-        if latest_frame is not None:
-            try:
-                _, buffer = cv2.imencode('.jpg', latest_frame)
-                return Response(buffer.tobytes(), mimetype='image/jpeg')
-            except Exception as e:
-                print(f"✗ Error encoding frame: {e}")
-                return '', 500
-    
-    return '', 404
+    """Return latest frame as JPEG (304 if the client already has this version)"""
+    return frame_response(pipeline)
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    """Stream live frames as multipart/x-mixed-replace MJPEG"""
+    return stream_response(pipeline)
 
 @app.route('/api/detection', methods=['GET'])
 def get_detection():
     """Return latest fall detection result"""
-    global last_detection
+    return jsonify(pipeline.last_detection), 200
     
-    return jsonify(last_detection), 200
+@app.route('/api/detection/stream', methods=['GET'])
+def detection_stream():
+    """Push detection state changes as server-sent events"""
+    return detection_stream_response(pipeline)
+
+@app.route('/api/cameras', methods=['GET'])
+def list_cameras():
+    """Return the configured camera ids"""
+    return jsonify({
+        'default': registry.default_id,
+        'cameras': list(registry.cameras.keys())
+    }), 200
+
+@app.route('/api/cameras/status', methods=['GET'])
+def cameras_status():
+    """Return aggregate status for all cameras"""
+    return jsonify(registry.status()), 200
+
+@app.route('/api/cameras/<camera_id>/frame', methods=['GET'])
+def get_camera_frame(camera_id):
+    """Return latest frame for one camera as JPEG"""
+    camera, error = get_camera(camera_id)
+    return error or frame_response(camera)
+
+@app.route('/api/cameras/<camera_id>/stream', methods=['GET'])
+def camera_stream(camera_id):
+    """Stream one camera as MJPEG"""
+    camera, error = get_camera(camera_id)
+    return error or stream_response(camera)
+
+@app.route('/api/cameras/<camera_id>/detection', methods=['GET'])
+def get_camera_detection(camera_id):
+    """Return latest fall detection result for one camera"""
+    camera, error = get_camera(camera_id)
+    return error or (jsonify(camera.last_detection), 200)
+
+@app.route('/api/cameras/<camera_id>/detection/stream', methods=['GET'])
+def camera_detection_stream(camera_id):
+    """Push detection state changes for one camera as server-sent events"""
+    camera, error = get_camera(camera_id)
+    return error or detection_stream_response(camera)
+
+def incident_summary(incident):
+    """Incident metadata plus links to its snapshot and clip"""
+    record = incident.to_dict()
+    record['image_url'] = f"/api/incidents/{incident.incident_id}/image"
+    camera = registry.get(incident.camera_id)
+    clip_status = None
+    if camera is not None and camera.clip_recorder is not None:
+        clip_status = camera.clip_recorder.clip_status(incident.incident_id)
+    record['clip_status'] = clip_status
+    record['clip_url'] = f"/api/incidents/{incident.incident_id}/clip" if clip_status else None
+    return record
+
+@app.route('/api/incidents', methods=['GET'])
+def list_incidents():
+    """Return recent incidents, newest first (?limit=N, ?camera=id)"""
+    limit = max(1, min(request.args.get('limit', default=20, type=int) or 20, registry.incidents.max_incidents))
+    incidents = registry.incidents.recent(limit, camera_id=request.args.get('camera'))
+    return jsonify({'incidents': [incident_summary(i) for i in incidents]}), 200
+
+@app.route('/api/incidents/<incident_id>', methods=['GET'])
+def get_incident(incident_id):
+    """Return metadata for one incident"""
+    incident = registry.incidents.get(incident_id)
+    if incident is None:
+        return jsonify({'error': f"Unknown incident '{incident_id}'"}), 404
+    return jsonify(incident_summary(incident)), 200
+
+@app.route('/api/incidents/<incident_id>/image', methods=['GET'])
+def get_incident_image(incident_id):
+    """Return the frame that triggered an incident as JPEG"""
+    incident = registry.incidents.get(incident_id)
+    if incident is None or incident.jpeg is None:
+        return jsonify({'error': f"No image for incident '{incident_id}'"}), 404
+    
+    # The snapshot never changes, so clients may cache it for good
+    headers = {
+        'ETag': f'"{incident_id}"',
+        'Cache-Control': 'private, max-age=86400, immutable'
+    }
+    if request.if_none_match.contains(incident_id):
+        return Response(status=304, headers=headers)
+    return Response(incident.jpeg, mimetype='image/jpeg', headers=headers)
+
+@app.route('/api/incidents/<incident_id>/clip', methods=['GET'])
+def get_incident_clip(incident_id):
+    """Return the pre/post-event MP4 for an incident (202 while it is being made)"""
+    if not valid_incident_id(incident_id):
+        return jsonify({'error': 'Invalid incident id'}), 400
+    
+    camera, status = registry.find_clip(incident_id)
+    if camera is None:
+        return jsonify({'error': f"No clip for incident '{incident_id}'"}), 404
+    if status in ('recording', 'encoding'):
+        return jsonify({'incident_id': incident_id, 'status': status}), 202, {'Retry-After': '5'}
+    if status == 'failed':
+        return jsonify({'error': 'Clip could not be recorded', 'status': status}), 404
+    
+    return send_file(camera.clip_recorder.clip_path(incident_id), mimetype='video/mp4',
+                     conditional=True, download_name=f"{incident_id}.mp4")
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Return detection statistics"""
-    stats = fall_detector.get_statistics()
+    stats = pipeline.fall_detector.get_statistics()
     return jsonify(stats), 200
 
+@app.route('/api/pipeline', methods=['GET'])
+def get_pipeline():
+    """Return per-stage frame counts, drops and end-to-end latency per camera"""
+    return jsonify({camera_id: camera.get_stats()
+                    for camera_id, camera in registry.cameras.items()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage latency histograms, FPS, drops and viewers in Prometheus format"""
+    return Response(render_prometheus(registry.cameras),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    global latest_frame, last_frame_time
-    frame_age = time.time() - last_frame_time if last_frame_time > 0 else -1
-    
-    return jsonify({
-        'status': 'ok',
-        'has_frame': latest_frame is not None,
-        'frame_age_seconds': frame_age,
-        'last_detection': last_detection
-    }), 200
+    return jsonify(registry.health()), 200
 
 if __name__ == '__main__':
     print("=" * 60)
     print("Fall Detection Frame Server")
     print("=" * 60)
-    print("Starting on http://0.0.0.0:5000")
+    print(f"Starting on http://0.0.0.0:{FRAME_SERVER_PORT} ({FRAME_SERVER_MODE} mode)")
     print("\nEndpoints:")
     print("  GET /api/frame - Returns JPEG frame")
+    print("  GET /api/stream?fps=15 - Live MJPEG stream")
     print("  GET /api/detection - Returns fall detection result")
+    print("  GET /api/detection/stream - Server-sent detection events")
     print("  GET /api/stats - Returns detection statistics")
+    print("  GET /api/pipeline - Returns per-stage latency and dropped frames")
+    print("  GET /api/cameras - Lists cameras (default camera serves the routes above)")
+    print("  GET /api/cameras/status - Aggregate status for all cameras")
+    print("  GET /api/cameras/<id>/frame|stream|detection|detection/stream")
+    print("  GET /api/incidents - Recent fall incidents (newest first)")
+    print("  GET /api/incidents/<id>/image - Frame that triggered the incident")
+    print("  GET /api/incidents/<id>/clip - Pre/post-event MP4 for a fall incident")
+    print("  GET /metrics - Prometheus metrics (stage latency, FPS, drops, viewers)")
     print("  GET /health - Health check")
+    print(f"\nCameras: {', '.join(registry.cameras)} ({registry.analysis_workers} analysis workers, {registry.detector_mode} mode)")
     print("=" * 60)
     
-    # Start frame capture in background thread
-    capture_thread = threading.Thread(target=capture_and_analyze, daemon=True)
-    capture_thread.start()
+    # Start capture threads and the shared analysis pool
+    registry.start()
     
-    # Start Flask server
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    if FRAME_SERVER_MODE == 'asgi':
+        # Hot routes run on uvicorn's event loop; the rest of the API is the
+        # same Flask app, bridged through uvicorn's WSGI adapter
+        import uvicorn
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+        from video.asgi_server import AsyncFrameServer
+        
+        server = AsyncFrameServer(registry, fallback=WSGIMiddleware(app),
+                                  stream_fps=STREAM_FPS, sse_heartbeat=SSE_HEARTBEAT)
+        uvicorn.run(server, host='0.0.0.0', port=FRAME_SERVER_PORT, log_level='warning')
+    else:
+        # Start Flask server
+        app.run(host='0.0.0.0', port=FRAME_SERVER_PORT, debug=False, threaded=True)
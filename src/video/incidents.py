@@ -0,0 +1,102 @@
+"""
+Recent fall incidents with the frame that triggered them
+The JPEG is encoded once at detection time and pinned in a bounded LRU, so
+alerts and the dashboard get the exact moment of the fall instead of
+whatever the live frame shows a few seconds later
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class Incident:
+    """One fall incident: metadata plus the triggering frame as JPEG"""
+    
+    __slots__ = ('incident_id', 'camera_id', 'timestamp', 'frame_seq', 'confidence',
+                 'aspect_ratio', 'motion', 'bbox', 'jpeg')
+    
+    def __init__(self, incident_id, camera_id, timestamp, frame_seq, confidence,
+                 aspect_ratio, motion, bbox, jpeg):
+        self.incident_id = incident_id
+        self.camera_id = camera_id
+        self.timestamp = timestamp      # time.time() when the frame was captured
+        self.frame_seq = frame_seq
+        self.confidence = confidence
+        self.aspect_ratio = aspect_ratio
+        self.motion = motion
+        self.bbox = bbox                # (x, y, w, h) in frame pixels
+        self.jpeg = jpeg                # Encoded triggering frame (or None)
+    
+    def to_dict(self):
+        """JSON-friendly metadata (without the image bytes)"""
+        return {
+            'incident_id': self.incident_id,
+            'camera_id': self.camera_id,
+            'timestamp': self.timestamp,
+            'frame_seq': self.frame_seq,
+            'confidence': self.confidence,
+            'aspect_ratio': self.aspect_ratio,
+            'motion': self.motion,
+            'bbox': self.bbox,
+            'has_image': self.jpeg is not None,
+            'image_bytes': len(self.jpeg) if self.jpeg is not None else 0
+        }
+
+
+class IncidentLog:
+    """Bounded LRU of recent incidents, shared by all cameras
+    
+    Bounded by count and by total JPEG bytes; the least recently used
+    incident is evicted first.
+    """
+    
+    def __init__(self, max_incidents=100, max_bytes=32 * 1024 * 1024):
+        self.max_incidents = max_incidents
+        self.max_bytes = max_bytes
+        self._incidents = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+    
+    def add(self, incident):
+        """Pin a new incident, evicting the least recently used ones if needed"""
+        size = len(incident.jpeg) if incident.jpeg is not None else 0
+        with self._lock:
+            old = self._incidents.pop(incident.incident_id, None)
+            if old is not None and old.jpeg is not None:
+                self._bytes -= len(old.jpeg)
+            self._incidents[incident.incident_id] = incident
+            self._bytes += size
+            while len(self._incidents) > 1 and (len(self._incidents) > self.max_incidents or
+                                                self._bytes > self.max_bytes):
+                _, evicted = self._incidents.popitem(last=False)
+                if evicted.jpeg is not None:
+                    self._bytes -= len(evicted.jpeg)
+                self.evicted += 1
+        return incident
+    
+    def get(self, incident_id):
+        """Return an incident (marking it recently used) or None"""
+        with self._lock:
+            incident = self._incidents.get(incident_id)
+            if incident is not None:
+                self._incidents.move_to_end(incident_id)
+            return incident
+    
+    def recent(self, limit=20, camera_id=None):
+        """Newest incidents first, optionally for one camera"""
+        with self._lock:
+            incidents = list(self._incidents.values())
+        incidents.sort(key=lambda i: i.timestamp, reverse=True)
+        if camera_id is not None:
+            incidents = [i for i in incidents if i.camera_id == camera_id]
+        return incidents[:limit]
+    
+    def get_stats(self):
+        """Occupancy figures for /health"""
+        with self._lock:
+            return {
+                'incidents': len(self._incidents),
+                'image_bytes': self._bytes,
+                'evicted': self.evicted
+            }
@@ -0,0 +1,221 @@
+"""
+Low-overhead latency histograms and rate meters for the frame server
+Every stage records into fixed buckets (one bisect and one increment per
+observation), so percentiles come for free at scrape time and nothing grows
+with uptime. render_prometheus() produces the /metrics text format.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds: 0.25 ms .. 2.5 s, roughly 2x apart
+LATENCY_BUCKETS = (0.00025, 0.0005, 0.001, 0.002, 0.004, 0.008, 0.016,
+                   0.032, 0.064, 0.125, 0.25, 0.5, 1.0, 2.5)
+
+PIPELINE_STAGES = ('capture', 'preprocess', 'detect_person', 'detect_motion',
+                   'scoring', 'jpeg_encode')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in seconds"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds):
+        """Record one duration"""
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+            self._count += 1
+    
+    def snapshot(self):
+        """Consistent copy of (bucket counts, sum, count)"""
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+    
+    def quantile(self, q, snapshot=None):
+        """Estimate a quantile by interpolating inside its bucket"""
+        counts, _, total = snapshot or self.snapshot()
+        if total == 0:
+            return 0.0
+        
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    # Overflow bucket has no upper bound; report its floor
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+    
+    def summary(self):
+        """p50/p95/p99 and mean in milliseconds"""
+        snapshot = self.snapshot()
+        _, total_seconds, count = snapshot
+        result = {f"p{int(q * 100)}_ms": round(self.quantile(q, snapshot) * 1000, 3) for q in QUANTILES}
+        result['mean_ms'] = round(total_seconds / count * 1000, 3) if count else 0.0
+        result['count'] = count
+        return result
+
+
+class RateMeter:
+    """Events per second over a sliding window of whole seconds"""
+    
+    def __init__(self, window=5):
+        self.window = window
+        self._slots = [0] * (window + 1)
+        self._slot_second = [0] * (window + 1)
+        self._lock = threading.Lock()
+    
+    def tick(self, count=1):
+        """Count events happening now"""
+        second = int(time.monotonic())
+        index = second % len(self._slots)
+        with self._lock:
+            if self._slot_second[index] != second:
+                self._slot_second[index] = second
+                self._slots[index] = 0
+            self._slots[index] += count
+    
+    def rate(self):
+        """Average rate over the last window complete seconds"""
+        current = int(time.monotonic())
+        with self._lock:
+            total = sum(count for count, second in zip(self._slots, self._slot_second)
+                        if current - self.window <= second < current)
+        return total / self.window
+
+
+class PipelineMetrics:
+    """Histograms, rates and viewer gauges for one camera pipeline"""
+    
+    def __init__(self, stages=PIPELINE_STAGES):
+        self.stages = {stage: LatencyHistogram() for stage in stages}
+        self.capture_rate = RateMeter()
+        self.analysis_rate = RateMeter()
+        self.stream_viewers = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, stage, seconds):
+        """Record a duration for a known stage (unknown stages are ignored)"""
+        histogram = self.stages.get(stage)
+        if histogram is not None:
+            histogram.observe(seconds)
+    
+    def observe_all(self, timings):
+        """Record a {stage: seconds} dict such as analyze_frame() fills in"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+    
+    def viewer_connected(self):
+        """An MJPEG client started streaming"""
+        with self._lock:
+            self.stream_viewers += 1
+    
+    def viewer_disconnected(self):
+        """An MJPEG client went away"""
+        with self._lock:
+            self.stream_viewers -= 1
+    
+    def latency_summary(self):
+        """Per-stage percentiles for JSON endpoints"""
+        return {stage: histogram.summary() for stage, histogram in self.stages.items()}
+
+
+def _labels(**labels):
+    """Prometheus label set, values escaped"""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_bound(bound):
+    """Bucket bound as Prometheus writes it (e.g. 0.001, 2.5)"""
+    return f"{bound:g}"
+
+
+def render_prometheus(cameras):
+    """Render metrics for {camera_id: CameraPipeline} in Prometheus text format"""
+    lines = []
+    
+    def header(name, kind, text):
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+    
+    header('frame_server_stage_latency_seconds', 'histogram',
+           'Time spent in each pipeline stage per frame')
+    quantile_lines = []
+    for camera_id, pipeline in cameras.items():
+        for stage, histogram in pipeline.metrics.stages.items():
+            snapshot = histogram.snapshot()
+            counts, total_seconds, count = snapshot
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"frame_server_stage_latency_seconds_bucket"
+                             f"{_labels(camera=camera_id, stage=stage, le=_format_bound(bound))} {cumulative}")
+            lines.append(f"frame_server_stage_latency_seconds_bucket"
+                         f"{_labels(camera=camera_id, stage=stage, le='+Inf')} {count}")
+            lines.append(f"frame_server_stage_latency_seconds_sum{_labels(camera=camera_id, stage=stage)} {total_seconds:.6f}")
+            lines.append(f"frame_server_stage_latency_seconds_count{_labels(camera=camera_id, stage=stage)} {count}")
+            for q in QUANTILES:
+                quantile_lines.append(f"frame_server_stage_latency_quantile_seconds"
+                                      f"{_labels(camera=camera_id, stage=stage, quantile=q)} "
+                                      f"{histogram.quantile(q, snapshot):.6f}")
+    
+    header('frame_server_stage_latency_quantile_seconds', 'gauge',
+           'Estimated p50/p95/p99 per stage from the histogram buckets')
+    lines.extend(quantile_lines)
+    
+    header('frame_server_fps', 'gauge', 'Achieved frames per second (5 s window)')
+    for camera_id, pipeline in cameras.items():
+        lines.append(f"frame_server_fps{_labels(camera=camera_id, stage='capture')} {pipeline.metrics.capture_rate.rate():.2f}")
+        lines.append(f"frame_server_fps{_labels(camera=camera_id, stage='analysis')} {pipeline.metrics.analysis_rate.rate():.2f}")
+    
+    header('frame_server_target_fps', 'gauge', 'Configured capture frame rate')
+    for camera_id, pipeline in cameras.items():
+        lines.append(f"frame_server_target_fps{_labels(camera=camera_id)} {float(pipeline.fps):.2f}")
+    
+    header('frame_server_pacing_missed_deadlines_total', 'counter',
+           'Capture deadlines skipped because the paced loop fell behind (recordings only)')
+    for camera_id, pipeline in cameras.items():
+        if pipeline.pacer is not None:
+            lines.append(f"frame_server_pacing_missed_deadlines_total{_labels(camera=camera_id)} {pipeline.pacer.missed}")
+    
+    header('frame_server_dropped_frames_total', 'counter',
+           'Frames skipped per stage (stale driver frames, unanalysed or unsent frames)')
+    for camera_id, pipeline in cameras.items():
+        for stats in (pipeline.capture_stats, pipeline.analysis_stats, pipeline.serving_stats):
+            lines.append(f"frame_server_dropped_frames_total{_labels(camera=camera_id, stage=stats.name)} {stats.dropped}")
+    
+    header('frame_server_frames_total', 'counter', 'Frames processed per stage')
+    for camera_id, pipeline in cameras.items():
+        for stats in (pipeline.capture_stats, pipeline.analysis_stats, pipeline.serving_stats):
+            lines.append(f"frame_server_frames_total{_labels(camera=camera_id, stage=stats.name)} {stats.frames}")
+    
+    header('frame_server_viewers', 'gauge', 'Connected clients (MJPEG streams and SSE subscribers)')
+    for camera_id, pipeline in cameras.items():
+        lines.append(f"frame_server_viewers{_labels(camera=camera_id, kind='stream')} {pipeline.metrics.stream_viewers}")
+        lines.append(f"frame_server_viewers{_labels(camera=camera_id, kind='sse')} {pipeline.events.subscriber_count}")
+    
+    header('frame_server_fall_alert_active', 'gauge', '1 while a fall alert is active')
+    for camera_id, pipeline in cameras.items():
+        lines.append(f"frame_server_fall_alert_active{_labels(camera=camera_id)} "
+                     f"{1 if pipeline.last_detection.get('fall_detected') else 0}")
+    
+    return "\n".join(lines) + "\n"
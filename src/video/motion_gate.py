@@ -0,0 +1,92 @@
+"""
+Motion gate for the analysis stage
+A tiny grayscale frame difference runs on every captured frame; the full
+detector only runs at the capture rate while something moves or a person is
+in view, and drops to a low idle rate once the room has been still for a while
+"""
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Decides per frame whether the full detector should run
+    
+    Motion is checked on every frame, so the first moving frame after an
+    idle period is analysed immediately - going idle never delays an alert.
+    """
+    
+    def __init__(self, idle_after=30.0, idle_fps=2.0, size=(160, 90),
+                 pixel_threshold=25, min_changed=0.002):
+        self.idle_after = idle_after            # Seconds without activity before backing off
+        self.idle_interval = 1.0 / idle_fps if idle_fps > 0 else float('inf')
+        self.idle_fps = idle_fps
+        self.size = size                        # (width, height) of the difference check
+        self.pixel_threshold = pixel_threshold  # Gray level change that counts as motion
+        self.min_changed = min_changed          # Fraction of changed pixels that counts as activity
+        
+        width, height = size
+        self._small = None
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._prev = np.empty_like(self._gray)
+        self._diff = np.empty_like(self._gray)
+        self._has_prev = False
+        
+        self.last_activity = None   # Monotonic time of the last motion / person
+        self.last_analysis = 0.0
+        self.last_changed = 0.0     # Changed-pixel fraction of the latest frame
+        self.gated = 0              # Frames skipped while idle
+    
+    def motion_fraction(self, frame):
+        """Fraction of pixels that changed since the previous frame"""
+        width, height = self.size
+        small_shape = (height, width) + frame.shape[2:]
+        if self._small is None or self._small.shape != small_shape:
+            self._small = np.empty(small_shape, dtype=frame.dtype)
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        if self._small.ndim == 3:
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        else:
+            np.copyto(self._gray, self._small)
+        
+        if not self._has_prev:
+            changed = 1.0
+            self._has_prev = True
+        else:
+            cv2.absdiff(self._prev, self._gray, dst=self._diff)
+            cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+            changed = cv2.countNonZero(self._diff) / self._diff.size
+        
+        self._prev, self._gray = self._gray, self._prev
+        return changed
+    
+    def note_activity(self, now):
+        """Something worth watching (a person, an active alert) was seen"""
+        self.last_activity = now
+    
+    def is_active(self, now):
+        """True while the full analysis rate applies"""
+        return self.last_activity is not None and now - self.last_activity < self.idle_after
+    
+    def should_analyze(self, frame, now):
+        """Run the cheap check on frame and decide whether to analyse it"""
+        self.last_changed = self.motion_fraction(frame)
+        if self.last_changed >= self.min_changed:
+            self.note_activity(now)
+        
+        if self.is_active(now) or now - self.last_analysis >= self.idle_interval:
+            self.last_analysis = now
+            return True
+        self.gated += 1
+        return False
+    
+    def snapshot(self, now):
+        """Current mode for /health"""
+        return {
+            'mode': 'active' if self.is_active(now) else 'idle',
+            'idle_after_seconds': self.idle_after,
+            'idle_fps': self.idle_fps,
+            'changed_fraction': round(self.last_changed, 4),
+            'seconds_since_activity': round(now - self.last_activity, 1) if self.last_activity is not None else None,
+            'gated_frames': self.gated
+        }
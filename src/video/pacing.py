@@ -0,0 +1,98 @@
+"""
+Drift-free frame pacing
+Deadlines are absolute points on the monotonic clock (start + n * period), so
+processing time is absorbed instead of added to every frame, and a loop that
+falls behind skips the deadlines it missed rather than bursting to catch up
+"""
+
+import asyncio
+import threading
+import time
+
+
+class FramePacer:
+    """Paces a loop to a target rate using absolute monotonic deadlines"""
+    
+    def __init__(self, fps):
+        self.fps = float(fps)
+        self.period = 1.0 / self.fps
+        self.next_deadline = None
+        self.ticks = 0
+        self.missed = 0           # Deadlines skipped because the loop was late
+        self.max_lateness = 0.0   # Worst wake-up after a deadline, in seconds
+        self._lateness_total = 0.0
+        self._started = None
+        self._lock = threading.Lock()
+    
+    def reset(self):
+        """Start a fresh schedule (e.g. after a reconnect or a long pause)"""
+        self.next_deadline = None
+    
+    def wait(self):
+        """Sleep until the next deadline; returns how many deadlines were skipped"""
+        delay, skipped = self._next_delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self._tick(skipped)
+    
+    async def wait_async(self):
+        """wait() for event-loop callers: yields to the loop instead of blocking it"""
+        delay, skipped = self._next_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._tick(skipped)
+    
+    def _next_delay(self):
+        """Seconds until the next deadline and how many deadlines were missed"""
+        now = time.monotonic()
+        if self.next_deadline is None:
+            # First tick runs immediately and anchors the schedule
+            self.next_deadline = now
+            if self._started is None:
+                self._started = now
+            return 0.0, 0
+        
+        delay = self.next_deadline - now
+        if -delay >= self.period:
+            # Whole periods were missed: drop them instead of accumulating lag
+            skipped = int(-delay // self.period)
+            self.next_deadline += skipped * self.period
+            return 0.0, skipped
+        return delay, 0
+    
+    def _tick(self, skipped):
+        """Close the current deadline and schedule the next one"""
+        lateness = max(0.0, time.monotonic() - self.next_deadline)
+        self.next_deadline += self.period
+        with self._lock:
+            self.missed += skipped
+        self._count(lateness)
+        return skipped
+    
+    def _count(self, lateness):
+        """Book one tick and how late it woke up"""
+        with self._lock:
+            self.ticks += 1
+            self._lateness_total += lateness
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+    
+    def achieved_fps(self):
+        """Average rate since the schedule started"""
+        if self._started is None or self.ticks < 2:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return (self.ticks - 1) / elapsed if elapsed > 0 else 0.0
+    
+    def snapshot(self):
+        """Target vs achieved rate and deadline misses"""
+        with self._lock:
+            ticks = self.ticks
+            return {
+                'target_fps': round(self.fps, 2),
+                'achieved_fps': round(self.achieved_fps(), 2),
+                'ticks': ticks,
+                'missed_deadlines': self.missed,
+                'avg_lateness_ms': round(self._lateness_total / ticks * 1000, 3) if ticks else 0.0,
+                'max_lateness_ms': round(self.max_lateness * 1000, 3)
+            }
@@ -0,0 +1,417 @@
+"""
+Capture / analysis pipeline for the frame server
+Capture, fall analysis and HTTP serving run as separate stages joined by a
+FrameRing, so a slow detector never backs up the camera. Analysis runs on a
+thread pool or, with detector_mode='process', in a worker process per camera
+"""
+
+import cv2
+import threading
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.fall_detector import FallDetector
+from video.frame_buffer import FrameRing, StageStats
+from video.detection_events import DetectionBroadcaster, compact_detection
+from video.detector_process import DetectorProcess
+from video.clip_recorder import ClipRecorder, new_incident_id
+from video.incidents import Incident, IncidentLog
+from video.metrics import PipelineMetrics
+from video.motion_gate import MotionGate
+from video.pacing import FramePacer
+
+
+class CameraPipeline:
+    """Runs the capture and analysis stages for one camera
+    
+    source can be a device index, an RTSP/HTTP URL or a video file path.
+    Analysis jobs run on executor (shared between cameras by CameraRegistry);
+    at most one job per camera is in flight, always on the newest frame.
+    With detector_mode='process' frames go through shared memory to a
+    dedicated detector process instead, and results are applied by a
+    listener thread.
+    
+    With a motion gate (analysis_idle_after > 0) every frame first goes
+    through a cheap difference check; the detector runs at the capture rate
+    only while there is motion, a person or an active alert, and at
+    analysis_idle_fps otherwise.
+    """
+    
+    def __init__(self, source=0, width=1280, height=720, fps=30,
+                 confidence_threshold=0.50, fall_alert_duration=5, ring_size=4,
+                 analysis_size=None, camera_id='default', executor=None,
+                 detector_mode='thread', clip_dir=None, clip_pre_seconds=10,
+                 clip_post_seconds=10, clip_fps=10, clip_max_mb=64, incident_log=None,
+                 analysis_idle_after=30, analysis_idle_fps=2):
+        self.camera_id = camera_id
+        self.source = source
+        self.is_device = isinstance(source, int)
+        self.is_file = isinstance(source, str) and Path(source).is_file()
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.camera = None
+        self.fall_detector = FallDetector(confidence_threshold=confidence_threshold,
+                                          analysis_size=analysis_size)
+        
+        if detector_mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown detector mode: {detector_mode}")
+        self.detector_mode = detector_mode
+        self.detector_process = None
+        if detector_mode == 'process':
+            self.detector_process = DetectorProcess(
+                {'confidence_threshold': confidence_threshold, 'analysis_size': analysis_size},
+                name=f"detector-{camera_id}"
+            )
+        self.result_thread = None
+        # Per-stage latency histograms and achieved rates (served at /metrics)
+        self.metrics = PipelineMetrics()
+        self._timings = {}
+        self.ring = FrameRing(capacity=ring_size,
+                              on_encode=partial(self.metrics.observe, 'jpeg_encode'))
+        
+        # A grab that returns faster than this came out of the driver buffer
+        self.stale_grab_threshold = 1.0 / fps / 4
+        self.max_drain = ring_size * 2
+        
+        self.capture_stats = StageStats('capture')
+        self.analysis_stats = StageStats('analysis')
+        self.serving_stats = StageStats('serving')
+        
+        self.fall_alert_time = 0  # When fall was detected
+        self.fall_alert_duration = fall_alert_duration  # Keep alert active for N seconds
+        self.last_detection = {
+            'camera_id': camera_id,
+            'fall_detected': False,
+            'confidence': 0.0,
+            'timestamp': 0
+        }
+        # Push channel for state changes (served as SSE)
+        self.events = DetectionBroadcaster()
+        
+        # Each alert (a fall outside an already active alert) is one incident
+        self.incident_id = None
+        self.incidents = incident_log if incident_log is not None else IncidentLog()
+        self.clip_recorder = None
+        if clip_dir:
+            self.clip_recorder = ClipRecorder(self, Path(clip_dir) / camera_id,
+                                              pre_seconds=clip_pre_seconds,
+                                              post_seconds=clip_post_seconds, fps=clip_fps,
+                                              max_bytes=clip_max_mb * 1024 * 1024)
+        
+        # Analysis scheduling: own single worker unless a shared pool is given
+        self.executor = executor
+        self._owns_executor = executor is None
+        self._dispatch_lock = threading.Lock()
+        self._analysis_pending = False
+        self._last_analyzed_seq = 0
+        self._wanted_seq = 0  # Newest frame the motion gate let through
+        
+        # Adaptive analysis rate for idle rooms (None = analyse every frame)
+        self.motion_gate = None
+        if analysis_idle_after and analysis_idle_after > 0:
+            self.motion_gate = MotionGate(idle_after=analysis_idle_after, idle_fps=analysis_idle_fps)
+        self._gated_pending = 0  # Gated frames not yet excluded from drop counts (_dispatch_lock)
+        
+        # Recordings are paced by us (live sources by their driver)
+        self.pacer = None
+        
+        self.running = False
+        self.capture_thread = None
+    
+    def init_camera(self):
+        """Initialize camera capture"""
+        if self.camera is None:
+            try:
+                self.camera = cv2.VideoCapture(self.source)
+                if self.is_device:
+                    self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                    self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                    self.camera.set(cv2.CAP_PROP_FPS, self.fps)
+                elif self.is_file:
+                    # Replay recordings at their native rate
+                    self.fps = self.camera.get(cv2.CAP_PROP_FPS) or self.fps
+                    self.pacer = FramePacer(self.fps)
+                # Ask the driver to keep as few frames queued as it can
+                self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                print(f"✓ Camera '{self.camera_id}' initialized successfully")
+            except Exception as e:
+                print(f"✗ Error initializing camera '{self.camera_id}': {e}")
+                self.camera = None
+        return self.camera
+    
+    def start(self):
+        """Start the capture thread (analysis is scheduled per frame)"""
+        if self.running:
+            return
+        if self.detector_process is not None:
+            self.result_thread = threading.Thread(target=self._result_loop, daemon=True,
+                                                  name=f"results-{self.camera_id}")
+        elif self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1,
+                                               thread_name_prefix=f"analysis-{self.camera_id}")
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True,
+                                               name=f"capture-{self.camera_id}")
+        self.capture_thread.start()
+        if self.result_thread is not None:
+            self.result_thread.start()
+        if self.clip_recorder is not None:
+            self.clip_recorder.start()
+    
+    def stop(self):
+        """Stop capture and analysis and release the camera"""
+        self.running = False
+        if self.capture_thread:
+            self.capture_thread.join(timeout=2)
+        if self.detector_process is not None:
+            if self.result_thread:
+                self.result_thread.join(timeout=2)
+            self.detector_process.stop()
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.clip_recorder is not None:
+            self.clip_recorder.stop()
+        if self.camera is not None:
+            self.camera.release()
+            self.camera = None
+    
+    def _grab_newest(self):
+        """Grab frames until one had to be waited for; returns (ok, drained)"""
+        start = time.monotonic()
+        ok = self.camera.grab()
+        waited = time.monotonic() - start
+        drained = 0
+        # Fast grabs came from the driver queue, so keep going until we block
+        # on a fresh frame (or give up after max_drain)
+        while ok and waited < self.stale_grab_threshold and drained < self.max_drain:
+            start = time.monotonic()
+            ok = self.camera.grab()
+            waited = time.monotonic() - start
+            drained += 1
+        return ok, drained
+    
+    def _grab_file_frame(self, skip=0):
+        """Grab the next recording frame after skipping some; loops at the end"""
+        for _ in range(skip + 1):
+            if not self.camera.grab():
+                # End of recording: loop back to the start
+                self.camera.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                if not self.camera.grab():
+                    return False
+        return True
+    
+    def _capture_loop(self):
+        """Capture stage: always keep the newest camera frame in the ring"""
+        self.init_camera()
+        
+        while self.running:
+            try:
+                if self.camera is None:
+                    time.sleep(1)
+                    self.init_camera()
+                    continue
+                
+                if self.is_file:
+                    # Files never queue stale frames: wait for this frame's
+                    # deadline and, if we fell behind, skip the frames whose
+                    # deadlines passed so playback stays in real time
+                    drained = self.pacer.wait()
+                    ok = self._grab_file_frame(skip=drained)
+                else:
+                    ok, drained = self._grab_newest()
+                grabbed_at = time.monotonic()
+                if ok:
+                    ok, frame = self.camera.retrieve()
+                if not ok:
+                    print(f"✗ Failed to read frame from camera '{self.camera_id}'")
+                    self.camera.release()
+                    self.camera = None
+                    continue
+                
+                captured_at = time.monotonic()
+                packet = self.ring.put(frame, captured_at)
+                self.capture_stats.record(captured_at - grabbed_at, dropped=drained)
+                self.metrics.observe('capture', captured_at - grabbed_at)
+                self.metrics.capture_rate.tick()
+                if self.motion_gate is not None and not self.motion_gate.should_analyze(frame, captured_at):
+                    # Idle room: skip this frame (not counted as an analysis drop)
+                    with self._dispatch_lock:
+                        self._gated_pending += 1
+                elif self.detector_process is not None:
+                    # One memcpy into shared memory; the detector never holds our GIL
+                    self._wanted_seq = packet.seq
+                    self.detector_process.submit(frame, packet.seq, captured_at)
+                else:
+                    self._wanted_seq = packet.seq
+                    self._schedule_analysis()
+            except Exception as e:
+                print(f"✗ Error in capture loop ({self.camera_id}): {e}")
+                time.sleep(1)
+    
+    def _schedule_analysis(self):
+        """Queue one analysis job unless one is already pending for this camera"""
+        with self._dispatch_lock:
+            if self._analysis_pending or not self.running:
+                return
+            self._analysis_pending = True
+        try:
+            self.executor.submit(self._run_analysis)
+        except RuntimeError:
+            # Executor shut down while stopping
+            with self._dispatch_lock:
+                self._analysis_pending = False
+    
+    def _run_analysis(self):
+        """Analysis job: analyse the newest frame, then reschedule if more arrived"""
+        try:
+            packet = self.ring.latest()
+            if packet is not None and packet.seq > self._last_analyzed_seq:
+                self._analyze(packet)
+        except Exception as e:
+            print(f"✗ Error in analysis ({self.camera_id}): {e}")
+        finally:
+            with self._dispatch_lock:
+                self._analysis_pending = False
+        
+        # Frames captured meanwhile: queue again rather than loop, so other
+        # cameras sharing the pool get their turn
+        if self.running and self._wanted_seq > self._last_analyzed_seq:
+            self._schedule_analysis()
+    
+    def _result_loop(self):
+        """Process mode: apply results coming back from the detector process"""
+        while self.running:
+            try:
+                result = self.detector_process.get_result(timeout=0.5)
+                if result is None:
+                    continue
+                seq, captured_at, skipped, detection, timings = result
+                self.metrics.observe_all(timings)
+                self._last_analyzed_seq = seq
+                if detection['details']:
+                    # Mirror scored frames so get_statistics() covers this mode too
+                    self.fall_detector.fall_history.append(detection['confidence'])
+                self._apply_detection(seq, captured_at, detection, skipped)
+            except Exception as e:
+                print(f"✗ Error handling detector result ({self.camera_id}): {e}")
+    
+    def _analyze(self, packet):
+        """Analysis stage: run fall detection on one frame"""
+        # Anything between the last analysed frame and this one was skipped
+        last_seq = self._last_analyzed_seq
+        skipped = packet.seq - last_seq - 1 if last_seq else 0
+        self._last_analyzed_seq = packet.seq
+        
+        # One job per camera at a time, so the timings dict can be reused
+        detection = self.fall_detector.analyze_frame(packet.frame, timings=self._timings)
+        self.metrics.observe_all(self._timings)
+        self._apply_detection(packet.seq, packet.captured_at, detection, skipped, packet)
+    
+    def _apply_detection(self, seq, captured_at, detection, skipped=0, packet=None):
+        """Update alert state, last_detection and push subscribers for one result"""
+        # Debug output every 30 frames (1 second at 30 FPS)
+        if int(time.time() * 10) % 3 == 0:  # Every ~1 second
+            aspect_str = f"{detection['aspect_ratio']:.2f}" if detection['aspect_ratio'] else "N/A"
+            print(f"📊 [{self.camera_id}] Detection: Conf={detection['confidence']:.2%} | Aspect={aspect_str} | Motion={detection['motion']} | Fall={detection['fall_detected']}")
+        
+        if detection['fall_detected']:
+            now = time.time()
+            if now - self.fall_alert_time >= self.fall_alert_duration:
+                # Not part of an alert that is still active: new incident
+                self.incident_id = new_incident_id(self.camera_id)
+                self._record_incident(seq, detection, packet)
+                if self.clip_recorder is not None:
+                    self.clip_recorder.trigger(self.incident_id)
+            self.fall_alert_time = now
+            print(f"🚨 FALL DETECTED on '{self.camera_id}'! Confidence: {detection['confidence']:.2%} | Incident: {self.incident_id}")
+        
+        # Keep alert active for fall_alert_duration seconds
+        current_time = time.time()
+        is_alert_active = (current_time - self.fall_alert_time) < self.fall_alert_duration
+        
+        if self.motion_gate is not None:
+            # A still person (possibly lying on the floor) keeps the full rate
+            if detection['bbox'] is not None or is_alert_active:
+                self.motion_gate.note_activity(time.monotonic())
+            # Capture thread increments, analysis/result thread drains
+            with self._dispatch_lock:
+                gated, self._gated_pending = self._gated_pending, 0
+            skipped = max(0, skipped - gated)
+        
+        self.last_detection = {
+            'camera_id': self.camera_id,
+            'fall_detected': is_alert_active,
+            'confidence': detection['confidence'],
+            'timestamp': current_time,
+            'aspect_ratio': detection['aspect_ratio'],
+            'motion': detection['motion'],
+            'alert_active_for': max(0, self.fall_alert_duration - (current_time - self.fall_alert_time)),
+            'frame_seq': seq,
+            'bbox': detection['bbox'],
+            'incident_id': self.incident_id if is_alert_active else None
+        }
+        self.events.publish(compact_detection(self.last_detection))
+        
+        self.analysis_stats.record(time.monotonic() - captured_at, dropped=skipped)
+        self.metrics.analysis_rate.tick()
+    
+    def _record_incident(self, seq, detection, packet=None):
+        """Pin the frame that triggered the current incident"""
+        if packet is None:
+            # Process mode: the analysed frame is normally still in the ring
+            packet = self.ring.get(seq)
+        jpeg = None
+        if packet is not None:
+            try:
+                # Same encode-once bytes viewers get, so this is usually free
+                jpeg = packet.get_jpeg()
+            except Exception as e:
+                print(f"✗ Error encoding incident frame ({self.camera_id}): {e}")
+        self.incidents.add(Incident(
+            self.incident_id, self.camera_id,
+            packet.wall_time if packet is not None else time.time(), seq,
+            detection['confidence'], detection['aspect_ratio'], detection['motion'],
+            detection['bbox'], jpeg
+        ))
+    
+    def latest_frame(self):
+        """Serving stage: newest packet for an HTTP response (or None)"""
+        packet = self.ring.latest()
+        if packet is not None:
+            self.serving_stats.record(time.monotonic() - packet.captured_at)
+        return packet
+    
+    def analysis_rate_status(self):
+        """Current analysis mode and target rate chosen by the motion gate"""
+        if self.motion_gate is None:
+            return {'mode': 'always', 'target_fps': self.fps,
+                    'achieved_fps': round(self.metrics.analysis_rate.rate(), 2)}
+        status = self.motion_gate.snapshot(time.monotonic())
+        status['target_fps'] = self.fps if status['mode'] == 'active' else min(self.fps, self.motion_gate.idle_fps)
+        status['achieved_fps'] = round(self.metrics.analysis_rate.rate(), 2)
+        return status
+    
+    def get_stats(self):
+        """Per-stage frame, drop and latency figures"""
+        return {
+            'camera_id': self.camera_id,
+            'detector_mode': self.detector_mode,
+            'capture': self.capture_stats.snapshot(),
+            'analysis': self.analysis_stats.snapshot(),
+            'serving': self.serving_stats.snapshot(),
+            'latest_seq': self.ring.seq,
+            'capture_fps': round(self.metrics.capture_rate.rate(), 2),
+            'target_fps': round(float(self.fps), 2),
+            'pacing': self.pacer.snapshot() if self.pacer is not None else None,
+            'analysis_fps': round(self.metrics.analysis_rate.rate(), 2),
+            'latency': self.metrics.latency_summary(),
+            'analysis_rate': self.analysis_rate_status(),
+            'clips': self.clip_recorder.get_stats() if self.clip_recorder is not None else None
+        }
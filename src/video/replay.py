@@ -0,0 +1,307 @@
+"""
+Offline replay of recorded video through FallDetector
+Decodes files as fast as the CPU allows and drives the detector with virtual
+timestamps (frame index / file FPS), so the cooldown and motion history
+behave as they would live. Reports throughput, per-stage timings, the
+detection timeline and, given labels, event-level precision/recall.
+
+Usage:
+    python src/video/replay.py recordings/ --labels labels.csv --timeline timeline.csv
+    python src/video/replay.py fall1.mp4 --threshold 0.6 --sweep 0.4,0.5,0.6,0.7
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import parse_size
+from core.fall_detector import FallDetector
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm'}
+STAGES = ('decode', 'preprocess', 'detect_person', 'detect_motion', 'scoring')
+TIMELINE_FIELDS = ['video', 'frame', 'time', 'person_detected', 'confidence',
+                   'aspect_ratio', 'motion', 'fall_detected']
+
+
+def find_videos(paths):
+    """Expand files and directories into a sorted list of (name, video file)
+    
+    The name identifies the video in timelines and labels: its path relative
+    to the directory argument it was found under, or the file argument as
+    given, so same-named files in different folders stay apart.
+    """
+    videos = []
+    seen = set()
+    for path in map(Path, paths):
+        if path.is_dir():
+            found = [(p.relative_to(path).as_posix(), p) for p in sorted(path.rglob('*'))
+                     if p.suffix.lower() in VIDEO_EXTENSIONS]
+        elif path.is_file():
+            found = [(path.as_posix(), path)]
+        else:
+            print(f"✗ Not found: {path}")
+            continue
+        for name, video in found:
+            if video.resolve() not in seen:
+                seen.add(video.resolve())
+                videos.append((name, video))
+    return videos
+
+
+def load_labels(path):
+    """Read a labels CSV (video,start,end in seconds) into {video path: [(start, end)]}"""
+    labels = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            name = Path(row['video'].strip()).as_posix()
+            labels.setdefault(name, []).append((float(row['start']), float(row['end'])))
+    return labels
+
+
+def match_labels(labels, names):
+    """Key labels by replayed video name; a bare file name matches only if it is unambiguous"""
+    matched = {}
+    for label_name, spans in labels.items():
+        if label_name in names:
+            matched.setdefault(label_name, []).extend(spans)
+            continue
+        candidates = [n for n in names if Path(n).name == label_name]
+        if len(candidates) == 1:
+            matched.setdefault(candidates[0], []).extend(spans)
+        elif len(candidates) > 1:
+            print(f"✗ Label '{label_name}' matches {len(candidates)} videos; use its relative path")
+    return matched
+
+
+def replay_file(path, threshold, analysis_size, max_frames=None, name=None):
+    """Run one recording through a fresh detector; returns (summary, timeline)"""
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise IOError(f"cannot open {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    
+    detector = FallDetector(confidence_threshold=threshold, analysis_size=analysis_size)
+    detector.verbose = False
+    # Virtual time starts at 0, so no earlier alert may hold the cooldown
+    detector.last_fall_time = float('-inf')
+    
+    timeline = []
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    stage_counts = dict.fromkeys(STAGES, 0)
+    timings = {}
+    index = 0
+    started = time.perf_counter()
+    
+    try:
+        while max_frames is None or index < max_frames:
+            decode_start = time.perf_counter()
+            ok, frame = capture.read()
+            if not ok:
+                break
+            stage_totals['decode'] += time.perf_counter() - decode_start
+            stage_counts['decode'] += 1
+            
+            # Virtual clock: where this frame sits in the recording
+            timestamp = index / fps
+            result = detector.analyze_frame(frame, timestamp=timestamp, timings=timings)
+            for stage, seconds in timings.items():
+                stage_totals[stage] += seconds
+                stage_counts[stage] += 1
+            
+            timeline.append({
+                'video': name or path.name,
+                'frame': index,
+                'time': round(timestamp, 3),
+                'person_detected': result.bbox is not None,
+                'confidence': round(result.confidence, 4),
+                'aspect_ratio': round(result.aspect_ratio, 3) if result.aspect_ratio else None,
+                'motion': result.motion,
+                'fall_detected': result.fall_detected
+            })
+            index += 1
+    finally:
+        capture.release()
+    
+    elapsed = time.perf_counter() - started
+    duration = index / fps
+    summary = {
+        'video': name or path.name,
+        'path': str(path),
+        'frames': index,
+        'video_fps': round(fps, 2),
+        'duration_seconds': round(duration, 2),
+        'processing_seconds': round(elapsed, 3),
+        'processed_fps': round(index / elapsed, 1) if elapsed > 0 else 0.0,
+        'speedup': round(duration / elapsed, 1) if elapsed > 0 else 0.0,
+        'stage_avg_ms': {stage: round(stage_totals[stage] / stage_counts[stage] * 1000, 3)
+                         for stage in STAGES if stage_counts[stage]}
+    }
+    return summary, timeline
+
+
+def detection_times(timeline, threshold, cooldown):
+    """Re-apply the detector's threshold + cooldown rule to a recorded timeline
+    
+    Confidence does not depend on the threshold, so one replay is enough to
+    evaluate any number of thresholds.
+    """
+    times = []
+    last = None
+    for row in timeline:
+        if row['confidence'] >= threshold and (last is None or row['time'] - last > cooldown):
+            times.append(row['time'])
+            last = row['time']
+    return times
+
+
+def group_events(times, alert_duration):
+    """Merge fall detections into alert events the way the frame server does"""
+    events = []
+    for t in times:
+        if events and t - events[-1][1] < alert_duration:
+            events[-1][1] = t
+        else:
+            events.append([t, t])
+    return [tuple(e) for e in events]
+
+
+def score_events(events, labels, tolerance):
+    """Event-level matching; returns (true positives, false positives, labels hit)"""
+    def overlaps(event, label):
+        return event[0] <= label[1] + tolerance and event[1] >= label[0] - tolerance
+    
+    true_pos = sum(1 for e in events if any(overlaps(e, l) for l in labels))
+    hit = sum(1 for l in labels if any(overlaps(e, l) for e in events))
+    return true_pos, len(events) - true_pos, hit
+
+
+def precision_recall(true_pos, false_pos, hit, total_labels):
+    """Precision/recall/F1 from event counts"""
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 0.0
+    recall = hit / total_labels if total_labels else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 3), 'recall': round(recall, 3), 'f1': round(f1, 3)}
+
+
+def evaluate(timelines, labels, threshold, cooldown, alert_duration, tolerance):
+    """Aggregate event-level figures over all labelled videos for one threshold"""
+    true_pos = false_pos = hit = total = 0
+    for name, timeline in timelines.items():
+        if name not in labels:
+            continue
+        events = group_events(detection_times(timeline, threshold, cooldown), alert_duration)
+        tp, fp, h = score_events(events, labels[name], tolerance)
+        true_pos += tp
+        false_pos += fp
+        hit += h
+        total += len(labels[name])
+    figures = {'threshold': threshold, 'true_positives': true_pos,
+               'false_positives': false_pos, 'labels': total, 'labels_detected': hit}
+    figures.update(precision_recall(true_pos, false_pos, hit, total))
+    return figures
+
+
+def write_timeline(path, rows):
+    """Write the per-frame timeline as CSV or JSON (by extension)"""
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        path.write_text(json.dumps(rows))
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TIMELINE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded video through the fall detector")
+    parser.add_argument('paths', nargs='+', help="Video files or directories")
+    parser.add_argument('--threshold', type=float, default=0.50, help="Confidence threshold (default 0.50)")
+    parser.add_argument('--analysis-size', default='640x360',
+                        help="Detector resolution WIDTHxHEIGHT or 'full' (default 640x360)")
+    parser.add_argument('--labels', help="CSV with video,start,end columns (seconds); video is the path "
+                                         "relative to the input folder, or a file name if unique")
+    parser.add_argument('--sweep', help="Comma-separated thresholds to evaluate against the labels")
+    parser.add_argument('--alert-duration', type=float, default=5.0,
+                        help="Detections closer than this merge into one event (default 5s)")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="Seconds of slack when matching events to labels (default 1s)")
+    parser.add_argument('--max-frames', type=int, help="Stop each file after N frames")
+    parser.add_argument('--timeline', help="Write per-frame timeline (.csv or .json)")
+    parser.add_argument('--report', help="Write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    analysis_size = parse_size(args.analysis_size)
+    labels = load_labels(args.labels) if args.labels else {}
+    cooldown = FallDetector().fall_cooldown
+    
+    videos = find_videos(args.paths)
+    if not videos:
+        print("✗ No video files to replay")
+        return 1
+    
+    summaries = []
+    timelines = {}
+    for name, path in videos:
+        try:
+            summary, timeline = replay_file(path, args.threshold, analysis_size, args.max_frames, name)
+        except Exception as e:
+            print(f"✗ {path}: {e}")
+            continue
+        
+        events = group_events(detection_times(timeline, args.threshold, cooldown), args.alert_duration)
+        summary['events'] = [{'start': start, 'end': end} for start, end in events]
+        summaries.append(summary)
+        timelines[name] = timeline
+        
+        stages = ' '.join(f"{k}={v:.2f}ms" for k, v in summary['stage_avg_ms'].items())
+        print(f"✓ {name}: {summary['frames']} frames in {summary['processing_seconds']:.2f}s "
+              f"({summary['processed_fps']} fps, {summary['speedup']}x real time), "
+              f"{len(events)} fall event(s) | {stages}")
+    
+    report = {
+        'threshold': args.threshold,
+        'analysis_size': args.analysis_size,
+        'videos': summaries
+    }
+    
+    labels = match_labels(labels, timelines)
+    if labels:
+        report['evaluation'] = evaluate(timelines, labels, args.threshold, cooldown,
+                                        args.alert_duration, args.tolerance)
+        e = report['evaluation']
+        print(f"📊 threshold {args.threshold:.2f}: precision={e['precision']:.3f} "
+              f"recall={e['recall']:.3f} f1={e['f1']:.3f} "
+              f"({e['labels_detected']}/{e['labels']} labelled falls, {e['false_positives']} false alarms)")
+        
+        if args.sweep:
+            report['sweep'] = []
+            for threshold in (float(t) for t in args.sweep.split(',') if t.strip()):
+                e = evaluate(timelines, labels, threshold, cooldown, args.alert_duration, args.tolerance)
+                report['sweep'].append(e)
+                print(f"   threshold {threshold:.2f}: precision={e['precision']:.3f} "
+                      f"recall={e['recall']:.3f} f1={e['f1']:.3f}")
+    elif args.sweep:
+        print("✗ --sweep needs --labels")
+    
+    if args.timeline:
+        write_timeline(args.timeline, [row for t in timelines.values() for row in t])
+        print(f"✓ Timeline written to {args.timeline}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2))
+        print(f"✓ Report written to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,8 +8,66 @@ from datetime import datetime
 import time
 import psutil
 import os
+import threading
+import weakref
+from collections import deque
 from config import TIMEZONE
 
+class SystemMetricsSampler:
+    """Shared background thread that refreshes CPU, memory and FPS figures
+    
+    psutil calls (and FPS maths) happen here at a fixed cadence, so the
+    WebRTC frame callback only ever reads cached numbers.
+    """
+    
+    _instance = None
+    _instance_lock = threading.Lock()
+    
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.cpu_percent = 0.0
+        self.memory_mb = 0.0
+        self._processors = weakref.WeakSet()
+        self._thread = None
+    
+    @classmethod
+    def shared(cls):
+        """Process-wide sampler, started on first use"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._instance.start()
+            return cls._instance
+    
+    def start(self):
+        """Start the sampling thread"""
+        # Prime cpu_percent: the first non-blocking call always returns 0.0
+        self.process.cpu_percent(interval=None)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="system-metrics")
+        self._thread.start()
+    
+    def register(self, processor):
+        """Refresh FPS/latency for this processor while it is alive"""
+        self._processors.add(processor)
+    
+    def _run(self):
+        """Sample loop: refresh process figures, then each processor's FPS"""
+        while True:
+            time.sleep(self.interval)
+            try:
+                # Non-blocking: CPU time used since the previous sample
+                self.cpu_percent = self.process.cpu_percent(interval=None)
+                self.memory_mb = self.process.memory_info().rss / 1024 / 1024
+            except Exception:
+                pass
+            for processor in list(self._processors):
+                # One bad processor must not stop sampling for the others
+                try:
+                    processor.refresh_metrics()
+                except Exception as e:
+                    print(f"✗ Error refreshing video metrics: {e}")
+
 class VideoProcessor:
     """Ultra-simple video processor - just display frames with monitoring"""
     
@@ -19,70 +77,71 @@ class VideoProcessor:
         self.pending_incidents = []
         self.start_time = time.time()
         self.last_frame_time = time.time()
-        self.frame_times = []  # Last 30 frame times for FPS calculation
-        self.process = psutil.Process(os.getpid())
+        self.frame_times = deque(maxlen=30)  # Last 30 frame times for FPS calculation
+        
+        # Cached figures, refreshed by the shared sampler thread
+        self.fps = 0.0
+        self.latency_ms = 0.0
+        self.sampler = SystemMetricsSampler.shared()
+        self.sampler.register(self)
+    
+    def refresh_metrics(self):
+        """Recompute FPS and latency from recent frame times (sampler thread)"""
+        times = list(self.frame_times)
+        if len(times) < 2 or time.time() - times[-1] > 2:
+            # No frames for a while: the stream is paused or gone
+            self.fps = 0.0
+            self.latency_ms = 0.0
+            return
+        time_diff = times[-1] - times[0]
+        self.fps = (len(times) - 1) / time_diff if time_diff > 0 else 0.0
+        self.latency_ms = (times[-1] - times[-2]) * 1000
         
     def get_fps(self):
-        """Calculate current FPS from recent frame times"""
-        if len(self.frame_times) < 2:
-            return 0
-        time_diff = self.frame_times[-1] - self.frame_times[0]
-        if time_diff == 0:
-            return 0
-        return len(self.frame_times) / time_diff
+        """Current FPS (cached)"""
+        return self.fps
     
     def get_latency(self):
-        """Estimate latency in milliseconds"""
-        if len(self.frame_times) < 2:
-            return 0
-        return (self.frame_times[-1] - self.frame_times[-2]) * 1000
+        """Estimated latency in milliseconds (cached)"""
+        return self.latency_ms
     
     def get_cpu_usage(self):
-        """Get CPU usage percentage"""
-        try:
-            return self.process.cpu_percent(interval=0.1)
-        except:
-            return 0
+        """CPU usage percentage (cached, never blocks)"""
+        return self.sampler.cpu_percent
     
     def get_memory_usage(self):
-        """Get memory usage in MB"""
-        try:
-            return self.process.memory_info().rss / 1024 / 1024
-        except:
-            return 0
+        """Memory usage in MB (cached)"""
+        return self.sampler.memory_mb
         
     def recv(self, frame):
         """Process video frame - minimal processing"""
         img = frame.to_ndarray(format="bgr24")
         self.frame_count += 1
         
-        # Track frame timing
-        current_time = time.time()
-        self.frame_times.append(current_time)
-        if len(self.frame_times) > 30:
-            self.frame_times.pop(0)
+        # Track frame timing (bounded deque: O(1) append, oldest drops off)
+        self.frame_times.append(time.time())
         
         # Add timestamp overlay
         timestamp = datetime.now(TIMEZONE).strftime("%H:%M:%S")
         cv2.putText(img, f"LIVE: {timestamp}", (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
-        # Add monitoring info overlay (every 10 frames to reduce overhead)
-        if self.frame_count % 10 == 0:
-            fps = self.get_fps()
-            latency = self.get_latency()
-            cpu = self.get_cpu_usage()
-            
-            # Add FPS
-            cv2.putText(img, f"FPS: {fps:.1f}", (10, 70),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # Add latency
-            cv2.putText(img, f"Latency: {latency:.0f}ms", (10, 110),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # Add CPU usage
-            cv2.putText(img, f"CPU: {cpu:.1f}%", (10, 150),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        # Add monitoring info overlay. Values are cached by the sampler, so
+        # this is cheap enough to draw on every frame (no flicker)
+        fps = self.fps
+        latency = self.latency_ms
+        cpu = self.sampler.cpu_percent
+        
+        # Add FPS
+        cv2.putText(img, f"FPS: {fps:.1f}", (10, 70),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        
+        # Add latency
+        cv2.putText(img, f"Latency: {latency:.0f}ms", (10, 110),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        
+        # Add CPU usage
+        cv2.putText(img, f"CPU: {cpu:.1f}%", (10, 150),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
         
         return av.VideoFrame.from_ndarray(img, format="bgr24")
@@ -0,0 +1,9 @@
+"""
+Shared setup for the unit tests (run from the repo root: python -m pytest tests)
+Modules import each other as top-level packages from src/, as the app does.
+These tests need no MySQL server; database access goes through small fakes.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
@@ -0,0 +1,12 @@
+from config import parse_camera_sources
+
+
+def test_named_and_bare_sources():
+    assert parse_camera_sources("0, kitchen=rtsp://cam/live, door = 2") == [
+        ("camera0", 0), ("kitchen", "rtsp://cam/live"), ("door", 2)]
+
+
+def test_query_string_is_not_a_camera_name():
+    assert parse_camera_sources("http://cam/stream?user=a&fps=10") == [
+        ("camera0", "http://cam/stream?user=a&fps=10")]
+    assert parse_camera_sources("hall=http://cam/stream?user=a") == [("hall", "http://cam/stream?user=a")]
@@ -0,0 +1,52 @@
+import json
+
+from video.detection_events import DetectionBroadcaster, compact_detection, format_sse
+
+
+def record(fall=False, person=False, seq=1):
+    return {'camera_id': 'camera0', 'fall_detected': fall, 'person_detected': person,
+            'confidence': 0.9 if fall else 0.0, 'frame_seq': seq, 'incident_id': None,
+            'timestamp': 1000.0 + seq}
+
+
+def drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+
+def test_state_changes_fan_out_to_every_subscriber():
+    broadcaster = DetectionBroadcaster()
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    assert broadcaster.publish(record(person=True, seq=1))
+    assert not broadcaster.publish(record(person=True, seq=2))  # Same state: not pushed
+    assert broadcaster.publish(record(fall=True, person=True, seq=3))
+    assert broadcaster.latest['frame_seq'] == 3
+
+    for q in (first, second):
+        assert [(event_id, item['frame_seq']) for event_id, item in drain(q)] == [(1, 1), (2, 3)]
+
+    broadcaster.unsubscribe(second)
+    broadcaster.publish(record(seq=4))
+    assert len(drain(first)) == 1 and drain(second) == []
+    assert broadcaster.subscriber_count == 1
+
+
+def test_slow_subscriber_drops_oldest_without_blocking_others():
+    broadcaster = DetectionBroadcaster(queue_size=2)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    for seq in range(1, 6):
+        broadcaster.publish(record(fall=seq % 2 == 0, seq=seq))  # Every record changes state
+        drain(fast)
+    assert [item['frame_seq'] for _, item in drain(slow)] == [4, 5]
+    assert broadcaster.dropped == 3
+
+
+def test_compact_detection_and_sse_framing():
+    compact = compact_detection({'fall_detected': True, 'confidence': 0.87654, 'bbox': (1, 2, 3, 4),
+                                 'timestamp': 12.34567, 'frame_seq': 7})
+    assert compact['person_detected'] and compact['confidence'] == 0.877
+    text = format_sse(compact, event_id=3)
+    assert text.startswith("id: 3\nevent: detection\ndata: ") and text.endswith("\n\n")
+    assert json.loads(text.split("data: ", 1)[1]) == compact
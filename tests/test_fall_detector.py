@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from core.fall_detector import FallDetector
+
+
+def lying_person(width=640, height=480):
+    """Dark room with a bright 240x100 blob, wider than tall"""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[300:400, 200:440] = 255
+    return frame
+
+
+def detector(**kwargs):
+    fall_detector = FallDetector(**kwargs)
+    fall_detector.verbose = False
+    return fall_detector
+
+
+def test_downscaled_analysis_reports_full_resolution_units():
+    full = detector().analyze_frame(lying_person())
+    small = detector(analysis_size=(320, 240)).analyze_frame(lying_person())
+    assert full['bbox'] is not None and small['bbox'] is not None
+    for a, b in zip(full['bbox'], small['bbox']):
+        assert abs(a - b) <= 4
+    assert small['confidence'] == pytest.approx(full['confidence'], abs=0.02)
+
+
+def test_person_area_threshold_is_in_full_resolution_pixels():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[200:240, 300:340] = 255  # About 1600 full-res pixels: below MIN_PERSON_AREA
+    fall_detector = detector(analysis_size=(160, 120))
+    assert fall_detector.analyze_frame(frame)['bbox'] is None
+    assert fall_detector.area_scale == pytest.approx(16.0)
+
+
+def test_small_frames_are_never_upscaled():
+    fall_detector = detector(analysis_size=(320, 240))
+    frame = lying_person(160, 120)
+    assert fall_detector.downscale(frame) is frame
+    assert (fall_detector.scale_x, fall_detector.scale_y) == (1.0, 1.0)
+
+
+def test_working_planes_are_reused_across_frames():
+    fall_detector = detector(analysis_size=(320, 240))
+    fall_detector.analyze_frame(lying_person())
+    planes = {id(fall_detector._small), id(fall_detector._blurred),
+              id(fall_detector._gray), id(fall_detector._prev_gray)}
+    for _ in range(3):
+        result = fall_detector.analyze_frame(lying_person())
+    assert {id(fall_detector._small), id(fall_detector._blurred),
+            id(fall_detector._gray), id(fall_detector._prev_gray)} == planes
+    assert result.motion == 0  # Identical frames against the swapped previous plane
+
+
+def test_new_frame_size_reallocates_and_resets_motion():
+    fall_detector = detector()
+    fall_detector.analyze_frame(lying_person())
+    fall_detector.analyze_frame(lying_person())
+    gray, blurred = fall_detector.preprocess(lying_person(800, 600))
+    assert gray.shape == blurred.shape == (600, 800)
+    assert not fall_detector._has_prev  # No motion against a plane of another size
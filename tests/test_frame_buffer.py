@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+
+from video.frame_buffer import FrameRing
+
+
+def frame(value=0):
+    return np.full((24, 32, 3), value, dtype=np.uint8)
+
+
+def test_latest_is_none_until_the_first_frame():
+    ring = FrameRing(capacity=3)
+    assert ring.latest() is None
+    assert ring.seq == 0
+    packet = ring.put(frame(), captured_at=1.0)
+    assert ring.latest() is packet
+    assert (packet.seq, packet.captured_at) == (1, 1.0)
+
+
+def test_get_only_returns_frames_still_in_the_ring():
+    ring = FrameRing(capacity=3)
+    packets = [ring.put(frame(i)) for i in range(5)]
+    assert ring.latest() is packets[-1]
+    assert ring.get(5) is packets[4]
+    assert ring.get(3) is packets[2]
+    assert ring.get(2) is None  # Overwritten by seq 5
+    assert ring.get(9) is None
+
+
+def test_etags_are_unique_per_frame():
+    ring = FrameRing()
+    first, second = ring.put(frame()), ring.put(frame())
+    assert first.etag != second.etag
+    assert FrameRing().put(frame()).etag.split("-")[1] == "1"
+
+
+def test_wait_newer_returns_the_newest_frame_immediately():
+    ring = FrameRing(capacity=4)
+    for i in range(3):
+        ring.put(frame(i))
+    assert ring.wait_newer(0, timeout=0).seq == 3  # Skips straight past 1 and 2
+    assert ring.wait_newer(3, timeout=0.01) is None
+
+
+def test_wait_newer_wakes_on_put():
+    ring = FrameRing()
+    ring.put(frame())
+    timer = threading.Timer(0.05, ring.put, args=(frame(1),))
+    timer.start()
+    try:
+        packet = ring.wait_newer(1, timeout=5)
+    finally:
+        timer.join()
+    assert packet is not None and packet.seq == 2
+
+
+def test_get_jpeg_encodes_once_for_concurrent_callers():
+    encodes = []
+    ring = FrameRing(on_encode=encodes.append)
+    packet = ring.put(frame(128))
+    assert not packet.has_jpeg
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(packet.get_jpeg())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(encodes) == 1
+    assert packet.has_jpeg
+    assert results[0][:2] == b"\xff\xd8"
+    assert all(jpeg is results[0] for jpeg in results)  # The same bytes object, not re-encoded
@@ -0,0 +1,55 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from utils.incident_store import IncidentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IncidentStore(str(tmp_path / "incidents"), max_incidents=2)
+
+
+def snapshot(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def test_incidents_are_only_visible_to_their_owner(store):
+    alice = store.add(snapshot(10), "alice", timestamp=1000.0)
+    store.add(snapshot(20), "bob", timestamp=1001.0)
+    assert store.count("alice") == 1
+    assert [row["id"] for row in store.page("alice")] == [alice]
+    assert store.get(alice, "alice")["username"] == "alice"
+    assert store.get(alice, "bob") is None
+
+
+def test_prune_keeps_media_still_referenced(store):
+    shared = store.add(snapshot(30), "alice", timestamp=1000.0)
+    digest = store.get(shared, "alice")["digest"]
+    store.add(snapshot(30), "bob", timestamp=1001.0)
+    store.add(snapshot(40), "alice", timestamp=1002.0)  # Prunes the oldest row
+    assert store.get(shared, "alice") is None
+    assert store.image_path(digest).exists()
+    assert store.thumbnail_path(digest).exists()
+    
+    store.add(snapshot(50), "alice", timestamp=1003.0)  # Last row using the digest goes
+    assert not store.image_path(digest).exists()
+    assert not store.thumbnail_path(digest).exists()
+
+
+def test_index_without_owners_gains_the_column(tmp_path):
+    root = tmp_path / "incidents"
+    root.mkdir()
+    conn = sqlite3.connect(str(root / "index.db"))
+    conn.execute("""CREATE TABLE incidents (id INTEGER PRIMARY KEY AUTOINCREMENT, digest TEXT NOT NULL,
+                    timestamp REAL NOT NULL, time_label TEXT, camera_id TEXT, confidence REAL,
+                    event TEXT, width INTEGER, height INTEGER, image_bytes INTEGER)""")
+    conn.execute("INSERT INTO incidents (digest, timestamp) VALUES ('00', 1.0)")
+    conn.commit()
+    conn.close()
+    
+    store = IncidentStore(str(root))
+    assert store.count("alice") == 0  # Ownerless rows stay hidden
+    store.add(snapshot(60), "alice")
+    assert store.count("alice") == 1
@@ -0,0 +1,47 @@
+from video.incidents import Incident, IncidentLog
+
+
+def incident(incident_id, jpeg=b"x" * 10, camera_id="camera0", timestamp=None):
+    return Incident(incident_id, camera_id, timestamp if timestamp is not None else float(incident_id),
+                    incident_id, 0.9, 2.0, 100, (0, 0, 10, 5), jpeg)
+
+
+def test_least_recently_used_incident_is_evicted_first():
+    log = IncidentLog(max_incidents=3)
+    for i in range(1, 4):
+        log.add(incident(i))
+    assert log.get(1) is not None  # Now most recently used
+    log.add(incident(4))
+    assert log.get(2) is None
+    assert [log.get(i) is not None for i in (1, 3, 4)] == [True, True, True]
+    assert log.get_stats() == {'incidents': 3, 'image_bytes': 30, 'evicted': 1}
+
+
+def test_byte_budget_evicts_but_keeps_the_newest():
+    log = IncidentLog(max_incidents=10, max_bytes=25)
+    log.add(incident(1))
+    log.add(incident(2))
+    log.add(incident(3))
+    assert log.get(1) is None
+    assert log.get_stats()['image_bytes'] == 20
+
+    log.add(incident(4, jpeg=b"x" * 100))  # Larger than the budget on its own
+    assert log.get(4) is not None
+    assert log.get_stats()['incidents'] == 1
+
+
+def test_re_adding_an_incident_replaces_its_bytes():
+    log = IncidentLog()
+    log.add(incident(1, jpeg=b"x" * 10))
+    log.add(incident(1, jpeg=None))
+    assert log.get_stats()['image_bytes'] == 0
+    assert log.get(1).to_dict()['has_image'] is False
+
+
+def test_recent_is_newest_first_and_filters_by_camera():
+    log = IncidentLog()
+    log.add(incident(1, camera_id="hall", timestamp=30.0))
+    log.add(incident(2, camera_id="door", timestamp=10.0))
+    log.add(incident(3, camera_id="hall", timestamp=20.0))
+    assert [i.incident_id for i in log.recent()] == [1, 3, 2]
+    assert [i.incident_id for i in log.recent(camera_id="hall", limit=1)] == [1]
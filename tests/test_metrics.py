@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from video.frame_buffer import StageStats
+from video.metrics import LatencyHistogram, PipelineMetrics, render_prometheus
+
+
+def test_observations_land_in_their_upper_bound_bucket():
+    histogram = LatencyHistogram(buckets=(0.001, 0.01, 0.1))
+    for seconds in (0.0005, 0.001, 0.005, 0.05, 3.0):
+        histogram.observe(seconds)
+    counts, total, count = histogram.snapshot()
+    assert counts == [2, 1, 1, 1]  # Bounds are inclusive; last slot is +Inf
+    assert count == 5 and total == pytest.approx(3.0565)
+
+
+def test_quantiles_interpolate_inside_the_bucket():
+    histogram = LatencyHistogram(buckets=(0.01, 0.02))
+    for _ in range(10):
+        histogram.observe(0.015)
+    assert histogram.quantile(0.5) == pytest.approx(0.015)
+    assert histogram.quantile(1.0) == pytest.approx(0.02)
+    histogram.observe(5.0)
+    assert histogram.quantile(0.99) == 0.02  # Overflow reports its floor
+    assert LatencyHistogram().quantile(0.5) == 0.0
+
+
+def test_summary_is_in_milliseconds():
+    histogram = LatencyHistogram(buckets=(0.01, 0.02))
+    histogram.observe(0.015)
+    summary = histogram.summary()
+    assert set(summary) == {'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'count'}
+    assert summary['mean_ms'] == 15.0 and summary['count'] == 1
+
+
+def test_prometheus_buckets_are_cumulative():
+    metrics = PipelineMetrics(stages=('capture',))
+    metrics.stages['capture'] = LatencyHistogram(buckets=(0.001, 0.01))
+    for seconds in (0.0005, 0.005, 0.005, 1.0):
+        metrics.observe('capture', seconds)
+    metrics.observe('unknown', 1.0)  # Ignored
+    pipeline = SimpleNamespace(metrics=metrics, fps=15, pacer=None, last_detection={},
+                               events=SimpleNamespace(subscriber_count=0),
+                               capture_stats=StageStats('capture'), analysis_stats=StageStats('analysis'),
+                               serving_stats=StageStats('serving'))
+    text = render_prometheus({'hall': pipeline})
+    labels = 'camera="hall",stage="capture"'
+    assert f'frame_server_stage_latency_seconds_bucket{{{labels},le="0.001"}} 1' in text
+    assert f'frame_server_stage_latency_seconds_bucket{{{labels},le="0.01"}} 3' in text
+    assert f'frame_server_stage_latency_seconds_bucket{{{labels},le="+Inf"}} 4' in text
+    assert f'frame_server_stage_latency_seconds_count{{{labels}}} 4' in text
+    assert 'frame_server_target_fps{camera="hall"} 15.00' in text
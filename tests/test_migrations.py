@@ -0,0 +1,191 @@
+import pytest
+
+import database
+
+
+class FakeCursor:
+    """Just enough of a MySQL cursor for run_migrations' bookkeeping"""
+
+    def __init__(self, server):
+        self.server = server
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        if sql.startswith("SELECT GET_LOCK"):
+            self._rows = [(1,)]
+        elif sql.startswith("SELECT RELEASE_LOCK"):
+            self._rows = [(1,)]
+        elif sql.startswith("SELECT version FROM schema_migrations"):
+            self._rows = [(version,) for version in sorted(self.server.recorded)]
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            assert params[0] not in self.server.recorded, f"version {params[0]} recorded twice"
+            self.server.recorded.add(params[0])
+            self._rows = []
+        else:
+            self._rows = []
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self, buffered=False):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        self.server.commits += 1
+
+
+class FakeDatabase:
+    """Stands in for PooledDatabase: one connection, a schema_migrations table"""
+
+    def __init__(self):
+        self.recorded = set()
+        self.commits = 0
+        self.released = 0
+
+    def checkout(self):
+        return FakeConnection(self)
+
+    def release(self, cnx):
+        self.released += 1
+
+
+@pytest.fixture
+def applied(monkeypatch):
+    """Replace each migration with a recorder, keeping versions and order"""
+    calls = []
+
+    def recorder(version):
+        return lambda cnx: calls.append(version)
+
+    monkeypatch.setattr(database, "MIGRATIONS",
+                        [(version, description, recorder(version))
+                         for version, description, _ in database.MIGRATIONS])
+    return calls
+
+
+def test_versions_are_unique_and_contiguous_from_one():
+    versions = [version for version, _, _ in database.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert all(callable(migrate) and description for _, description, migrate in database.MIGRATIONS)
+
+
+def test_migrations_run_in_version_order(applied):
+    db = FakeDatabase()
+    ok, msg = database.run_migrations(db)
+    assert ok, msg
+    assert applied == [version for version, _, _ in database.MIGRATIONS]
+    assert db.recorded == set(applied)
+    assert db.released == 1
+
+
+def test_second_run_applies_nothing(applied):
+    db = FakeDatabase()
+    database.run_migrations(db)
+    applied.clear()
+    ok, msg = database.run_migrations(db)
+    assert ok and "up to date" in msg
+    assert applied == []
+
+
+def test_only_pending_versions_run(applied):
+    db = FakeDatabase()
+    db.recorded = {1, 2, 3}
+    database.run_migrations(db)
+    assert applied == [version for version, _, _ in database.MIGRATIONS if version > 3]
+
+
+def test_failed_migration_stops_and_resumes_there(monkeypatch, applied):
+    failing = database.MIGRATIONS[4][0]
+    migrations = list(database.MIGRATIONS)
+
+    def boom(cnx):
+        raise RuntimeError("disk full")
+
+    version, description, _ = migrations[4]
+    migrations[4] = (version, description, boom)
+    monkeypatch.setattr(database, "MIGRATIONS", migrations)
+
+    db = FakeDatabase()
+    ok, msg = database.run_migrations(db)
+    assert not ok and "disk full" in msg
+    assert db.recorded == set(range(1, failing))
+    assert db.released == 1
+
+    migrations[4] = (version, description, lambda cnx: applied.append(version))
+    applied.clear()
+    ok, _ = database.run_migrations(db)
+    assert ok
+    assert applied[0] == failing
+    assert db.recorded == {v for v, _, _ in migrations}
+
+
+class BackfillCursor:
+    """messages table with sender/receiver pairs and no keys yet"""
+
+    def __init__(self, rows):
+        self.rows = {row_id: [sender, receiver, None] for row_id, sender, receiver in rows}
+        self._result = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        if "information_schema" in sql:
+            self._result = [(1,)]  # Column and index already exist
+        elif sql.startswith("SELECT id, sender, receiver FROM messages"):
+            pending = [(row_id, s, r) for row_id, (s, r, key) in sorted(self.rows.items())
+                       if row_id > params[0] and key is None]
+            self._result = pending[:5000]
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def executemany(self, sql, params):
+        for key, row_id in params:
+            self.rows[row_id][2] = key
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        pass
+
+
+def test_conversation_key_backfill_matches_the_app():
+    from utils.chat_manager import ChatManager
+
+    rows = [(1, "Alice", "bob"), (2, " BOB\t", "alice "), (3, "Zoë", "Ärne"), (4, None, "alice")]
+    cursor = BackfillCursor(rows)
+
+    class Connection:
+        def cursor(self, buffered=False):
+            return cursor
+
+    database.migrate_conversation_keys(Connection())
+    for row_id, sender, receiver in rows:
+        assert cursor.rows[row_id][2] == ChatManager.conversation_key(sender, receiver)
+    assert cursor.rows[1][2] == cursor.rows[2][2] == "alice|bob"
+
+
+def test_lock_timeout_skips_migrations_and_closes_the_cursor(applied, monkeypatch):
+    closed = []
+    monkeypatch.setattr(FakeCursor, "close", lambda self: closed.append(self))
+    monkeypatch.setattr(FakeCursor, "fetchone", lambda self: (0,))
+    db = FakeDatabase()
+    ok, msg = database.run_migrations(db)
+    assert not ok and "migration lock" in msg
+    assert applied == []
+    assert len(closed) == 1
+    assert db.released == 1
@@ -0,0 +1,48 @@
+import numpy as np
+
+from video.motion_gate import MotionGate
+
+
+def still_frame():
+    return np.zeros((90, 160, 3), dtype=np.uint8)
+
+
+def moving_frame():
+    frame = still_frame()
+    frame[20:70, 40:120] = 255
+    return frame
+
+
+def test_first_frame_counts_as_motion():
+    gate = MotionGate(idle_after=10.0, idle_fps=2.0)
+    assert gate.should_analyze(still_frame(), now=0.0)
+    assert gate.is_active(0.0)
+
+
+def test_still_room_backs_off_to_the_idle_rate():
+    gate = MotionGate(idle_after=10.0, idle_fps=2.0)
+    gate.should_analyze(still_frame(), now=0.0)
+    # Active for idle_after seconds after the last motion, then every 0.5 s
+    analysed = [t / 10 for t in range(100, 131)
+                if gate.should_analyze(still_frame(), now=t / 10)]
+    assert analysed == [10.0, 10.5, 11.0, 11.5, 12.0, 12.5, 13.0]
+    assert gate.snapshot(13.0)['mode'] == 'idle'
+    assert gate.gated == 31 - len(analysed)
+
+
+def test_motion_while_idle_is_analysed_immediately():
+    gate = MotionGate(idle_after=10.0, idle_fps=0.1)
+    gate.should_analyze(still_frame(), now=0.0)
+    assert gate.should_analyze(still_frame(), now=20.0)
+    assert not gate.should_analyze(still_frame(), now=20.1)
+    assert gate.should_analyze(moving_frame(), now=20.2)
+    assert gate.is_active(20.2)
+    assert gate.should_analyze(moving_frame(), now=20.3)  # Unchanged frame, still within idle_after
+
+
+def test_note_activity_keeps_the_full_rate():
+    gate = MotionGate(idle_after=10.0, idle_fps=1.0)
+    gate.should_analyze(still_frame(), now=0.0)
+    gate.note_activity(9.0)  # e.g. a person in view
+    assert gate.should_analyze(still_frame(), now=18.5)
+    assert gate.should_analyze(still_frame(), now=18.6)
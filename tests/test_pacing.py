@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from video import pacing
+from video.pacing import FramePacer
+
+
+class FakeClock:
+    """monotonic() that only moves when the pacer sleeps or the test says so"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(pacing.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(pacing.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_processing_time_is_absorbed_not_added(clock):
+    pacer = FramePacer(fps=10)
+    pacer.wait()  # Anchors the schedule
+    for _ in range(5):
+        clock.now += 0.03  # Work done between frames
+        pacer.wait()
+    assert clock.sleeps == pytest.approx([0.07] * 5)
+    assert clock.now == pytest.approx(100.5)
+
+
+def test_late_loop_skips_missed_deadlines_instead_of_bursting(clock):
+    pacer = FramePacer(fps=10)
+    pacer.wait()
+    clock.now += 0.35  # Deadlines at +0.1 and +0.2 were missed, +0.3 runs late
+    assert pacer.wait() == 2
+    assert pacer.missed == 2
+    assert pacer.next_deadline == pytest.approx(100.4)
+
+    clock.now += 0.01
+    assert pacer.wait() == 0
+    assert clock.sleeps[-1] == pytest.approx(0.04)  # Back on the original grid
+
+
+def test_reset_starts_a_fresh_schedule(clock):
+    pacer = FramePacer(fps=10)
+    pacer.wait()
+    clock.now += 5.0
+    pacer.reset()
+    assert pacer.wait() == 0
+    assert pacer.missed == 0
+    assert pacer.next_deadline == pytest.approx(105.1)
+
+
+def test_wait_async_uses_the_same_schedule(clock, monkeypatch):
+    async def fake_sleep(seconds):
+        clock.sleep(seconds)
+    monkeypatch.setattr(pacing.asyncio, "sleep", fake_sleep)
+
+    async def run():
+        pacer = FramePacer(fps=20)
+        for _ in range(3):
+            await pacer.wait_async()
+        return pacer
+
+    pacer = asyncio.run(run())
+    assert clock.sleeps == pytest.approx([0.05, 0.05])
+    assert pacer.snapshot()['ticks'] == 3
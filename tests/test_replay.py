@@ -0,0 +1,27 @@
+from video.replay import group_events, precision_recall, score_events
+
+
+def test_detections_within_the_alert_duration_form_one_event():
+    times = [1.0, 1.5, 2.9, 10.0, 10.2, 20.0]
+    assert group_events(times, alert_duration=2.0) == [(1.0, 2.9), (10.0, 10.2), (20.0, 20.0)]
+    assert group_events([], alert_duration=2.0) == []
+
+
+def test_gap_is_measured_from_the_last_detection():
+    # Each detection extends the event, so a slow trickle stays one event
+    assert group_events([0.0, 1.5, 3.0, 4.5], alert_duration=2.0) == [(0.0, 4.5)]
+    assert group_events([0.0, 2.0], alert_duration=2.0) == [(0.0, 0.0), (2.0, 2.0)]
+
+
+def test_events_match_labels_within_tolerance():
+    events = [(5.0, 6.0), (11.5, 12.0), (30.0, 30.0)]
+    labels = [(6.5, 8.0), (10.0, 11.0), (50.0, 52.0)]
+    true_pos, false_pos, hit = score_events(events, labels, tolerance=1.0)
+    assert (true_pos, false_pos, hit) == (2, 1, 2)
+    assert score_events(events, labels, tolerance=0.0) == (0, 3, 0)
+
+
+def test_one_event_can_cover_two_labels():
+    assert score_events([(0.0, 10.0)], [(1.0, 2.0), (8.0, 9.0)], tolerance=0.0) == (1, 0, 2)
+    assert precision_recall(1, 0, 2, 2) == {'precision': 1.0, 'recall': 1.0, 'f1': 1.0}
+    assert precision_recall(0, 0, 0, 0) == {'precision': 0.0, 'recall': 0.0, 'f1': 0.0}
@@ -0,0 +1,87 @@
+from datetime import date, datetime
+
+import pytest
+
+from utils import rollups
+
+COLUMNS = ("username", "vital_type", "value", "unit", "timestamp")
+
+
+class NowCursor:
+    """Answers SELECT NOW() with a fixed database time"""
+
+    def __init__(self, now):
+        self.now = now
+        self.queries = []
+
+    def execute(self, sql, params=()):
+        self.queries.append(sql)
+
+    def fetchone(self):
+        return (self.now,)
+
+
+def by_key(values):
+    return {row[:3]: row[3:] for row in values}
+
+
+def test_rows_fold_into_hour_and_day_buckets():
+    rows = [
+        ("alice", "heart_rate", 60, "bpm", "2026-03-01 09:15:00"),
+        ("alice", "heart_rate", 80, "bpm", "2026-03-01 09:45:59"),
+        ("alice", "heart_rate", 100, "bpm", "2026-03-01 10:00:00"),
+        ("bob", "heart_rate", 70, "bpm", datetime(2026, 3, 1, 9, 30)),
+    ]
+    result = rollups.aggregate("vital_signs", COLUMNS, rows)
+
+    hour = by_key(result["hour"])
+    assert hour[("alice", "vital:heart_rate", datetime(2026, 3, 1, 9))] == (2, 140.0, 60.0, 80.0, 60 ** 2 + 80 ** 2)
+    assert hour[("alice", "vital:heart_rate", datetime(2026, 3, 1, 10))] == (1, 100.0, 100.0, 100.0, 100 ** 2)
+    assert hour[("bob", "vital:heart_rate", datetime(2026, 3, 1, 9))] == (1, 70.0, 70.0, 70.0, 70 ** 2)
+
+    day = by_key(result["day"])
+    assert day[("alice", "vital:heart_rate", date(2026, 3, 1))] == (3, 240.0, 60.0, 100.0, 60 ** 2 + 80 ** 2 + 100 ** 2)
+    assert len(day) == 2
+
+
+def test_bucket_stats_give_mean_and_variance():
+    values = [2, 4, 4, 4, 5, 5, 7, 9]
+    rows = [("alice", "walk", v, f"2026-03-01 08:{i:02d}:00") for i, v in enumerate(values)]
+    columns = ("username", "activity_type", "duration_minutes", "timestamp")
+    (_, _, _, count, total, low, high, sumsq), = rollups.aggregate("activity_logs", columns, rows)["day"]
+    mean = total / count
+    assert (count, mean, low, high) == (8, 5.0, 2.0, 9.0)
+    assert sumsq / count - mean ** 2 == pytest.approx(4.0)
+
+
+def test_day_boundary_splits_buckets():
+    rows = [("alice", "heart_rate", 60, "bpm", "2026-03-01 23:59:59"),
+            ("alice", "heart_rate", 61, "bpm", "2026-03-02 00:00:00")]
+    day = by_key(rollups.aggregate("vital_signs", COLUMNS, rows)["day"])
+    assert set(bucket for _, _, bucket in day) == {date(2026, 3, 1), date(2026, 3, 2)}
+
+
+def test_missing_timestamp_is_an_error_not_the_local_clock():
+    with pytest.raises(ValueError):
+        rollups.aggregate("vital_signs", COLUMNS, [("alice", "heart_rate", 60, "bpm", None)])
+
+
+def test_fill_timestamps_uses_database_time():
+    now = datetime(2026, 3, 1, 12, 34, 56)
+    cursor = NowCursor(now)
+    columns, rows = rollups.fill_timestamps(cursor, "vital_signs", COLUMNS[:4], [("alice", "heart_rate", 60, "bpm")])
+    assert columns == COLUMNS
+    assert rows == [("alice", "heart_rate", 60, "bpm", now)]
+
+    columns, rows = rollups.fill_timestamps(cursor, "vital_signs", COLUMNS, [
+        ("alice", "heart_rate", 60, "bpm", None),
+        ("alice", "heart_rate", 61, "bpm", "2026-03-01 08:00:00")])
+    assert [row[4] for row in rows] == [now, "2026-03-01 08:00:00"]
+
+
+def test_fill_timestamps_skips_the_query_when_not_needed():
+    cursor = NowCursor(None)
+    rows = [("alice", "heart_rate", 60, "bpm", "2026-03-01 08:00:00")]
+    assert rollups.fill_timestamps(cursor, "vital_signs", COLUMNS, rows) == (COLUMNS, rows)
+    assert rollups.fill_timestamps(cursor, "error_logs", ("message",), [("boom",)]) == (("message",), [("boom",)])
+    assert cursor.queries == []
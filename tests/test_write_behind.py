@@ -0,0 +1,170 @@
+import json
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from utils import write_behind
+from utils.write_behind import WriteBehindBuffer
+
+COLUMNS = ("device_id", "action", "timestamp")
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT row_id FROM write_behind_applied"):
+            self._rows = [(row_id,) for row_id in params if row_id in self.db.applied]
+        elif sql.startswith("DELETE FROM write_behind_applied"):
+            self._rows = []
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        if self.db.fail_inserts:
+            raise RuntimeError("database down")
+        if sql.startswith("INSERT INTO write_behind_applied"):
+            self.db.pending_ids.extend(row_id for row_id, in rows)
+        else:
+            self.db.pending_rows.extend(rows)
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+class FakeDatabase:
+    """Transactions stage rows and row ids, and apply them only on commit"""
+
+    def __init__(self):
+        self.rows = []
+        self.applied = set()
+        self.fail_inserts = False
+        self.pending_rows = []
+        self.pending_ids = []
+
+    @contextmanager
+    def transaction(self):
+        self.pending_rows, self.pending_ids = [], []
+        yield FakeCursor(self)
+        self.rows.extend(self.pending_rows)
+        self.applied.update(self.pending_ids)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+def make_buffer(db, spool_dir, **kwargs):
+    # Long interval: nothing is written until the test flushes
+    return WriteBehindBuffer(db, str(spool_dir), batch_size=100, flush_interval=60, **kwargs)
+
+
+def spool_lines(spool_dir):
+    return [json.loads(line) for path in sorted(spool_dir.glob("segment-*.jsonl"))
+            for line in path.read_text().splitlines()]
+
+
+def test_rows_are_spooled_with_ids_before_flush(db, tmp_path):
+    buffer = make_buffer(db, tmp_path)
+    try:
+        for i in range(3):
+            buffer.add("device_logs", COLUMNS, (f"lamp{i}", "on", "2026-03-01 08:00:00"))
+        lines = spool_lines(tmp_path)
+        assert [line["r"][0] for line in lines] == ["lamp0", "lamp1", "lamp2"]
+        assert len({line["i"] for line in lines}) == 3
+        assert db.rows == []
+
+        assert buffer.flush() == 3
+        assert [row[0] for row in db.rows] == ["lamp0", "lamp1", "lamp2"]
+        assert spool_lines(tmp_path) == []
+    finally:
+        buffer.close()
+
+
+def test_replay_after_crash_inserts_unwritten_rows(db, tmp_path):
+    segment = tmp_path / "segment-7.jsonl"
+    segment.write_text(
+        json.dumps({"t": "device_logs", "c": COLUMNS, "i": "a" * 32, "r": ["lamp", "on", "2026-03-01 08:00:00"]}) + "\n"
+        + '{"t": "device_logs", "c": ["device_id"'  # Torn last line
+    )
+    buffer = make_buffer(db, tmp_path)
+    try:
+        assert not segment.exists()
+        assert buffer.pending() == 1
+        assert buffer.flush() == 1
+        assert db.rows == [("lamp", "on", "2026-03-01 08:00:00")]
+    finally:
+        buffer.close()
+
+
+def test_replay_skips_rows_already_committed(db, tmp_path):
+    buffer = make_buffer(db, tmp_path)
+    for i in range(4):
+        buffer.add("device_logs", COLUMNS, (f"lamp{i}", "on", "2026-03-01 08:00:00"))
+    # Crash between commit and spool cleanup: the segment outlives the write
+    saved = {path.name: path.read_text() for path in tmp_path.glob("segment-*.jsonl")}
+    buffer.flush()
+    buffer.close()
+    for name, text in saved.items():
+        (tmp_path / name).write_text(text)
+
+    replayed = make_buffer(db, tmp_path)
+    try:
+        assert replayed.pending() == 4
+        assert replayed.flush() == 4
+        assert len(db.rows) == 4
+        assert replayed.get_stats()["duplicates"] == 4
+    finally:
+        replayed.close()
+
+
+def test_failed_flush_keeps_rows_for_the_next_attempt(db, tmp_path):
+    buffer = make_buffer(db, tmp_path)
+    try:
+        buffer.add("device_logs", COLUMNS, ("lamp", "on", "2026-03-01 08:00:00"))
+        db.fail_inserts = True
+        assert buffer.flush() == -1
+        assert buffer.pending() == 1
+        assert len(spool_lines(tmp_path)) == 1
+
+        db.fail_inserts = False
+        assert buffer.flush() == 1
+        assert len(db.rows) == 1
+        assert buffer.pending() == 0
+    finally:
+        buffer.close()
+
+
+def test_background_fsync_batches_a_single_producer(db, tmp_path, monkeypatch):
+    synced = []
+    real_fsync = write_behind.os.fsync
+    monkeypatch.setattr(write_behind.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    buffer = make_buffer(db, tmp_path, fsync_interval=0.05)
+    try:
+        synced.clear()
+        for i in range(200):
+            buffer.add("device_logs", COLUMNS, (f"lamp{i}", "on", "2026-03-01 08:00:00"))
+        assert len(synced) < 20  # Not one fsync per row
+        deadline = time.monotonic() + 2
+        while buffer._synced < 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert buffer._synced == 200  # Durable within the window
+    finally:
+        buffer.close()
+
+
+def test_zero_interval_fsyncs_before_add_returns(db, tmp_path):
+    buffer = make_buffer(db, tmp_path, fsync_interval=0)
+    try:
+        buffer.add("device_logs", COLUMNS, ("lamp", "on", "2026-03-01 08:00:00"))
+        assert buffer._synced == 1
+    finally:
+        buffer.close()